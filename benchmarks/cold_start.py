@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Measure the time from starting a process to the first rendered notebook.
+
+Every run starts a fresh Python process that imports the app, runs its startup
+(loading templates), and renders the generic template once.
+Run with::
+
+    python benchmarks/cold_start.py --runs 5 --target 2.0
+
+from the repository root so that the app finds the templates.
+With ``--target``, the script fails if the median time to the first response
+exceeds the target, so that CI can check it.
+``--importtime`` additionally shows the slowest imports of ``sciwyrm.main``
+according to ``python -X importtime``.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+GENERIC_ID = "b32f6992-0355-4759-b780-ececd4957c23"
+
+# Runs in a fresh process.
+# Times are relative to the start of the process as measured by the parent.
+_CHILD = """
+import json, os, sys, time
+def now():
+    return time.time() - float(os.environ["COLD_START_SPAWNED_AT"])
+interpreter = now()
+from sciwyrm.main import app
+imported = now()
+from fastapi.testclient import TestClient
+client_overhead = now() - imported
+with TestClient(app) as client:
+    started = now() - client_overhead
+    client.post("/notebook", json=json.loads(sys.argv[1])).raise_for_status()
+    responded = now() - client_overhead
+print(json.dumps({
+    "interpreter_s": interpreter,
+    "import_s": imported - interpreter,
+    "startup_s": started - imported,
+    "first_response_s": responded - started,
+    "total_s": responded,
+}))
+"""
+
+
+def run_once(template_dir: Path, warm_up: bool) -> dict[str, float]:
+    """Start a process and measure how long each phase takes."""
+    request = {
+        "template_id": GENERIC_ID,
+        "parameters": {
+            "scicat_url": "https://test-url.sci.cat",
+            "file_server_host": "login",
+            "file_server_port": 22,
+            "dataset_pids": ["20.500.12269/00000001"],
+        },
+    }
+    env = {
+        **os.environ,
+        "SCIWYRM_TEMPLATE_DIR": str(template_dir),
+        "SCIWYRM_WARM_UP_TEMPLATES": str(warm_up).lower(),
+        "COLD_START_SPAWNED_AT": repr(time.time()),
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD, json.dumps(request)],  # noqa: S603
+        env=env,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    result: dict[str, float] = json.loads(output.splitlines()[-1])
+    return result
+
+
+def slowest_imports(count: int) -> list[tuple[float, str]]:
+    """Return the slowest direct and second-level imports of ``sciwyrm.main``."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import sciwyrm.main"],  # noqa: S603
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--template-dir", type=Path, default=Path("templates"))
+    parser.add_argument(
+        "--warm-up",
+        action="store_true",
+        help="Render all templates at startup (warm_up_templates)",
+    )
+    parser.add_argument(
+        "--target",
+        type=float,
+        help="Fail if the median time to the first response exceeds this "
+        "many seconds",
+    )
+    parser.add_argument(
+        "--importtime",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Show the N slowest imports",
+    )
+    parser.add_argument("--output", type=Path, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    runs = [run_once(args.template_dir, args.warm_up) for _ in range(args.runs)]
+    median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    for key, value in median.items():
+        print(f"{key:>18}: {value * 1000:8.1f} ms")
+
+    if args.importtime:
+        print("\nSlowest imports of sciwyrm.main (cumulative):")
+        for seconds, name in slowest_imports(args.importtime):
+            print(f"{seconds * 1000:8.1f} ms  {name}")
+
+    if args.output is not None:
+        args.output.write_text(json.dumps({"median": median, "runs": runs}, indent=2))
+    if args.target is not None and median["total_s"] > args.target:
+        print(
+            f"\nTime to first response {median['total_s']:.3f}s "
+            f"exceeds the target of {args.target:.3f}s"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
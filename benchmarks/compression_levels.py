@@ -0,0 +1,105 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Compare bytes on the wire and CPU cost of compression codings and levels.
+
+Compresses the template listing, a template schema, and notebooks rendered
+from the generic template with different numbers of dataset PIDs and with
+a large embedded output, which is mostly incompressible base64.
+
+Run with::
+
+    python benchmarks/compression_levels.py --pids 10 1000 100000 --sizes 1
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from json_backends import median_ms
+from render_latency import GENERIC_ID, PARAMETERS, make_template_dir
+
+from sciwyrm import compression, notebook
+from sciwyrm.templates import TemplateRegistry
+
+LEVELS = {
+    "gzip": [1, 6, 9],
+    "br": [0, 1, 4, 6, 11],
+    "zstd": [1, 3, 9, 19],
+}
+
+
+def payloads(template_dir: Path, pids: list[int], sizes: list[int]) -> dict[str, bytes]:
+    """Return response bodies by name."""
+    template_ids = make_template_dir(template_dir, sizes)
+    templates = TemplateRegistry(template_dir).snapshot
+    bodies = {
+        "template list": templates.summaries_response.body,
+        "schema": templates.schema_responses[GENERIC_ID].body,
+    }
+    for n_pids in pids:
+        parameters = {
+            **PARAMETERS,
+            "dataset_pids": [f"20.500.12269/{i:08d}" for i in range(n_pids)],
+        }
+        bodies[f"notebook, {n_pids} pids"] = _render(templates, GENERIC_ID, parameters)
+    for template_id in template_ids:
+        if template_id != GENERIC_ID:
+            bodies[f"notebook, {template_id}"] = _render(
+                templates, template_id, PARAMETERS
+            )
+    return bodies
+
+
+def _render(templates, template_id: str, parameters: dict) -> bytes:
+    spec = notebook.NotebookSpec(
+        template_id=template_id, parameters=parameters
+    ).with_config(templates[template_id].config)
+    return notebook.render_notebook(templates[template_id].template, spec)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pids", type=int, nargs="+", default=[10, 1000, 100_000])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=[1],
+        help="Sizes of embedded outputs in MiB",
+    )
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    missing = {"gzip", "br", "zstd"} - compression.AVAILABLE
+    if missing:
+        print(f"Not installed, skipping: {', '.join(sorted(missing))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bodies = payloads(Path(tmp), args.pids, args.sizes)
+    print(
+        f"{'payload':<28} {'coding':<6} {'level':>5} {'bytes':>10} "
+        f"{'ratio':>7} {'time [ms]':>10} {'MB/s':>8}"
+    )
+    for name, body in bodies.items():
+        print(f"{name:<28} {'-':<6} {'-':>5} {len(body):>10} {1:7.2f}")
+        repeat = max(args.repeat // (1 + len(body) // 2**20), 3)
+        for coding, levels in LEVELS.items():
+            if coding not in compression.AVAILABLE:
+                continue
+            for level in levels:
+                compressed = compression.compress(body, coding, level)
+                ms = median_ms(
+                    lambda coding=coding, level=level, body=body: compression.compress(
+                        body, coding, level
+                    ),
+                    repeat,
+                )
+                print(
+                    f"{name:<28} {coding:<6} {level:>5} {len(compressed):>10} "
+                    f"{len(body) / len(compressed):7.2f} {ms:10.3f} "
+                    f"{len(body) / ms / 1e3:8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
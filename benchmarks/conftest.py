@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Fixtures for the pytest-benchmark suite.
+
+Run with::
+
+    python -m pytest benchmarks --benchmark-json=benchmark.json
+
+and compare runs with ``pytest-benchmark compare``.
+"""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from render_latency import GENERIC_ID, make_template_dir
+
+from sciwyrm.config import AppConfig, app_config
+from sciwyrm.templates import TemplateRegistry, TemplateSnapshot
+
+PID_COUNTS = (1, 100, 10_000, 100_000)
+"""Numbers of dataset PIDs in benchmarked requests."""
+TEMPLATE_SIZES_MIB = (0, 1, 8)
+"""Sizes of embedded outputs in synthetic templates, 0 is the generic template."""
+
+
+def make_parameters(n_pids: int) -> dict[str, object]:
+    """Return parameters for the generic template with ``n_pids`` dataset PIDs."""
+    return {
+        "scicat_url": "https://test-url.sci.cat",
+        "file_server_host": "login",
+        "file_server_port": 22,
+        "dataset_pids": [f"20.500.12269/{i:08d}" for i in range(n_pids)],
+    }
+
+
+@pytest.fixture(scope="session")
+def template_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    path = tmp_path_factory.mktemp("templates")
+    make_template_dir(path, [size for size in TEMPLATE_SIZES_MIB if size])
+    return path
+
+
+@pytest.fixture(scope="session")
+def templates(template_dir: Path) -> TemplateSnapshot:
+    return TemplateRegistry(template_dir).snapshot
+
+
+@pytest.fixture(scope="session")
+def template_ids() -> dict[int, str]:
+    return {
+        size: f"large-{size}mib" if size else GENERIC_ID for size in TEMPLATE_SIZES_MIB
+    }
+
+
+@pytest.fixture(scope="session")
+def app(template_dir: Path) -> Iterator[FastAPI]:
+    from sciwyrm.main import app
+
+    old_overrides = dict(app.dependency_overrides)
+    app.dependency_overrides[app_config] = lambda: AppConfig(
+        template_dir=template_dir, render_queue_size=1024
+    )
+    yield app
+    app.dependency_overrides = old_overrides
+
+
+@pytest.fixture(scope="session")
+def client(app: FastAPI) -> TestClient:
+    return TestClient(app)
@@ -0,0 +1,93 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Compare JSON backends for encoding and decoding notebooks.
+
+Renders the bundled generic template and synthetic templates with large
+embedded outputs and measures how long the standard library and orjson
+take to encode and decode the resulting notebooks.
+
+Run with::
+
+    python benchmarks/json_backends.py --sizes 0 1 8
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from render_latency import PARAMETERS, make_template_dir
+
+from sciwyrm import notebook
+from sciwyrm.templates import TemplateRegistry
+
+
+def _backends() -> dict[str, tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    backends = {
+        "json": (
+            lambda obj: json.dumps(
+                obj, ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8"),
+            json.loads,
+        )
+    }
+    try:
+        import orjson
+    except ImportError:
+        print("orjson is not installed, only benchmarking the standard library")
+    else:
+        backends["orjson"] = (orjson.dumps, orjson.loads)
+    return backends
+
+
+def median_ms(fn: Callable[[], object], repeat: int) -> float:
+    """Return the median run time of ``fn`` in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[0, 1, 8],
+        help="Sizes of embedded outputs in MiB, 0 means the plain generic template",
+    )
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    backends = _backends()
+    with tempfile.TemporaryDirectory() as tmp:
+        template_dir = Path(tmp)
+        template_ids = make_template_dir(template_dir, args.sizes)
+        templates = TemplateRegistry(template_dir).snapshot
+        print(
+            f"{'template':<40} {'backend':<8} {'encode [ms]':>12} {'decode [ms]':>12}"
+        )
+        for template_id in template_ids:
+            spec = notebook.NotebookSpec(
+                template_id=template_id, parameters=PARAMETERS
+            ).with_config(templates[template_id].config)
+            encoded = notebook.render_notebook(templates[template_id].template, spec)
+            nb = json.loads(encoded)
+            repeat = max(args.repeat // (1 + 10 * len(encoded) // 2**20), 5)
+            for name, (dumps, loads) in backends.items():
+                encode = median_ms(lambda dumps=dumps, nb=nb: dumps(nb), repeat)
+                decode = median_ms(
+                    lambda loads=loads, encoded=encoded: loads(encoded), repeat
+                )
+                print(f"{template_id:<40} {name:<8} {encode:12.3f} {decode:12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Generate load against a running SciWyrm server.
+
+Sends POST /notebook requests with a fixed number of concurrent clients
+and reports throughput and latency percentiles.
+
+Start a server, e.g., with::
+
+    uvicorn sciwyrm.main:app --workers 1
+
+and run::
+
+    python benchmarks/loadgen.py --concurrency 16 --duration 30 --output run.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+GENERIC_ID = "b32f6992-0355-4759-b780-ececd4957c23"
+
+
+def make_request(template_id: str, n_pids: int) -> dict[str, Any]:
+    """Return a request body for the generic template."""
+    return {
+        "template_id": template_id,
+        "parameters": {
+            "scicat_url": "https://test-url.sci.cat",
+            "file_server_host": "login",
+            "file_server_port": 22,
+            "dataset_pids": [f"20.500.12269/{i:08d}" for i in range(n_pids)],
+        },
+    }
+
+
+async def run_client(
+    client: httpx.AsyncClient,
+    body: bytes,
+    deadline: float,
+    latencies: list[float],
+    statuses: Counter[str],
+) -> None:
+    """Send requests one after the other until the deadline."""
+    headers = {"Content-Type": "application/json"}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.post("/notebook", content=body, headers=headers)
+            await response.aread()
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        statuses[str(response.status_code)] += 1
+
+
+def summarize(latencies: list[float], duration: float) -> dict[str, float]:
+    """Return throughput and latency percentiles in milliseconds."""
+    if len(latencies) < 2:
+        return {"requests_per_second": len(latencies) / duration}
+    percentiles = statistics.quantiles(latencies, n=1000, method="inclusive")
+    return {
+        "requests_per_second": len(latencies) / duration,
+        "mean_ms": statistics.fmean(latencies) * 1e3,
+        "p50_ms": percentiles[499] * 1e3,
+        "p90_ms": percentiles[899] * 1e3,
+        "p99_ms": percentiles[989] * 1e3,
+        "p999_ms": percentiles[998] * 1e3,
+        "max_ms": max(latencies) * 1e3,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Run the load test and return the results."""
+    body = json.dumps(make_request(args.template_id, args.pids)).encode()
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=args.timeout
+    ) as client:
+        # Warm up connections and server-side caches.
+        await client.post(
+            "/notebook", content=body, headers={"Content-Type": "application/json"}
+        )
+        latencies: list[float] = []
+        statuses: Counter[str] = Counter()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(
+            *(
+                run_client(client, body, deadline, latencies, statuses)
+                for _ in range(args.concurrency)
+            )
+        )
+        duration = time.perf_counter() - start
+
+    return {
+        "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "config": {
+            "url": args.url,
+            "template_id": args.template_id,
+            "pids": args.pids,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+        },
+        "responses": dict(statuses),
+        "results": summarize(latencies, duration),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--template-id", default=GENERIC_ID)
+    parser.add_argument(
+        "--pids", type=int, default=10, help="Number of dataset PIDs per request"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Duration in seconds"
+    )
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", type=Path, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
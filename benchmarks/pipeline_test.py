@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Micro-benchmarks of the render pipeline."""
+
+import pytest
+from conftest import PID_COUNTS, TEMPLATE_SIZES_MIB, make_parameters
+from render_latency import GENERIC_ID
+
+from sciwyrm import filters, notebook
+
+
+def _spec(templates, template_id, n_pids):
+    return notebook.NotebookSpec(
+        template_id=template_id, parameters=make_parameters(n_pids)
+    ).with_config(templates[template_id].config)
+
+
+@pytest.mark.parametrize("n_pids", PID_COUNTS)
+def test_validate_spec(benchmark, templates, n_pids):
+    spec = notebook.NotebookSpec(
+        template_id=GENERIC_ID, parameters=make_parameters(n_pids)
+    )
+    config = templates[GENERIC_ID].config
+    benchmark(notebook.validate_spec, spec, config)
+
+
+@pytest.mark.parametrize("n_pids", PID_COUNTS)
+def test_render_context(benchmark, templates, n_pids):
+    spec = _spec(templates, GENERIC_ID, n_pids)
+    benchmark(notebook.render_context, spec)
+
+
+@pytest.mark.parametrize("n_pids", PID_COUNTS)
+def test_insert_notebook_metadata(benchmark, templates, n_pids):
+    spec = _spec(templates, GENERIC_ID, n_pids)
+    benchmark(notebook.insert_notebook_metadata, {"metadata": {}, "cells": []}, spec)
+
+
+@pytest.mark.parametrize("length", [10, 1_000, 100_000])
+@pytest.mark.parametrize(
+    "fn",
+    [filters.quote, filters.json_escape, filters.json_string],
+    ids=lambda fn: fn.__name__,
+)
+def test_filter(benchmark, fn, length):
+    value = ('ab"c\\d\n' * length)[:length]
+    benchmark(fn, value)
+
+
+@pytest.mark.parametrize("n_pids", PID_COUNTS)
+def test_render_notebook_parameters(benchmark, templates, n_pids):
+    spec = _spec(templates, GENERIC_ID, n_pids)
+    benchmark(notebook.render_notebook, templates[GENERIC_ID].template, spec)
+
+
+@pytest.mark.parametrize("size_mib", TEMPLATE_SIZES_MIB)
+def test_render_notebook_template_size(benchmark, templates, template_ids, size_mib):
+    template_id = template_ids[size_mib]
+    spec = _spec(templates, template_id, 100)
+    benchmark(notebook.render_notebook, templates[template_id].template, spec)
+
+
+@pytest.mark.parametrize("n_pids", PID_COUNTS)
+def test_post_notebook_parameters(benchmark, client, n_pids):
+    request = {"template_id": GENERIC_ID, "parameters": make_parameters(n_pids)}
+
+    def post():
+        response = client.post("/notebook", json=request)
+        assert response.status_code == 200
+
+    benchmark(post)
+
+
+@pytest.mark.parametrize("size_mib", TEMPLATE_SIZES_MIB)
+def test_post_notebook_template_size(benchmark, client, template_ids, size_mib):
+    request = {
+        "template_id": template_ids[size_mib],
+        "parameters": make_parameters(100),
+    }
+
+    def post():
+        response = client.post("/notebook", json=request)
+        assert response.status_code == 200
+
+    benchmark(post)
@@ -0,0 +1,174 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Compare latency and allocations of notebook rendering paths.
+
+Renders the bundled generic template and synthetic templates with large
+embedded outputs, both with the legacy path
+(render -> ``json.loads`` -> insert metadata -> ``JSONResponse``)
+and the single-pass path used by the service.
+
+Run with::
+
+    python benchmarks/render_latency.py --sizes 0 1 8
+"""
+
+import argparse
+import base64
+import json
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from fastapi.responses import JSONResponse
+from jinja2 import Environment, FileSystemLoader
+
+from sciwyrm import filters, notebook
+from sciwyrm.templates import TemplateRegistry, notebook_template_path
+
+GENERIC_ID = "b32f6992-0355-4759-b780-ececd4957c23"
+REPO_TEMPLATES = Path(__file__).resolve().parent.parent / "templates"
+PARAMETERS = {
+    "scicat_url": "https://test-url.sci.cat",
+    "file_server_host": "login",
+    "file_server_port": 22,
+    "dataset_pids": [f"20.500.12269/{i:08d}" for i in range(100)],
+}
+
+
+def make_template_dir(target: Path, sizes_mib: list[int]) -> list[str]:
+    """Copy the generic template and add variants with large outputs."""
+    notebook_dir = target / "notebook"
+    shutil.copytree(REPO_TEMPLATES / "notebook", notebook_dir)
+    source = (notebook_dir / f"{GENERIC_ID}.ipynb").read_text()
+    config = (notebook_dir / f"{GENERIC_ID}.json").read_text()
+    ids = []
+    rng = random.Random(8124)
+    for size in sizes_mib:
+        if size == 0:
+            ids.append(GENERIC_ID)
+            continue
+        payload = base64.b64encode(rng.randbytes(size * 1024 * 1024 * 3 // 4))
+        nb = json.loads(source)
+        nb["cells"].append(
+            {
+                "cell_type": "code",
+                "execution_count": 1,
+                "id": "large-output",
+                "metadata": {},
+                "outputs": [
+                    {
+                        "data": {"image/png": payload.decode()},
+                        "metadata": {},
+                        "output_type": "display_data",
+                    }
+                ],
+                "source": ["plot()"],
+            }
+        )
+        template_id = f"large-{size}mib"
+        (notebook_dir / f"{template_id}.ipynb").write_text(
+            # Keep the Jinja expressions of the generic template intact.
+            json.dumps(nb, indent=1)
+        )
+        (notebook_dir / f"{template_id}.json").write_text(config)
+        ids.append(template_id)
+    return ids
+
+
+def legacy_path(
+    template_dir: Path,
+) -> Callable[[notebook.NotebookSpecWithConfig], bytes]:
+    """Render like SciWyrm did before single-pass rendering."""
+    env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
+    env.filters["quote"] = filters.quote
+    env.filters["je"] = filters.json_escape
+
+    def render(spec: notebook.NotebookSpecWithConfig) -> bytes:
+        template = env.get_template(notebook_template_path(spec.template_id))
+        nb = json.loads(template.render(notebook.render_context(spec)))
+        notebook.insert_notebook_metadata(nb, spec)
+        return JSONResponse(nb).body
+
+    return render
+
+
+def single_pass(
+    template_dir: Path,
+) -> Callable[[notebook.NotebookSpecWithConfig], bytes]:
+    """Render with the current implementation."""
+    templates = TemplateRegistry(template_dir).snapshot
+
+    def render(spec: notebook.NotebookSpecWithConfig) -> bytes:
+        return notebook.render_notebook(templates[spec.template_id].template, spec)
+
+    return render
+
+
+def measure(fn: Callable[[], bytes], repeat: int) -> dict[str, float | int]:
+    """Return latency percentiles and peak allocation of ``fn``."""
+    for _ in range(min(repeat, 5)):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    percentiles = statistics.quantiles(times, n=100, method="inclusive")
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "p50_ms": percentiles[49] * 1e3,
+        "p99_ms": percentiles[98] * 1e3,
+        "peak_alloc_kib": peak / 1024,
+        "output_kib": len(fn()) / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[0, 1, 8],
+        help="Sizes of embedded outputs in MiB, 0 means the plain generic template",
+    )
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template_dir = Path(tmp)
+        template_ids = make_template_dir(template_dir, args.sizes)
+        templates = TemplateRegistry(template_dir).snapshot
+        paths = {
+            "legacy": legacy_path(template_dir),
+            "single-pass": single_pass(template_dir),
+        }
+        print(
+            f"{'template':<40} {'path':<12} {'p50 [ms]':>9} {'p99 [ms]':>9}"
+            f" {'peak alloc [KiB]':>17} {'output [KiB]':>13}"
+        )
+        for template_id in template_ids:
+            spec = notebook.NotebookSpec(
+                template_id=template_id, parameters=PARAMETERS
+            ).with_config(templates[template_id].config)
+            repeat = args.repeat if template_id == GENERIC_ID else args.repeat // 10
+            for name, render in paths.items():
+                result = measure(lambda render=render, spec=spec: render(spec), repeat)
+                print(
+                    f"{template_id:<40} {name:<12} {result['p50_ms']:9.3f}"
+                    f" {result['p99_ms']:9.3f} {result['peak_alloc_kib']:17.1f}"
+                    f" {result['output_kib']:13.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
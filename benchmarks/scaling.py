@@ -0,0 +1,107 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Measure how throughput scales with the number of server workers.
+
+Starts ``sciwyrm serve --workers N`` for every N and runs the load generator
+against it. Run with::
+
+    python benchmarks/scaling.py --workers 1 2 4 8 --output scaling.json
+
+from the repository root so that the server finds the templates.
+
+The load generator runs on the same machine as the server,
+so use a machine with more CPUs than the largest number of workers.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+import loadgen
+
+
+def wait_until_ready(url: str, process: subprocess.Popen[bytes]) -> None:
+    """Wait until the server responds to requests."""
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            httpx.get(f"{url}/notebook/templates", timeout=1).raise_for_status()
+        except httpx.HTTPError:
+            time.sleep(0.1)
+        else:
+            return
+    raise RuntimeError("Server did not start within 60s")
+
+
+def run_with_workers(args: argparse.Namespace, workers: int) -> dict[str, Any]:
+    """Start a server with the given number of workers and measure it."""
+    bind = f"127.0.0.1:{args.port}"
+    command = [sys.executable, "-m", "sciwyrm.cli", "serve", "--bind", bind]
+    command += ["--workers", str(workers)]
+    process = subprocess.Popen(
+        command,  # noqa: S603
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(args.url, process)
+        return asyncio.run(loadgen.run(args))["results"]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--template-id", default=loadgen.GENERIC_ID)
+    parser.add_argument(
+        "--pids", type=int, default=10, help="Number of dataset PIDs per request"
+    )
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Duration per run in seconds"
+    )
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", type=Path, help="Write results to this JSON file")
+    args = parser.parse_args()
+    args.url = f"http://127.0.0.1:{args.port}"
+
+    results = {}
+    for workers in args.workers:
+        results[str(workers)] = result = run_with_workers(args, workers)
+        print(
+            f"{workers:>3} workers: {result['requests_per_second']:8.1f} req/s, "
+            f"p50 {result.get('p50_ms', float('nan')):6.2f} ms, "
+            f"p99 {result.get('p99_ms', float('nan')):6.2f} ms"
+        )
+
+    report = {
+        "machine": platform.node(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "config": {
+            "template_id": args.template_id,
+            "pids": args.pids,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
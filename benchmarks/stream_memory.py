@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Compare peak memory of buffered and streamed notebook rendering.
+
+Renders a synthetic template with a large embedded output once into a single
+buffer and once in chunks that are discarded immediately, like a
+``StreamingResponse`` does after sending them.
+
+Run with::
+
+    python benchmarks/stream_memory.py --size 50 --chunk-sizes 16 64 256
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from render_latency import PARAMETERS, make_template_dir
+
+from sciwyrm import notebook
+from sciwyrm.templates import TemplateRegistry
+
+
+def measure(fn: Callable[[], int]) -> tuple[float, int, int]:
+    """Return the duration, peak allocation, and output size of ``fn``."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    output_size = fn()
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak, output_size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--size", type=int, default=50, help="Size of the embedded output in MiB"
+    )
+    parser.add_argument(
+        "--chunk-sizes",
+        type=int,
+        nargs="+",
+        default=[16, 64, 256],
+        help="Chunk sizes in KiB",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template_dir = Path(tmp)
+        (template_id,) = make_template_dir(template_dir, [args.size])
+        template = TemplateRegistry(template_dir).snapshot[template_id]
+        spec = notebook.NotebookSpec(
+            template_id=template_id, parameters=PARAMETERS
+        ).with_config(template.config)
+
+        def buffered() -> int:
+            return len(notebook.render_notebook(template.template, spec))
+
+        def streamed(chunk_size: int) -> int:
+            return sum(
+                len(chunk)
+                for chunk in notebook.generate_notebook(
+                    template.template, spec, chunk_size=chunk_size
+                )
+            )
+
+        print(f"{'mode':<16} {'time [ms]':>10} {'peak [MiB]':>11} {'output [MiB]':>13}")
+        runs = {"buffered": buffered} | {
+            f"stream {size} KiB": lambda size=size: streamed(size * 1024)
+            for size in args.chunk_sizes
+        }
+        for name, fn in runs.items():
+            duration, peak, output_size = measure(fn)
+            print(
+                f"{name:<16} {duration * 1e3:10.1f} {peak / 2**20:11.2f}"
+                f" {output_size / 2**20:13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
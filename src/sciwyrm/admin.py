@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Endpoints for operating the service.
+
+All endpoints require the bearer token in ``admin_token``
+and do not exist if it is not set.
+Statistics and caches are per process;
+with multiple workers, a request only reaches one of them.
+"""
+
+import secrets
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Security
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .cache import CacheUnavailableError, RenderCache, get_render_cache
+from .config import AppConfig, app_config
+from .templates import TemplateRegistry, get_template_registry
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def require_admin(
+    config: Annotated[AppConfig, Depends(app_config)],
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Security(_bearer)],
+) -> None:
+    """Reject requests without the admin token."""
+    if config.admin_token is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = config.admin_token.get_secret_value().encode()
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials.encode(), expected
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or missing admin token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/stats")
+async def stats(
+    registry: Annotated[TemplateRegistry, Depends(get_template_registry)],
+    cache: Annotated[RenderCache | None, Depends(get_render_cache)],
+) -> dict[str, Any]:
+    """Return statistics about templates and the render cache of this process."""
+    return {
+        "templates": {
+            "count": len(registry.snapshot.templates),
+            "lookups": {
+                result: metrics.sample("sciwyrm_template_lookups_total", result=result)
+                for result in ("hit", "miss")
+            },
+        },
+        "render_cache": None if cache is None else cache.stats(),
+    }
+
+
+@router.post("/templates/reload")
+async def reload_templates(
+    registry: Annotated[TemplateRegistry, Depends(get_template_registry)],
+) -> dict[str, Any]:
+    """Reload changed templates now instead of at the next reload interval."""
+    changed = await run_in_threadpool(registry.refresh)
+    return {"changed": changed, "count": len(registry.snapshot.templates)}
+
+
+@router.post("/cache/flush")
+async def flush_cache(
+    cache: Annotated[RenderCache | None, Depends(get_render_cache)],
+) -> dict[str, Any]:
+    """Remove all rendered notebooks and validated specs from the render cache.
+
+    With a Redis backend, this affects all replicas.
+    """
+    if cache is None:
+        return {"flushed": False}
+    try:
+        await cache.clear()
+    except CacheUnavailableError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from None
+    return {"flushed": True}
@@ -0,0 +1,189 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Admission control for rendering endpoints.
+
+Requests that render notebooks are limited per client by a token bucket
+and globally by the number of requests that are handled at the same time.
+Rejected requests get 429 Too Many Requests with a ``Retry-After`` header.
+Other endpoints, e.g., for listing templates, are not limited because they
+serve precomputed responses.
+
+The state is kept in memory and is separate for every process.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from functools import lru_cache
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request
+
+from . import metrics
+from .config import AppConfig, app_config
+
+# Buckets of clients that have not sent requests for the longest time
+# are dropped when there are more clients than this.
+_MAX_CLIENTS = 10_000
+
+
+class AdmissionRejectedError(RuntimeError):
+    """A request was not admitted.
+
+    Attributes
+    ----------
+    reason:
+        ``"rate_limit"`` or ``"concurrency"``.
+    retry_after:
+        Seconds after which the request may be admitted.
+    """
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(f"Too many requests ({reason.replace('_', ' ')})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Admission:
+    """Admits or rejects requests.
+
+    Not thread-safe, use only in the event loop.
+
+    Parameters
+    ----------
+    rate:
+        Number of tokens per second that are added to every client's bucket.
+        0 disables rate limiting.
+    burst:
+        Size of the buckets, i.e., the number of requests that a client can
+        send at once after being idle.
+    max_concurrent:
+        Maximum number of admitted requests that have not been released.
+        0 disables the limit.
+    max_clients:
+        Maximum number of buckets that are kept.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: float,
+        burst: int,
+        max_concurrent: int,
+        max_clients: int = _MAX_CLIENTS,
+    ) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._max_concurrent = max_concurrent
+        self._max_clients = max_clients
+        # Client -> (tokens, time of last update)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._in_progress = 0
+
+    @property
+    def in_progress(self) -> int:
+        """Number of admitted requests that have not been released."""
+        return self._in_progress
+
+    def admit(self, client: str) -> None:
+        """Admit a request of a client.
+
+        Every admitted request must be followed by exactly one call to
+        :meth:`release`.
+
+        Raises
+        ------
+        AdmissionRejectedError
+            If the client sent too many requests or too many requests are
+            in progress.
+        """
+        if self._max_concurrent and self._in_progress >= self._max_concurrent:
+            raise AdmissionRejectedError("concurrency", 1)
+        if self._rate:
+            self._take_token(client)
+        self._in_progress += 1
+
+    def release(self) -> None:
+        """Release a request that was admitted with :meth:`admit`."""
+        self._in_progress -= 1
+
+    def _take_token(self, client: str) -> None:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self._burst, now))
+        tokens = min(self._burst, tokens + (now - updated) * self._rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            raise AdmissionRejectedError(
+                "rate_limit", math.ceil((1 - tokens) / self._rate)
+            )
+        self._buckets[client] = (tokens - 1, now)
+        if len(self._buckets) > self._max_clients:
+            self._buckets.popitem(last=False)
+
+
+def client_id(request: Request, header: str | None, trusted_proxies: int = 0) -> str:
+    """Return the identity of the client that sent a request.
+
+    If ``header`` is given and present in the request, this is a value of
+    the comma-separated list in the header, e.g., ``X-Forwarded-For``.
+    Every proxy appends the address of its peer, but clients can send
+    arbitrary values in front of those.
+    So the value is taken from the right, skipping the ``trusted_proxies``
+    values that were appended by proxies behind the one that connects
+    to the service.
+    Otherwise, it is the IP address of the peer.
+    """
+    if header is not None and (value := request.headers.get(header)):
+        values = value.split(",")
+        return values[max(len(values) - 1 - trusted_proxies, 0)].strip()
+    return "" if request.client is None else request.client.host
+
+
+def get_admission(config: Annotated[AppConfig, Depends(app_config)]) -> Admission:
+    """Return the admission control for rendering endpoints."""
+    return _make_admission(
+        config.rate_limit_per_second,
+        config.rate_limit_burst,
+        config.render_max_concurrent_requests,
+    )
+
+
+@lru_cache(maxsize=1)
+def _make_admission(rate: float, burst: int, max_concurrent: int) -> Admission:
+    return Admission(rate=rate, burst=burst, max_concurrent=max_concurrent)
+
+
+async def admit_render(
+    request: Request,
+    config: Annotated[AppConfig, Depends(app_config)],
+    admission: Annotated[Admission, Depends(get_admission)],
+) -> AsyncIterator[None]:
+    """Admit a request to a rendering endpoint for the duration of the endpoint.
+
+    Raises
+    ------
+    fastapi.HTTPException
+        With status 429 if the request is rejected.
+    """
+    try:
+        admission.admit(
+            client_id(
+                request,
+                config.rate_limit_client_header,
+                config.rate_limit_trusted_proxies,
+            )
+        )
+    except AdmissionRejectedError as exc:
+        metrics.ADMISSION_REJECTED.labels(exc.reason).inc()
+        raise HTTPException(
+            status_code=429,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from None
+    try:
+        yield
+    finally:
+        admission.release()
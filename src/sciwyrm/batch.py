@@ -0,0 +1,123 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Rendering multiple notebooks in one request."""
+
+from __future__ import annotations
+
+import asyncio
+import zipfile
+from collections.abc import AsyncIterator, Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+from . import encoding
+
+
+@dataclass(frozen=True, slots=True)
+class BatchItem:
+    """Result of rendering one notebook of a batch."""
+
+    template_id: str
+    status_code: int
+    notebook: bytes | None = None
+    """The rendered notebook if successful."""
+    detail: Any = None
+    """Description of the error if not successful."""
+
+    @property
+    def ok(self) -> bool:
+        """Return True if the notebook was rendered successfully."""
+        return self.notebook is not None
+
+    def encode(self) -> bytes:
+        """Encode the item as JSON without re-encoding the notebook."""
+        head = encoding.dumps(
+            {"template_id": self.template_id, "status": self.status_code}
+        )
+        if self.notebook is not None:
+            return head[:-1] + b',"notebook":' + self.notebook + b"}"
+        return head[:-1] + b',"detail":' + encoding.dumps(self.detail) + b"}"
+
+
+def encode_json(items: Iterable[BatchItem]) -> bytes:
+    """Encode batch results as a JSON array."""
+    return b"[" + b",".join(item.encode() for item in items) + b"]"
+
+
+async def stream_zip(
+    items: Sequence[asyncio.Future[BatchItem]], *, compresslevel: int = 6
+) -> AsyncIterator[bytes]:
+    """Stream a ZIP archive of rendered notebooks.
+
+    Notebooks are written in the order of ``items`` as soon as they are available.
+    Failed items are listed in an ``errors.json`` file at the end of the archive.
+    If the stream is closed early, e.g., because the client disconnected,
+    the remaining items are cancelled.
+    """
+    sink = _ZipSink()
+    errors = []
+    try:
+        with zipfile.ZipFile(
+            sink,
+            mode="w",
+            compression=zipfile.ZIP_DEFLATED,
+            compresslevel=compresslevel,
+        ) as archive:
+            for index, pending in enumerate(items):
+                item = await pending
+                if item.notebook is None:
+                    errors.append(
+                        {
+                            "index": index,
+                            "template_id": item.template_id,
+                            "status": item.status_code,
+                            "detail": item.detail,
+                        }
+                    )
+                    continue
+                await run_in_threadpool(
+                    archive.writestr,
+                    f"{index:04d}-{item.template_id}.ipynb",
+                    item.notebook,
+                )
+                yield sink.take()
+            if errors:
+                archive.writestr("errors.json", encoding.dumps(errors, indent=True))
+        yield sink.take()
+    finally:
+        await _cancel(items)
+
+
+async def _cancel(items: Iterable[asyncio.Future[BatchItem]]) -> None:
+    pending = [item for item in items if not item.done()]
+    for item in pending:
+        item.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+class _ZipSink:
+    """Write-only file object that collects the output of a ZipFile.
+
+    It does not support ``tell`` and ``seek`` so ZipFile writes
+    a streamable archive with data descriptors.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
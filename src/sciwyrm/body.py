@@ -0,0 +1,121 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Request body parsing.
+
+FastAPI decodes JSON bodies into Python objects and then validates those
+against the body model.
+:func:`parse_json_body` instead validates the raw bytes in one pass with
+pydantic's JSON parser.
+Only if that fails, the body is parsed again like FastAPI does
+so that errors are reported in the same format.
+"""
+
+from __future__ import annotations
+
+import email.message
+import json
+from typing import Any, TypeVar
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+T = TypeVar("T")
+
+_REF_TEMPLATE = "#/components/schemas/{model}"
+
+
+async def parse_json_body(request: Request, adapter: TypeAdapter[T]) -> T:
+    """Parse and validate a JSON request body.
+
+    Raises
+    ------
+    fastapi.exceptions.RequestValidationError
+        If the body is not valid.
+        The errors are the same as for a body parameter of the endpoint.
+    """
+    body = await request.body()
+    if not body:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "missing",
+                    "loc": ("body",),
+                    "msg": "Field required",
+                    "input": None,
+                }
+            ]
+        )
+    data: Any = body
+    if _is_json(request.headers.get("content-type")):
+        try:
+            return adapter.validate_json(body)
+        except ValidationError:
+            # Fall back to FastAPI's parsing for errors and for inputs that
+            # the json module accepts but pydantic does not, e.g., UTF-16.
+            pass
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError as exc:
+            raise RequestValidationError(
+                [
+                    {
+                        "type": "json_invalid",
+                        "loc": ("body", exc.pos),
+                        "msg": "JSON decode error",
+                        "input": {},
+                        "ctx": {"error": exc.msg},
+                    }
+                ],
+                body=exc.doc,
+            ) from None
+    try:
+        return adapter.validate_python(data, from_attributes=True)
+    except ValidationError as exc:
+        raise RequestValidationError(
+            [
+                {**error, "loc": ("body", *error["loc"])}
+                for error in exc.errors(include_url=False)
+            ],
+            body=data,
+        ) from None
+
+
+def openapi_request_body(adapter: TypeAdapter[Any]) -> dict[str, Any]:
+    """Return the OpenAPI description of a JSON body for ``openapi_extra``.
+
+    Models are referenced from the components of the OpenAPI schema
+    like for body parameters.
+    Add them with :func:`openapi_components`.
+    """
+    schemas, _ = TypeAdapter.json_schemas(
+        [("body", "validation", adapter)], ref_template=_REF_TEMPLATE
+    )
+    return {
+        "requestBody": {
+            "content": {"application/json": {"schema": schemas["body", "validation"]}},
+            "required": True,
+        }
+    }
+
+
+def openapi_components(*adapters: TypeAdapter[Any]) -> dict[str, Any]:
+    """Return the schemas of models referenced by :func:`openapi_request_body`."""
+    _, definitions = TypeAdapter.json_schemas(
+        [(i, "validation", adapter) for i, adapter in enumerate(adapters)],
+        ref_template=_REF_TEMPLATE,
+    )
+    components: dict[str, Any] = definitions.get("$defs", {})
+    return components
+
+
+def _is_json(content_type: str | None) -> bool:
+    # Same rules as FastAPI: bodies without a content type are JSON.
+    if not content_type:
+        return True
+    message = email.message.Message()
+    message["content-type"] = content_type
+    if message.get_content_maintype() != "application":
+        return False
+    subtype = message.get_content_subtype()
+    return subtype == "json" or subtype.endswith("+json")
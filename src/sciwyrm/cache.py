@@ -0,0 +1,439 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Caching of rendered notebooks.
+
+The cache stores its entries in a :class:`CacheBackend`, either in memory or
+in a Redis server that is shared between replicas of the service.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Annotated, Any, ClassVar, Literal
+
+from fastapi import Depends
+from starlette.concurrency import run_in_threadpool
+
+from . import compression, encoding, metrics
+from .config import AppConfig, app_config
+
+if TYPE_CHECKING:
+    import redis
+
+
+@dataclass(frozen=True, slots=True)
+class CachedNotebook:
+    """A rendered notebook with its entity tag."""
+
+    body: bytes
+    etag: str
+    """ETag of the uncompressed notebook."""
+    content_encoding: compression.Coding | None = None
+    """Content coding of ``body`` or ``None`` if it is not compressed."""
+
+    @classmethod
+    def from_body(cls, body: bytes) -> CachedNotebook:
+        """Construct from a rendered notebook and compute its ETag."""
+        return cls(body=body, etag=make_etag(body))
+
+    def compress(self, coding: compression.Coding, level: int) -> CachedNotebook:
+        """Return a copy with a compressed body."""
+        return CachedNotebook(
+            body=compression.compress(self.body, coding, level),
+            etag=self.etag,
+            content_encoding=coding,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedResponse:
+    """A precomputed JSON response body with its entity tag."""
+
+    body: bytes
+    etag: str
+    _compressed: dict[tuple[compression.Coding, int], bytes] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    @classmethod
+    def from_content(cls, content: Any) -> EncodedResponse:
+        """Encode the content of a response and compute its ETag."""
+        body = encoding.dumps(content)
+        return cls(body=body, etag=make_etag(body))
+
+    def compressed(self, coding: compression.Coding, level: int) -> bytes:
+        """Return the body compressed with the given coding and level.
+
+        The result is stored, so every body is compressed at most once
+        per coding and level.
+        """
+        try:
+            return self._compressed[coding, level]
+        except KeyError:
+            compressed = compression.compress(self.body, coding, level)
+            self._compressed[coding, level] = compressed
+            return compressed
+
+
+def make_etag(body: bytes) -> str:
+    """Return a strong entity tag for a response body."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+class CacheUnavailableError(RuntimeError):
+    """A cache backend cannot be reached."""
+
+
+class CacheBackend(ABC):
+    """Storage for cache entries.
+
+    Backends store opaque bytes and must be safe to use from multiple threads.
+    """
+
+    blocking: ClassVar[bool] = False
+    """Whether operations perform I/O and must not run in the event loop."""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        """Return the value for a key, if any.
+
+        Raises
+        ------
+        CacheUnavailableError
+            If the backend cannot be reached.
+        """
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value.
+
+        Raises
+        ------
+        CacheUnavailableError
+            If the backend cannot be reached.
+        """
+
+    @abstractmethod
+    def clear(self, prefix: str) -> None:
+        """Remove all entries whose keys start with ``prefix``.
+
+        Raises
+        ------
+        CacheUnavailableError
+            If the backend cannot be reached.
+        """
+
+    def stats(self) -> dict[str, int]:
+        """Return statistics about the stored entries."""
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """LRU cache in process memory bounded by the total size of the values.
+
+    Parameters
+    ----------
+    max_bytes:
+        Maximum total size of all values.
+        Values larger than this are not stored.
+    ttl:
+        Seconds after which entries expire. 0 means never.
+    """
+
+    def __init__(self, max_bytes: int, *, ttl: float = 0) -> None:
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._size = 0
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """Total size of all cached values in bytes."""
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        """Return the value for a key, if any."""
+        with self._lock:
+            try:
+                value, expires = self._entries[key]
+            except KeyError:
+                return None
+            if expires < time.monotonic():
+                del self._entries[key]
+                self._size -= len(value)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value and evict the least recently used ones if needed."""
+        size = len(value)
+        if size > self._max_bytes:
+            return
+        expires = time.monotonic() + self._ttl if self._ttl else math.inf
+        with self._lock:
+            if (old := self._entries.pop(key, None)) is not None:
+                self._size -= len(old[0])
+            self._entries[key] = (value, expires)
+            self._size += size
+            while self._size > self._max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self, prefix: str) -> None:
+        """Remove all entries whose keys start with ``prefix``."""
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                value, _ = self._entries.pop(key)
+                self._size -= len(value)
+
+    def stats(self) -> dict[str, int]:
+        """Return the number and total size of entries."""
+        return {"entries": len(self._entries), "bytes": self._size}
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache in a Redis server that can be shared between replicas.
+
+    The size of the cache is limited by the ``maxmemory`` setting of the server,
+    which should be combined with an eviction policy like ``allkeys-lru``.
+    Requires the ``redis`` extra.
+
+    Parameters
+    ----------
+    client:
+        A :class:`redis.Redis` client or compatible object.
+    ttl:
+        Seconds after which entries expire. 0 means never.
+    """
+
+    blocking = True
+
+    def __init__(self, client: redis.Redis, *, ttl: int = 0) -> None:
+        self._client = client
+        self._ttl = ttl or None
+
+    @classmethod
+    def from_url(cls, url: str, *, ttl: int = 0, timeout: float) -> RedisCacheBackend:
+        """Connect to the server at ``url``, e.g., ``redis://cache:6379/0``.
+
+        ``timeout`` limits the time in seconds for connecting and for every operation.
+        """
+        import redis
+
+        client = redis.Redis.from_url(
+            url, socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+        return cls(client, ttl=ttl)
+
+    def get(self, key: str) -> bytes | None:
+        """Return the value for a key, if any."""
+        import redis
+
+        try:
+            value = self._client.get(key)
+        except redis.RedisError as exc:
+            raise CacheUnavailableError(str(exc)) from exc
+        # Clients must be created with decode_responses=False.
+        return value  # type: ignore[return-value]
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value."""
+        import redis
+
+        try:
+            self._client.set(key, value, ex=self._ttl)
+        except redis.RedisError as exc:
+            raise CacheUnavailableError(str(exc)) from exc
+
+    def clear(self, prefix: str) -> None:
+        """Remove all entries whose keys start with ``prefix``.
+
+        Entries are removed in batches, so concurrent writes may survive.
+        """
+        import redis
+
+        try:
+            batch = []
+            for key in self._client.scan_iter(match=f"{prefix}*", count=1000):
+                batch.append(key)
+                if len(batch) == 1000:
+                    self._client.unlink(*batch)
+                    batch.clear()
+            if batch:
+                self._client.unlink(*batch)
+        except redis.RedisError as exc:
+            raise CacheUnavailableError(str(exc)) from exc
+
+
+class RenderCache:
+    """Cache of rendered notebooks and validated specs.
+
+    Keys should be constructed with :func:`sciwyrm.notebook.render_key`.
+    If the backend is unavailable, lookups miss and nothing is stored
+    so that requests fall back to rendering.
+    After a failed operation, the backend is not used for ``backoff`` seconds
+    so that an outage costs at most one timeout instead of one per operation.
+
+    Parameters
+    ----------
+    backend:
+        Storage for the cache entries.
+    max_item_bytes:
+        Notebooks larger than this are not cached.
+    backoff:
+        Seconds to skip the backend after it failed.
+    """
+
+    def __init__(
+        self, backend: CacheBackend, *, max_item_bytes: int, backoff: float = 0
+    ) -> None:
+        self._backend = backend
+        self._max_item_bytes = max_item_bytes
+        self._backoff = backoff
+        self._unavailable_until = -math.inf
+
+    @property
+    def backend(self) -> CacheBackend:
+        """The storage for cache entries."""
+        return self._backend
+
+    async def get_notebook(self, key: str, variant: str = "") -> CachedNotebook | None:
+        """Return the cached notebook for a key, if any.
+
+        ``variant`` distinguishes different encodings of the same notebook,
+        e.g., compressed with different codings.
+        """
+        value = await self._call("get", f"{_NOTEBOOK_PREFIX}{variant}:{key}")
+        if value is None:
+            return None
+        etag, content_encoding, body = value.split(b"\n", 2)
+        return CachedNotebook(
+            body=body,
+            etag=etag.decode("ascii"),
+            content_encoding=content_encoding.decode("ascii") or None,
+        )
+
+    async def put_notebook(
+        self, key: str, notebook: CachedNotebook, variant: str = ""
+    ) -> None:
+        """Store a notebook unless it is too large."""
+        if len(notebook.body) > self._max_item_bytes:
+            return
+        value = b"\n".join(
+            (
+                notebook.etag.encode("ascii"),
+                (notebook.content_encoding or "").encode("ascii"),
+                notebook.body,
+            )
+        )
+        await self._call("set", f"{_NOTEBOOK_PREFIX}{variant}:{key}", value)
+
+    async def has_valid_spec(self, key: str) -> bool:
+        """Return whether the parameters for a key are known to be valid."""
+        return await self._call("get", f"{_SPEC_PREFIX}{key}") is not None
+
+    async def put_valid_spec(self, key: str) -> None:
+        """Remember that the parameters for a key are valid."""
+        await self._call("set", f"{_SPEC_PREFIX}{key}", b"1")
+
+    async def clear(self) -> None:
+        """Remove all notebooks and validated specs.
+
+        Raises
+        ------
+        CacheUnavailableError
+            If the backend cannot be reached.
+        """
+        if self._backend.blocking:
+            await run_in_threadpool(self._backend.clear, _PREFIX)
+        else:
+            self._backend.clear(_PREFIX)
+
+    def stats(self) -> dict[str, Any]:
+        """Return statistics about the cache in this process."""
+        return {
+            "backend": type(self._backend).__name__,
+            **self._backend.stats(),
+            "lookups": {
+                result: metrics.sample(
+                    "sciwyrm_render_cache_lookups_total", result=result
+                )
+                for result in ("hit", "miss")
+            },
+            "errors": {
+                operation: metrics.sample(
+                    "sciwyrm_render_cache_errors_total", operation=operation
+                )
+                for operation in ("get", "set")
+            },
+        }
+
+    async def _call(self, operation: Literal["get", "set"], *args: Any) -> Any:
+        if time.monotonic() < self._unavailable_until:
+            return None
+        fn = getattr(self._backend, operation)
+        try:
+            if self._backend.blocking:
+                return await run_in_threadpool(fn, *args)
+            return fn(*args)
+        except CacheUnavailableError as exc:
+            from .logging import get_logger
+
+            metrics.RENDER_CACHE_ERRORS.labels(operation).inc()
+            get_logger().warning(
+                "Render cache is unavailable, skipping it for %s s: %s",
+                self._backoff,
+                exc,
+            )
+            self._unavailable_until = time.monotonic() + self._backoff
+            return None
+
+
+_PREFIX = "sciwyrm:"
+_NOTEBOOK_PREFIX = f"{_PREFIX}notebook:"
+_SPEC_PREFIX = f"{_PREFIX}valid-spec:"
+
+
+def get_render_cache(
+    config: Annotated[AppConfig, Depends(app_config)]
+) -> RenderCache | None:
+    """Return the cache for rendered notebooks or None if caching is disabled."""
+    return _make_render_cache(
+        config.render_cache_max_bytes,
+        config.render_cache_url,
+        config.render_cache_max_item_bytes,
+        config.render_cache_ttl,
+        config.render_cache_timeout,
+        config.render_cache_backoff,
+    )
+
+
+@lru_cache(maxsize=1)
+def _make_render_cache(
+    max_bytes: int,
+    url: str | None,
+    max_item_bytes: int,
+    ttl: int,
+    timeout: float,
+    backoff: float,
+) -> RenderCache | None:
+    backend: CacheBackend
+    if url is not None:
+        backend = RedisCacheBackend.from_url(url, ttl=ttl, timeout=timeout)
+    elif max_bytes:
+        backend = MemoryCacheBackend(max_bytes, ttl=ttl)
+    else:
+        return None
+    return RenderCache(backend, max_item_bytes=max_item_bytes, backoff=backoff)
@@ -0,0 +1,174 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Structure-aware notebook templates.
+
+Templates with ``"template_format": "cells"`` in their config must be valid
+notebooks.
+Only cell sources may contain Jinja, and their rendered text is encoded as JSON
+by SciWyrm.
+So, unlike in text templates, values do not need to be escaped for JSON.
+The ``je`` filter only escapes line breaks in cell templates,
+``json_string`` and ``json_list`` produce plain string and list literals,
+and ``safe`` has no effect.
+Text templates can thus be converted by setting ``template_format``.
+
+The notebook is parsed once when the template is loaded.
+Cells without Jinja are encoded at that point and reused for every render.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator, Mapping
+from types import CodeType
+from typing import Any, TypeAlias
+
+from jinja2 import Environment, Template
+
+from . import encoding
+from .templates import HEADER_CELL_PLACEHOLDER, METADATA_PLACEHOLDER
+
+CompiledCells: TypeAlias = tuple[tuple[str | tuple[str, CodeType], ...], str, str]
+"""Compiled cell template.
+
+Consists of
+
+- one item per cell, either the encoded cell or the encoded cell without its
+  source and closing brace plus the compiled Jinja code of the source,
+- the encoded notebook metadata,
+- the encoded remaining top-level fields of the notebook.
+
+Only uses builtin types so that it can be stored with :mod:`marshal`.
+"""
+
+
+def compile_cells(
+    env: Environment, source: str, name: str, filename: str
+) -> CompiledCells:
+    """Parse a notebook template and compile the Jinja code in its cells.
+
+    Parameters
+    ----------
+    env:
+        Environment for compiling cell sources.
+    source:
+        The notebook template as JSON.
+    name:
+        Name of the template for error messages.
+    filename:
+        File name of the template for error messages.
+    """
+    notebook = encoding.loads(source)
+    cells: list[str | tuple[str, CodeType]] = []
+    for cell in notebook.pop("cells"):
+        cell_source = _join_source(cell.pop("source", ""))
+        if not _has_jinja(env, cell_source):
+            cells.append(_encode({**cell, "source": _split_source(cell_source)}))
+            continue
+        # Source must be last so that the rendered source can be appended.
+        cells.append(
+            (
+                _encode(cell)[:-1] + ("," if cell else "") + '"source":',
+                env.compile(cell_source, name=name, filename=filename),
+            )
+        )
+    metadata = notebook.pop("metadata", {})
+    metadata.pop("sciwyrm", None)
+    return tuple(cells), _encode(metadata), _encode(notebook)
+
+
+class CellTemplate:
+    """Notebook template that renders only the cell sources.
+
+    Provides ``render`` and ``generate`` like :class:`jinja2.Template`
+    so that it can be used in place of one.
+    The context must contain the encoded header cell and metadata under
+    ``HEADER_CELL_PLACEHOLDER`` and ``METADATA_PLACEHOLDER``.
+    """
+
+    def __init__(self, env: Environment, compiled: CompiledCells) -> None:
+        cells, metadata, rest = compiled
+        globals_ = env.make_globals(None)
+        # Merge consecutive static pieces so that rendering only has to
+        # alternate between one static string and one cell source.
+        self._parts: list[str | Template] = []
+        static = []
+        for cell in cells:
+            static.append(",")
+            if isinstance(cell, str):
+                static.append(cell)
+                continue
+            head, code = cell
+            static.append(head)
+            self._parts.append("".join(static))
+            self._parts.append(env.template_class.from_code(env, code, globals_))
+            static = ["}"]
+        static.append('],"metadata":')
+        static.append(metadata[:-1] + ("" if metadata == "{}" else ","))
+        static.append('"sciwyrm":')
+        self._parts.append("".join(static))
+        self._tail = "}" + ("}" if rest == "{}" else "," + rest[1:])
+
+    def render(self, context: Mapping[str, Any]) -> str:
+        """Render the notebook."""
+        return "".join(self.generate(context))
+
+    def generate(
+        self,
+        context: Mapping[str, Any],
+        *,
+        on_chunk: Callable[[str], None] | None = None,
+    ) -> Iterator[str]:
+        """Render the notebook piece by piece.
+
+        Cell sources are rendered completely before they are encoded and
+        yielded.
+        If given, ``on_chunk`` is called with every piece of a cell source
+        while it is rendered, e.g., to abort large or slow renders early.
+        """
+        yield '{"cells":['
+        yield context[HEADER_CELL_PLACEHOLDER]
+        for part in self._parts:
+            if isinstance(part, str):
+                yield part
+            elif on_chunk is None:
+                yield _encode(_split_source(part.render(context)))
+            else:
+                yield _encode(_split_source(_join_chunks(part, context, on_chunk)))
+        yield context[METADATA_PLACEHOLDER]
+        yield self._tail
+
+
+def _join_chunks(
+    template: Template,
+    context: Mapping[str, Any],
+    on_chunk: Callable[[str], None],
+) -> str:
+    chunks = []
+    for chunk in template.generate(context):
+        on_chunk(chunk)
+        chunks.append(chunk)
+    return "".join(chunks)
+
+
+def _has_jinja(env: Environment, source: str) -> bool:
+    return any(
+        marker in source
+        for marker in (
+            env.variable_start_string,
+            env.block_start_string,
+            env.comment_start_string,
+        )
+    )
+
+
+def _join_source(source: str | list[str]) -> str:
+    return source if isinstance(source, str) else "".join(source)
+
+
+def _split_source(source: str) -> list[str]:
+    # Store sources as lists of lines like Jupyter does.
+    return source.splitlines(keepends=True)
+
+
+def _encode(obj: Any) -> str:
+    return encoding.dumps(obj).decode("utf-8")
@@ -0,0 +1,110 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Command line interface."""
+
+import argparse
+import sys
+from pathlib import Path
+
+from .compiled import TemplateManifest, default_compiled_dir, write_manifest
+from .config import AppConfig
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the ``sciwyrm`` command."""
+    parser = argparse.ArgumentParser(prog="sciwyrm")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = subparsers.add_parser(
+        "compile-templates",
+        help="Compile all templates ahead of time",
+        description="Compile all notebook templates and write them together with "
+        "their configs and hashes to a directory that the server loads at startup.",
+    )
+    compile_parser.add_argument(
+        "--template-dir",
+        type=Path,
+        help="Template directory, defaults to template_dir from the app config",
+    )
+    compile_parser.add_argument(
+        "--output",
+        type=Path,
+        help="Output directory, defaults to compiled_template_dir "
+        "from the app config or '.compiled' in the template directory",
+    )
+    compile_parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only check whether the compiled templates are up to date",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Run the server with multiple worker processes",
+        description="Run the server with gunicorn and uvicorn workers. "
+        "Templates are loaded once before the workers are started. "
+        "Requires the 'server' extra.",
+    )
+    serve_parser.add_argument(
+        "--bind", default="0.0.0.0:8000", help="Address to listen on"
+    )
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of workers, defaults to server_workers from the app config "
+        "or the number of CPUs",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        return _serve(args)
+    return _compile_templates(args)
+
+
+def _serve(args: argparse.Namespace) -> int:
+    try:
+        from .server import serve
+    except ImportError as exc:
+        raise SystemExit(
+            f"{exc}\nInstall 'sciwyrm[server]' to use 'sciwyrm serve'."
+        ) from None
+
+    from .config import app_config
+
+    serve(app_config(), bind=args.bind, workers=args.workers)
+    return 0
+
+
+def _compile_templates(args: argparse.Namespace) -> int:
+    from .templates import compile_templates
+
+    template_dir = args.template_dir
+    output = args.output
+    if template_dir is None or output is None:
+        config = AppConfig()
+        template_dir = template_dir or config.template_dir
+        output = output or config.compiled_template_dir
+    output = output or default_compiled_dir(template_dir)
+
+    templates = compile_templates(template_dir)
+    hashes = {
+        template_id: compiled.template_hash
+        for template_id, compiled in templates.items()
+    }
+    if args.check:
+        manifest = TemplateManifest.load(output)
+        if manifest is None or manifest.template_hashes() != hashes:
+            print(f"Compiled templates in {output} are out of date")  # noqa: T201
+            return 1
+        print(f"Compiled templates in {output} are up to date")  # noqa: T201
+        return 0
+
+    write_manifest(output, templates)
+    for template_id in hashes:
+        print(f"Compiled {template_id}")  # noqa: T201
+    print(f"Wrote {len(templates)} templates to {output}")  # noqa: T201
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Coalescing of identical concurrent requests."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Share the result of concurrent calls with the same key.
+
+    The first call for a key, the leader, runs its function in a task.
+    Calls with the same key that arrive while the task is running wait for it
+    and receive its result or exception instead of running their own function.
+    Cancelling a waiting call does not cancel the task,
+    so that the other callers still receive the result.
+
+    Keys must identify everything that the result depends on.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[str, asyncio.Task[T]] = {}
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Return the result of ``fn`` or of an in-flight call with the same key.
+
+        Returns
+        -------
+        :
+            The result and whether this call was the leader.
+        """
+        task = self._in_flight.get(key)
+        leader = task is None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), leader
+
+    def in_flight(self) -> int:
+        """Return the number of running calls."""
+        return len(self._in_flight)
+
+    def _finish(self, key: str, task: asyncio.Task[T]) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case all callers were cancelled.
+            task.exception()
@@ -0,0 +1,176 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Ahead-of-time compiled notebook templates.
+
+``sciwyrm compile-templates`` writes the compiled code and parsed config of every
+template into a directory together with a manifest of template hashes,
+file sizes, and modification times.
+:class:`sciwyrm.templates.TemplateRegistry` uses the compiled code instead of
+compiling a template if the sizes and modification times in the manifest match
+the template files.
+Otherwise, it reads and hashes the files and uses the compiled code
+if the hash matches.
+
+Compiled code is stored with :mod:`marshal` and is thus specific to the versions
+of Python, Jinja, and SciWyrm that produced it.
+Manifests written by other versions are ignored.
+"""
+
+from __future__ import annotations
+
+import importlib.metadata
+import importlib.util
+import marshal
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from types import CodeType
+from typing import Any
+
+import jinja2
+
+from . import encoding
+
+MANIFEST_NAME = "manifest.json"
+_FORMAT_VERSION = 4
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledTemplate:
+    """Compiled code and parsed config of a template."""
+
+    template_hash: str
+    config: dict[str, Any]
+    """Fields of the template config without the hash."""
+    code: CodeType | tuple[Any, ...]
+    """Jinja code or :data:`sciwyrm.cells.CompiledCells`."""
+    signature: tuple[int, ...] = ()
+    """Sizes and modification times of the template files that were compiled."""
+
+
+class TemplateManifest:
+    """Index of compiled templates in a directory.
+
+    Use :meth:`load` to read an existing manifest and :func:`write_manifest`
+    to create one.
+    """
+
+    def __init__(self, directory: Path, entries: Mapping[str, dict[str, Any]]) -> None:
+        self._directory = directory
+        self._entries = entries
+
+    @classmethod
+    def load(cls, directory: Path) -> TemplateManifest | None:
+        """Read the manifest in ``directory``.
+
+        Returns
+        -------
+        :
+            The manifest or ``None`` if there is no manifest or if it was
+            written by incompatible versions of Python, Jinja, or SciWyrm.
+        """
+        from .logging import get_logger
+
+        try:
+            content = encoding.loads((directory / MANIFEST_NAME).read_bytes())
+        except FileNotFoundError:
+            return None
+        if content.get("versions") != _versions():
+            get_logger().warning(
+                "Ignoring compiled templates in %s because they were compiled "
+                "with different versions: %s",
+                directory,
+                content.get("versions"),
+            )
+            return None
+        return cls(directory, content["templates"])
+
+    def template_hashes(self) -> dict[str, str]:
+        """Return the hashes of all templates in the manifest by template ID."""
+        return {
+            template_id: entry["template_hash"]
+            for template_id, entry in self._entries.items()
+        }
+
+    def get(self, template_id: str, template_hash: str) -> CompiledTemplate | None:
+        """Return a compiled template if it matches the given hash."""
+        entry = self._entries.get(template_id)
+        if entry is None or entry["template_hash"] != template_hash:
+            return None
+        return self._read(entry)
+
+    def get_unchanged(
+        self, template_id: str, signature: tuple[int, ...]
+    ) -> CompiledTemplate | None:
+        """Return a compiled template if its files have not changed since compiling.
+
+        This only compares file sizes and modification times
+        and does not need to read the template files.
+        """
+        entry = self._entries.get(template_id)
+        if entry is None or tuple(entry["signature"]) != signature:
+            return None
+        return self._read(entry)
+
+    def _read(self, entry: dict[str, Any]) -> CompiledTemplate:
+        # Compiled templates are as trusted as the template files themselves
+        # because both are executed.
+        code = marshal.loads(  # noqa: S302
+            (self._directory / entry["code"]).read_bytes()
+        )
+        return CompiledTemplate(
+            template_hash=entry["template_hash"],
+            config=dict(entry["config"]),
+            code=code,
+            signature=tuple(entry["signature"]),
+        )
+
+
+def write_manifest(
+    directory: Path, templates: Mapping[str, CompiledTemplate]
+) -> TemplateManifest:
+    """Write compiled templates and their manifest to ``directory``.
+
+    Existing files for other templates are removed.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / MANIFEST_NAME).unlink(missing_ok=True)
+    for stale in directory.glob("*.code"):
+        stale.unlink()
+
+    entries = {}
+    for template_id, compiled in templates.items():
+        code_name = f"{template_id}.code"
+        (directory / code_name).write_bytes(marshal.dumps(compiled.code))
+        entries[template_id] = {
+            "template_hash": compiled.template_hash,
+            "config": compiled.config,
+            "code": code_name,
+            "signature": list(compiled.signature),
+        }
+    # Write the manifest last so that readers never see it without the code.
+    (directory / MANIFEST_NAME).write_bytes(
+        encoding.dumps(
+            {"versions": _versions(), "templates": entries},
+            indent=True,
+        )
+    )
+    return TemplateManifest(directory, entries)
+
+
+def default_compiled_dir(template_dir: Path) -> Path:
+    """Return the default location of compiled templates for ``template_dir``."""
+    return template_dir / ".compiled"
+
+
+def _versions() -> dict[str, str]:
+    try:
+        sciwyrm_version = importlib.metadata.version("sciwyrm")
+    except importlib.metadata.PackageNotFoundError:
+        sciwyrm_version = "unknown"
+    return {
+        "format": str(_FORMAT_VERSION),
+        "python": importlib.util.MAGIC_NUMBER.hex(),
+        "jinja2": jinja2.__version__,
+        "sciwyrm": sciwyrm_version,
+    }
@@ -0,0 +1,319 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""HTTP response compression.
+
+Supports gzip and, if the ``compression`` extra is installed,
+brotli and zstd.
+:class:`CompressionMiddleware` compresses the responses of all endpoints
+according to the ``Accept-Encoding`` header of the request.
+Endpoints can compress responses themselves, e.g., to reuse compressed bodies,
+and set ``Content-Encoding`` to bypass the middleware.
+"""
+
+from __future__ import annotations
+
+import gzip
+import importlib
+import zlib
+from collections.abc import Callable
+from functools import lru_cache
+from types import ModuleType
+from typing import Literal, Protocol
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import AppConfig
+
+Coding = Literal["zstd", "br", "gzip"]
+
+
+def _import_optional(name: str) -> ModuleType | None:
+    try:
+        return importlib.import_module(name)
+    except ImportError:  # pragma: no cover
+        return None
+
+
+brotli = _import_optional("brotli")
+zstandard = _import_optional("zstandard")
+
+_MODULES: dict[Coding, ModuleType | None] = {
+    "zstd": zstandard,
+    "br": brotli,
+    "gzip": gzip,
+}
+AVAILABLE: frozenset[Coding] = frozenset(
+    coding for coding, module in _MODULES.items() if module is not None
+)
+"""Content codings whose libraries are installed."""
+
+# Compress larger bodies in a thread to not block the event loop.
+_THREAD_THRESHOLD = 64 * 1024
+
+
+class StreamCompressor(Protocol):
+    """Incremental compressor for streamed responses."""
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so that clients can decode it."""
+
+    def finish(self) -> bytes:
+        """End the stream."""
+
+
+def compress(data: bytes, coding: Coding, level: int) -> bytes:
+    """Compress a complete body."""
+    if coding == "gzip":
+        # mtime=0 makes the output reproducible.
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    # Only codings in AVAILABLE are selected, so the modules are not None.
+    compressed: bytes
+    if coding == "br":
+        compressed = _module(brotli).compress(data, quality=level)
+    else:
+        compressed = _module(zstandard).ZstdCompressor(level=level).compress(data)
+    return compressed
+
+
+def stream_compressor(coding: Coding, level: int) -> StreamCompressor:
+    """Return a compressor for a streamed body."""
+    if coding == "gzip":
+        return _GzipCompressor(level)
+    if coding == "br":
+        return _BrotliCompressor(level)
+    return _ZstdCompressor(level)
+
+
+def negotiate(accept_encoding: str | None, config: AppConfig) -> Coding | None:
+    """Select a content coding for a response.
+
+    Picks the coding with the highest quality value in ``accept_encoding``
+    and uses the order in ``config.compression_encodings`` to break ties.
+
+    Returns
+    -------
+    :
+        The selected coding or ``None`` if the response should not be compressed.
+    """
+    if not accept_encoding:
+        return None
+    accepted = _parse_accept_encoding(accept_encoding)
+    selected, selected_q = None, 0.0
+    for coding in config.compression_encodings:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > selected_q and coding in AVAILABLE:
+            selected, selected_q = coding, q
+    return selected
+
+
+def level(coding: Coding, config: AppConfig) -> int:
+    """Return the configured compression level for a coding."""
+    if coding == "gzip":
+        return config.compression_gzip_level
+    if coding == "br":
+        return config.compression_brotli_level
+    return config.compression_zstd_level
+
+
+def set_encoded_headers(headers: MutableHeaders, coding: Coding) -> None:
+    """Mark a response as compressed."""
+    headers["Content-Encoding"] = coding
+    headers.add_vary_header("Accept-Encoding")
+    if (etag := headers.get("ETag")) is not None:
+        headers["ETag"] = encoded_etag(etag, coding)
+
+
+def encoded_etag(etag: str, coding: Coding) -> str:
+    """Return the entity tag of a compressed representation.
+
+    Compressed representations need their own entity tags, see RFC 9110, 8.8.3.
+    """
+    return etag.removesuffix('"') + f'-{coding}"'
+
+
+@lru_cache(maxsize=64)
+def _parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    # Clients send the same few headers over and over.
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    return accepted
+
+
+def _module(module: ModuleType | None) -> ModuleType:
+    if module is None:  # pragma: no cover
+        raise RuntimeError("Compression library is not installed")
+    return module
+
+
+def _is_compressible(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type == "application/json"
+        or media_type.endswith("+json")
+    )
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses responses.
+
+    Responses are compressed if the client accepts one of the configured codings,
+    the content type is text or JSON, and the body is at least
+    ``compression_min_size`` bytes long.
+    Streamed responses are compressed chunk by chunk.
+
+    Parameters
+    ----------
+    app:
+        The wrapped application.
+    get_config:
+        Returns the current app config.
+    """
+
+    def __init__(self, app: ASGIApp, *, get_config: Callable[[], AppConfig]) -> None:
+        self.app = app
+        self._get_config = get_config
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        config = self._get_config()
+        if not config.compression_encodings:
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(Headers(scope=scope).get("accept-encoding"), config)
+        responder = _CompressingResponder(send, coding, config)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingResponder:
+    def __init__(self, send: Send, coding: Coding | None, config: AppConfig) -> None:
+        self._send = send
+        self._coding = coding
+        self._level = 0 if coding is None else level(coding, config)
+        self._min_size = config.compression_min_size
+        self._start: Message | None = None
+        self._stream: StreamCompressor | None = None
+        self._passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if self._passthrough:
+            await self._send(message)
+        elif message["type"] == "http.response.start":
+            if self._on_start(message):
+                await self._send(message)
+        elif message["type"] == "http.response.body":
+            await self._on_body(message)
+        else:
+            await self._send(message)
+
+    def _on_start(self, message: Message) -> bool:
+        # Returns whether to pass the response through without compressing it.
+        headers = MutableHeaders(raw=message["headers"])
+        if "content-encoding" in headers or not _is_compressible(
+            headers.get("content-type", "")
+        ):
+            self._passthrough = True
+            return True
+        # Responses depend on Accept-Encoding even if they are not compressed.
+        headers.add_vary_header("Accept-Encoding")
+        if self._coding is None or message["status"] in (204, 304):
+            self._passthrough = True
+            return True
+        self._start = message
+        return False
+
+    async def _on_body(self, message: Message) -> None:
+        assert self._start is not None  # noqa: S101
+        assert self._coding is not None  # noqa: S101
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._stream is None:
+            headers = MutableHeaders(raw=self._start["headers"])
+            if not more_body:
+                await self._send_complete(headers, body)
+                return
+            set_encoded_headers(headers, self._coding)
+            del headers["Content-Length"]
+            self._stream = stream_compressor(self._coding, self._level)
+            await self._send(self._start)
+
+        chunk = self._stream.compress(body)
+        if not more_body:
+            chunk += self._stream.finish()
+        await self._send(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
+
+    async def _send_complete(self, headers: MutableHeaders, body: bytes) -> None:
+        assert self._start is not None  # noqa: S101
+        assert self._coding is not None  # noqa: S101
+        self._passthrough = True
+        if len(body) >= self._min_size:
+            if len(body) >= _THREAD_THRESHOLD:
+                body = await run_in_threadpool(
+                    compress, body, self._coding, self._level
+                )
+            else:
+                body = compress(body, self._coding, self._level)
+            set_encoded_headers(headers, self._coding)
+            headers["Content-Length"] = str(len(body))
+        await self._send(self._start)
+        await self._send({"type": "http.response.body", "body": body})
+
+
+class _GzipCompressor:
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, level: int) -> None:
+        self._compressor = _module(brotli).Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        compressed: bytes = self._compressor.process(data) + self._compressor.flush()
+        return compressed
+
+    def finish(self) -> bytes:
+        compressed: bytes = self._compressor.finish()
+        return compressed
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int) -> None:
+        zstd = _module(zstandard)
+        self._compressor = zstd.ZstdCompressor(level=level).compressobj()
+        self._flush_block = zstd.COMPRESSOBJ_FLUSH_BLOCK
+
+    def compress(self, data: bytes) -> bytes:
+        compressed: bytes = self._compressor.compress(data)
+        flushed: bytes = self._compressor.flush(self._flush_block)
+        return compressed + flushed
+
+    def finish(self) -> bytes:
+        compressed: bytes = self._compressor.flush()
+        return compressed
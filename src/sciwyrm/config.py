@@ -5,8 +5,9 @@
 import json
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Generator
+from typing import Any, Generator, Literal
 
+from pydantic import Field, SecretStr, model_validator
 from pydantic.fields import FieldInfo
 from pydantic_settings import (
     BaseSettings,
@@ -48,16 +49,246 @@ class _JSONFileSettingsSource(PydanticBaseSettingsSource):
             yield field_key, field_value
 
     def __call__(self) -> dict[str, Any]:
-        return dict(self._get_fields())
+        # Skip fields that are not in the file to use their defaults.
+        return {key: value for key, value in self._get_fields() if value is not None}
 
 
 class AppConfig(BaseSettings):
     """Sciwyrm application config."""
 
     template_dir: Path
+    template_reload_interval: float = Field(
+        default=5.0,
+        ge=0,
+        description="Seconds between checks for changed templates. "
+        "0 disables reloading.",
+    )
+    compiled_template_dir: Path | None = Field(
+        default=None,
+        description="Directory with templates compiled by 'sciwyrm compile-templates'. "
+        "Defaults to '.compiled' in template_dir.",
+    )
+    template_cache_max_age: int = Field(
+        default=0,
+        ge=0,
+        description="Seconds that clients may cache the template list and schemas "
+        "without revalidating. 0 means that clients must always revalidate.",
+    )
+    deterministic_render: bool = Field(
+        default=False,
+        description="Render identical notebooks for identical requests. "
+        "This omits the render time and derives the header cell id from the template.",
+    )
+    render_cache_max_bytes: int = Field(
+        default=0,
+        ge=0,
+        description="Maximum total size of rendered notebooks cached in memory. "
+        "0 disables the in-memory cache. Requires deterministic_render.",
+    )
+    render_cache_url: str | None = Field(
+        default=None,
+        description="URL of a Redis server for caching rendered notebooks, "
+        "e.g., 'redis://cache:6379/0'. Replaces the in-memory cache so that "
+        "replicas can share the cache. Requires deterministic_render.",
+    )
+    render_cache_max_item_bytes: int = Field(
+        default=16 * 1024 * 1024,
+        ge=1,
+        description="Rendered notebooks larger than this are not cached.",
+    )
+    render_cache_ttl: int = Field(
+        default=0,
+        ge=0,
+        description="Seconds after which cache entries expire. 0 means never.",
+    )
+    render_cache_timeout: float = Field(
+        default=0.5,
+        gt=0,
+        description="Seconds to wait for the Redis server before rendering "
+        "without the cache.",
+    )
+    render_cache_backoff: float = Field(
+        default=5,
+        ge=0,
+        description="Seconds to render without the cache after an operation "
+        "on the Redis server failed, so that an outage does not add a timeout "
+        "to every cache operation.",
+    )
+    coalesce_renders: bool = Field(
+        default=True,
+        description="Render a notebook only once for concurrent requests with "
+        "the same template and parameters and send the result to all of them.",
+    )
+    render_pool: Literal["thread", "process"] = Field(
+        default="thread",
+        description="Render notebooks in a pool of threads or processes.",
+    )
+    render_workers: int = Field(
+        default=4, ge=1, description="Number of threads or processes for rendering."
+    )
+    render_queue_size: int = Field(
+        default=64,
+        ge=0,
+        description="Number of renders that can wait for a worker. "
+        "Further requests are rejected with 503.",
+    )
+    render_max_seconds: float = Field(
+        default=30.0,
+        ge=0,
+        description="Abort renders that take longer than this many seconds "
+        "with 422. 0 disables the limit. Templates can set a lower limit.",
+    )
+    render_max_bytes: int = Field(
+        default=256 * 1024 * 1024,
+        ge=0,
+        description="Abort renders that produce larger notebooks with 413. "
+        "0 disables the limit. Templates can set a lower limit.",
+    )
+    render_max_array_length: int = Field(
+        default=1_000_000,
+        ge=0,
+        description="Reject requests with longer arrays in their parameters "
+        "with 413. 0 disables the limit. Templates can set a lower limit.",
+    )
+    rate_limit_per_second: float = Field(
+        default=0,
+        ge=0,
+        description="Number of render requests per second that each client "
+        "can send on average. Further requests are rejected with 429. "
+        "0 disables rate limiting.",
+    )
+    rate_limit_burst: int = Field(
+        default=10,
+        ge=1,
+        description="Number of render requests that a client can send at once "
+        "before rate_limit_per_second applies.",
+    )
+    rate_limit_client_header: str | None = Field(
+        default=None,
+        description="Identify clients for rate limiting by this header, e.g., "
+        "'X-Forwarded-For' behind a proxy, instead of their IP address. "
+        "The value is taken from the right of the comma-separated list, "
+        "skipping rate_limit_trusted_proxies values, because clients can "
+        "prepend arbitrary values.",
+    )
+    rate_limit_trusted_proxies: int = Field(
+        default=0,
+        ge=0,
+        description="Number of trusted proxies in front of the service that "
+        "append to rate_limit_client_header, excluding the proxy that "
+        "connects to the service.",
+    )
+    render_max_concurrent_requests: int = Field(
+        default=0,
+        ge=0,
+        description="Maximum number of render requests that are handled "
+        "at the same time per process. Further requests are rejected with 429. "
+        "0 disables the limit.",
+    )
+    stream_chunk_size: int = Field(
+        default=64 * 1024,
+        ge=1024,
+        description="Approximate number of characters per chunk "
+        "of streamed notebooks.",
+    )
+    batch_max_size: int = Field(
+        default=100,
+        ge=1,
+        description="Maximum number of notebooks in one batch request.",
+    )
+    batch_max_concurrency: int = Field(
+        default=4,
+        ge=1,
+        description="Maximum number of notebooks of one batch rendered concurrently.",
+    )
+    compression_encodings: list[Literal["zstd", "br", "gzip"]] = Field(
+        default=["zstd", "br", "gzip"],
+        description="Content codings for compressing responses in order of "
+        "preference. Codings whose libraries are not installed are skipped. "
+        "An empty list disables compression.",
+    )
+    compression_min_size: int = Field(
+        default=1024,
+        ge=0,
+        description="Responses smaller than this many bytes are not compressed.",
+    )
+    compression_gzip_level: int = Field(
+        default=6, ge=1, le=9, description="Compression level for gzip."
+    )
+    compression_brotli_level: int = Field(
+        default=4, ge=0, le=11, description="Compression level (quality) for brotli."
+    )
+    compression_zstd_level: int = Field(
+        default=3, ge=1, le=22, description="Compression level for zstd."
+    )
+    admin_token: SecretStr | None = Field(
+        default=None,
+        description="Bearer token for the /admin endpoints. "
+        "The endpoints are disabled if unset.",
+    )
+    profile_dir: Path | None = Field(
+        default=None,
+        description="Directory for storing profiles of render requests.",
+    )
+    profile_format: Literal["html", "speedscope"] = Field(
+        default="html",
+        description="Format of profiles if pyinstrument is installed. "
+        "Otherwise, profiles are cProfile stats.",
+    )
+    profile_sample_rate: int = Field(
+        default=0,
+        ge=0,
+        description="Profile every Nth request to POST /notebook and store the "
+        "profile in profile_dir. 0 disables sampling.",
+    )
+    warm_up_templates: bool = Field(
+        default=False,
+        description="Render every template once at startup so that the first "
+        "request does not pay for loading the rendering code.",
+    )
+    server_workers: int | None = Field(
+        default=None,
+        ge=1,
+        description="Number of worker processes of 'sciwyrm serve'. "
+        "Defaults to the number of CPUs.",
+    )
+    server_max_requests: int = Field(
+        default=0,
+        ge=0,
+        description="Restart a worker after it has handled this many requests. "
+        "0 disables restarts.",
+    )
+    server_max_requests_jitter: int = Field(
+        default=0,
+        ge=0,
+        description="Random number of requests up to this value added to "
+        "server_max_requests so that workers do not restart at the same time.",
+    )
+    server_graceful_timeout: int = Field(
+        default=30,
+        ge=1,
+        description="Seconds that restarting workers have to finish "
+        "their current requests.",
+    )
 
     model_config = SettingsConfigDict(env_prefix="sciwyrm_")
 
+    @model_validator(mode="after")
+    def check_render_cache(self) -> "AppConfig":
+        """Check that the render cache can be used."""
+        if self.render_cache_max_bytes and not self.deterministic_render:
+            raise ValueError("render_cache_max_bytes requires deterministic_render")
+        if self.render_cache_url and not self.deterministic_render:
+            raise ValueError("render_cache_url requires deterministic_render")
+        return self
+
+    @model_validator(mode="after")
+    def check_profiling(self) -> "AppConfig":
+        """Check that sampled profiles can be stored."""
+        if self.profile_sample_rate and self.profile_dir is None:
+            raise ValueError("profile_sample_rate requires profile_dir")
+        return self
+
     @classmethod
     def settings_customise_sources(
         cls,
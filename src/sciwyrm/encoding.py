@@ -0,0 +1,84 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""JSON encoding and decoding.
+
+Uses `orjson <https://github.com/ijl/orjson>`_ if it is installed
+and the standard library otherwise.
+Install the ``fast`` extra to get orjson.
+
+Both backends produce compact UTF-8 encoded JSON without escaping
+non-ASCII characters, so the output only differs in the formatting of floats.
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+from types import ModuleType
+from typing import Any
+
+from fastapi import responses
+
+
+def _import_orjson() -> ModuleType | None:
+    try:
+        return importlib.import_module("orjson")
+    except ImportError:  # pragma: no cover
+        return None
+
+
+orjson = _import_orjson()
+
+BACKEND = "json" if orjson is None else "orjson"
+"""Name of the JSON library in use."""
+
+
+def dumps(obj: Any, *, indent: bool = False) -> bytes:
+    """Encode an object as JSON.
+
+    Parameters
+    ----------
+    obj:
+        Object to encode.
+        Must consist only of types that the standard ``json`` module supports.
+    indent:
+        If true, indent nested structures by two spaces.
+
+    Returns
+    -------
+    :
+        UTF-8 encoded JSON.
+    """
+    if orjson is not None:
+        try:
+            encoded: bytes = orjson.dumps(
+                obj, option=orjson.OPT_INDENT_2 if indent else None
+            )
+            return encoded
+        except orjson.JSONEncodeError:
+            # E.g., integers that do not fit into 64 bits.
+            pass
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        separators=(",", ": ") if indent else (",", ":"),
+    ).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    """Decode JSON.
+
+    Note that orjson decodes integers that do not fit into 64 bits as floats.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class JSONResponse(responses.JSONResponse):
+    """JSON response that uses :func:`dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        """Encode the response body."""
+        return dumps(content)
@@ -2,71 +2,598 @@
 # Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
 """The SciWyrm application."""
 
-import json
-from typing import Annotated
+import asyncio
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Annotated, Any, Literal
 
-from fastapi import Depends, FastAPI, Request, Response
+import anyio
+import prometheus_client
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from fastapi.templating import Jinja2Templates
-from pydantic import ValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
 
-from . import notebook
+from . import (
+    admin,
+    admission,
+    batch,
+    body,
+    compression,
+    encoding,
+    metrics,
+    notebook,
+    profiling,
+    workers,
+)
+from .cache import CachedNotebook, EncodedResponse, RenderCache, get_render_cache
+from .coalescing import SingleFlight
 from .config import AppConfig, app_config
 from .templates import (
-    get_notebook_template_config,
-    get_templates,
-    notebook_template_path,
+    NotebookTemplate,
+    TemplateSnapshot,
+    TemplateSummary,
+    get_template_registry,
+    get_template_snapshot,
 )
+from .workers import RenderPool, get_render_pool
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Load all templates before serving the first request.
+    config = _current_config()
+    registry = get_template_registry(config)
+    if config.warm_up_templates:
+        await run_in_threadpool(
+            notebook.warm_up_templates,
+            registry.snapshot,
+            deterministic=config.deterministic_render,
+        )
+    registry.start_watching()
+    yield
+    registry.stop_watching()
+    get_render_pool(config).shutdown()
+
+
+def _current_config() -> AppConfig:
+    # For code that does not support dependency injection.
+    config: AppConfig = app.dependency_overrides.get(app_config, app_config)()
+    return config
+
 
-app = FastAPI()
+app = FastAPI(lifespan=_lifespan, default_response_class=encoding.JSONResponse)
+app.add_middleware(compression.CompressionMiddleware, get_config=_current_config)
+app.add_middleware(metrics.RequestMetricsMiddleware)
+app.include_router(admin.router)
 
 
-@app.get("/notebook/templates", response_description="Available templates")
+def _openapi() -> dict[str, Any]:
+    if app.openapi_schema is not None:
+        return app.openapi_schema
+    schema = FastAPI.openapi(app)
+    # FastAPI does not know the models of bodies parsed by sciwyrm.body.
+    schema["components"]["schemas"].update(
+        body.openapi_components(_NOTEBOOK_SPEC, _NOTEBOOK_SPECS)
+    )
+    return schema
+
+
+app.openapi = _openapi  # type: ignore[method-assign]
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    """Return metrics in the Prometheus text format."""
+    return Response(
+        metrics.generate_latest(),
+        media_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
+
+@app.get(
+    "/notebook/templates",
+    response_model=list[TemplateSummary],
+    response_description="Available templates",
+)
 async def list_templates(
-    config: Annotated[AppConfig, Depends(app_config)]
-) -> list[notebook.TemplateSummary]:
-    """Return a list of available notebook templates."""
-    return notebook.available_templates(config)
+    config: Annotated[AppConfig, Depends(app_config)],
+    templates: Annotated[TemplateSnapshot, Depends(get_template_snapshot)],
+    if_none_match: Annotated[str | None, Header()] = None,
+    accept_encoding: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Return a list of available notebook templates.
 
+    The response is encoded and compressed once per version of the templates.
+    """
+    return _encoded_response(
+        templates.summaries_response, config, if_none_match, accept_encoding
+    )
 
-def _inject_app_config(
-    spec: notebook.NotebookSpec, config: Annotated[AppConfig, Depends(app_config)]
-) -> notebook.NotebookSpecWithConfig:
+
+def _get_template(templates: TemplateSnapshot, template_id: str) -> NotebookTemplate:
+    # All templates are in memory, so unknown IDs never touch the file system.
     try:
-        return spec.with_config(get_notebook_template_config(spec.template_id, config))
-    except ValidationError as exc:
-        # FastAPI cannot handle a ValidationError at this point.
-        # So make it look like this came from the initial spec.
-        errors = exc.errors()
-        for error in errors:
-            error["input"].pop("config")
-        raise RequestValidationError(errors) from None
+        template = templates[template_id]
+    except KeyError:
+        metrics.TEMPLATE_LOOKUPS.labels("miss").inc()
+        raise HTTPException(
+            status_code=404, detail=f"Unknown template: {template_id}"
+        ) from None
+    metrics.TEMPLATE_LOOKUPS.labels("hit").inc()
+    return template
 
 
 @app.get(
     "/notebook/schema/{template_id}",
+    response_model=dict[str, object],
     response_description="JSON schema for rendering notebook",
 )
 async def template_schema(
-    template_id: str, config: Annotated[AppConfig, Depends(app_config)]
-) -> dict[str, object]:
-    """Return the JSON schema for a notebook template."""
-    return notebook.template_parameter_schema(config, template_id)
+    template_id: str,
+    config: Annotated[AppConfig, Depends(app_config)],
+    templates: Annotated[TemplateSnapshot, Depends(get_template_snapshot)],
+    if_none_match: Annotated[str | None, Header()] = None,
+    accept_encoding: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Return the JSON schema for a notebook template.
+
+    The response is encoded and compressed once per version of the template.
+    """
+    _get_template(templates, template_id)  # Respond with 404 if unknown.
+    return _encoded_response(
+        templates.schema_responses[template_id],
+        config,
+        if_none_match,
+        accept_encoding,
+    )
+
 
+def _encoded_response(
+    encoded: EncodedResponse,
+    config: AppConfig,
+    if_none_match: str | None,
+    accept_encoding: str | None,
+) -> Response:
+    cache_control = _template_cache_control(config)
+    coding = compression.negotiate(accept_encoding, config)
+    if coding is None or len(encoded.body) < config.compression_min_size:
+        return _conditional_response(
+            encoded.body, encoded.etag, if_none_match, cache_control=cache_control
+        )
+    return _conditional_response(
+        encoded.compressed(coding, compression.level(coding, config)),
+        encoded.etag,
+        if_none_match,
+        content_encoding=coding,
+        cache_control=cache_control,
+    )
+
+
+def _template_cache_control(config: AppConfig) -> str:
+    if config.template_cache_max_age == 0:
+        # Clients may store responses but must revalidate them with the ETag.
+        return "no-cache"
+    return f"public, max-age={config.template_cache_max_age}"
+
+
+_NOTEBOOK_SPEC = TypeAdapter(notebook.NotebookSpec)
+_NOTEBOOK_SPECS = TypeAdapter(list[notebook.NotebookSpec])
+# Renders in progress by key and compressed variant with their outcome.
+_RENDERS: SingleFlight[tuple[CachedNotebook, str]] = SingleFlight()
 
-@app.post("/notebook", response_model=dict, response_description="Rendered notebook")
+
+async def _notebook_spec(request: Request) -> notebook.NotebookSpec:
+    return await body.parse_json_body(request, _NOTEBOOK_SPEC)
+
+
+async def _notebook_specs(request: Request) -> list[notebook.NotebookSpec]:
+    return await body.parse_json_body(request, _NOTEBOOK_SPECS)
+
+
+@app.post(
+    "/notebook",
+    response_model=dict,
+    response_description="Rendered notebook",
+    openapi_extra=body.openapi_request_body(_NOTEBOOK_SPEC),
+    dependencies=[Depends(admission.admit_render)],
+)
 async def format_notebook(
-    request: Request,
-    templates: Annotated[Jinja2Templates, Depends(get_templates)],
-    spec: notebook.NotebookSpecWithConfig = Depends(_inject_app_config),  # noqa: B008
+    spec: Annotated[notebook.NotebookSpec, Depends(_notebook_spec)],
+    config: Annotated[AppConfig, Depends(app_config)],
+    templates: Annotated[TemplateSnapshot, Depends(get_template_snapshot)],
+    cache: Annotated[RenderCache | None, Depends(get_render_cache)],
+    pool: Annotated[RenderPool, Depends(get_render_pool)],
+    profile: Annotated[
+        profiling.ProfileMode | None, Depends(profiling.requested_profile)
+    ],
+    if_none_match: Annotated[str | None, Header()] = None,
+    accept_encoding: Annotated[str | None, Header()] = None,
+    stream: bool = False,
+) -> Response:
+    """Format and return a notebook.
+
+    If the render cache is enabled, notebooks are looked up by template hash
+    and parameters and only rendered if they are not in the cache.
+    Parameters that were validated before are not validated again.
+    Compressed notebooks are cached as well.
+    Concurrent requests with the same template and parameters share one render.
+    Rendering runs in a worker pool.
+    If the pool is saturated, the request fails with 503 Service Unavailable.
+    Requests with too long arrays in their parameters and renders that produce
+    too large notebooks fail with 413 Content Too Large,
+    renders that take too long with 422 Unprocessable Content.
+    Clients that send too many requests get 429 Too Many Requests,
+    see :mod:`sciwyrm.admission`.
+
+    With ``stream=true``, the notebook is sent in chunks while it is being rendered.
+    This bypasses the cache for notebooks, and the response has no ETag.
+
+    Admins can profile requests, see :mod:`sciwyrm.profiling`.
+    """
+    template = _get_template(templates, spec.template_id)
+    if profile in ("inline", "store"):
+        return await _profile_notebook(spec, template, config, pool, profile)
+    if stream:
+        return await _stream_notebook(spec, template, config, cache, pool)
+    coding = compression.negotiate(accept_encoding, config)
+    if profile == "sampled":
+        rendered = await _sample_profile(spec, template, config, pool, coding)
+    else:
+        rendered = await _render_notebook(
+            spec, template, config, cache, pool, coding=coding
+        )
+    return _conditional_response(
+        rendered.body,
+        rendered.etag,
+        if_none_match,
+        content_encoding=rendered.content_encoding,
+    )
+
+
+@app.post(
+    "/notebook/batch",
+    response_description="Rendered notebooks",
+    openapi_extra=body.openapi_request_body(_NOTEBOOK_SPECS),
+    dependencies=[Depends(admission.admit_render)],
+)
+async def format_notebooks(
+    specs: Annotated[list[notebook.NotebookSpec], Depends(_notebook_specs)],
+    config: Annotated[AppConfig, Depends(app_config)],
+    templates: Annotated[TemplateSnapshot, Depends(get_template_snapshot)],
+    cache: Annotated[RenderCache | None, Depends(get_render_cache)],
+    pool: Annotated[RenderPool, Depends(get_render_pool)],
+    output_format: Annotated[Literal["json", "zip"], Query(alias="format")] = "json",
+) -> Response:
+    """Format and return multiple notebooks.
+
+    Notebooks are rendered concurrently, and errors are reported for each
+    notebook individually without failing the whole batch.
+    With ``format=json``, the response is a JSON array with an object per notebook
+    that contains either the notebook or an error detail.
+    With ``format=zip``, the response is a streamed ZIP archive of notebooks
+    with failures listed in ``errors.json``.
+    """
+    if len(specs) > config.batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many notebooks, at most {config.batch_max_size} "
+            "can be rendered in one request.",
+        )
+    limiter = anyio.CapacityLimiter(config.batch_max_concurrency)
+    tasks = [
+        asyncio.ensure_future(
+            _render_batch_item(spec, templates, config, cache, pool, limiter)
+        )
+        for spec in specs
+    ]
+    if output_format == "json":
+        items = await asyncio.gather(*tasks)
+        return Response(batch.encode_json(items), media_type="application/json")
+    return StreamingResponse(
+        batch.stream_zip(tasks),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="notebooks.zip"'},
+    )
+
+
+async def _render_batch_item(
+    spec: notebook.NotebookSpec,
+    templates: TemplateSnapshot,
+    config: AppConfig,
+    cache: RenderCache | None,
+    pool: RenderPool,
+    limiter: anyio.CapacityLimiter,
+) -> batch.BatchItem:
+    try:
+        template = _get_template(templates, spec.template_id)
+        async with limiter:
+            rendered = await _render_notebook(spec, template, config, cache, pool)
+    except HTTPException as exc:
+        return batch.BatchItem(spec.template_id, exc.status_code, detail=exc.detail)
+    except RequestValidationError as exc:
+        return batch.BatchItem(
+            spec.template_id, 422, detail=jsonable_encoder(exc.errors())
+        )
+    except Exception:
+        from .logging import get_logger
+
+        get_logger().exception("Failed to render notebook %s", spec.template_id)
+        return batch.BatchItem(spec.template_id, 500, detail="Internal Server Error")
+    return batch.BatchItem(spec.template_id, 200, notebook=rendered.body)
+
+
+async def _render_notebook(
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+    config: AppConfig,
+    cache: RenderCache | None,
+    pool: RenderPool,
+    *,
+    coding: compression.Coding | None = None,
+) -> CachedNotebook:
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        key = variant = ""
+        if cache is not None or config.coalesce_renders:
+            # The key covers all parameters including tokens,
+            # so requests never receive notebooks rendered for other parameters.
+            key = notebook.render_key(
+                template.template_id, template.config, spec.parameters
+            )
+            variant = _compressed_variant(coding, config)
+
+        async def produce() -> tuple[CachedNotebook, str]:
+            return await _produce_notebook(
+                spec, template, config, cache, pool, key, variant, coding
+            )
+
+        if not config.coalesce_renders:
+            rendered, outcome = await produce()
+            return rendered
+        (rendered, outcome), leader = await _RENDERS.run(f"{key}/{variant}", produce)
+        metrics.RENDER_COALESCING.labels("leader" if leader else "coalesced").inc()
+        if not leader:
+            outcome = "coalesced"
+        return rendered
+    except notebook.RenderBudgetExceededError as exc:
+        outcome = "over_budget"
+        raise _over_budget(template, exc) from None
+    except RequestValidationError:
+        outcome = "invalid"
+        raise
+    except HTTPException:
+        outcome = "unavailable"
+        raise
+    finally:
+        metrics.NOTEBOOKS.labels(template.template_id, outcome).inc()
+        metrics.NOTEBOOK_DURATION.labels(template.template_id).observe(
+            time.perf_counter() - start
+        )
+
+
+async def _produce_notebook(
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+    config: AppConfig,
+    cache: RenderCache | None,
+    pool: RenderPool,
+    key: str,
+    variant: str,
+    coding: compression.Coding | None,
+) -> tuple[CachedNotebook, str]:
+    # Returns the notebook and whether it was "cached" or "rendered".
+    validated = False
+    if cache is not None:
+        if variant and (cached := await cache.get_notebook(key, variant)):
+            metrics.RENDER_CACHE_LOOKUPS.labels("hit").inc()
+            return cached, "cached"
+        if (cached := await cache.get_notebook(key)) is not None:
+            metrics.RENDER_CACHE_LOOKUPS.labels("hit").inc()
+            compressed = await _compress_notebook(cached, coding, config)
+            if compressed is not cached:
+                await cache.put_notebook(key, compressed, variant)
+            return compressed, "cached"
+        metrics.RENDER_CACHE_LOOKUPS.labels("miss").inc()
+        validated = await cache.has_valid_spec(key)
+
+    with _worker_errors():
+        rendered = await workers.render_notebook(
+            pool, config, spec, template, validated=validated
+        )
+    compressed = await _compress_notebook(rendered, coding, config)
+    if cache is not None:
+        await cache.put_notebook(key, rendered)
+        if compressed is not rendered:
+            await cache.put_notebook(key, compressed, variant)
+        if not validated:
+            await cache.put_valid_spec(key)
+    return compressed, "rendered"
+
+
+@contextmanager
+def _worker_errors() -> Iterator[None]:
+    try:
+        yield
+    except notebook.NotebookValidationError as exc:
+        raise RequestValidationError(exc.errors) from None
+    except (workers.PoolSaturatedError, workers.TemplateChangedError) as exc:
+        raise HTTPException(
+            status_code=503, detail=str(exc), headers={"Retry-After": "1"}
+        ) from None
+
+
+async def _profile_notebook(
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+    config: AppConfig,
+    pool: RenderPool,
+    mode: profiling.ProfileMode,
 ) -> Response:
-    """Format and return a notebook."""
-    formatted = templates.TemplateResponse(
-        name=notebook_template_path(spec.template_id),
-        request=request,
-        context=notebook.render_context(spec),
+    rendered, durations, profile = await _profiled_render(spec, template, config, pool)
+    headers = {"Server-Timing": profiling.server_timing(durations)}
+    if mode == "inline":
+        return Response(profile.data, media_type=profile.media_type, headers=headers)
+    path = await _store_profile(profile, template, config)
+    headers[profiling.PROFILE_FILE_HEADER] = path.name
+    headers["ETag"] = rendered.etag
+    return Response(rendered.body, media_type="application/json", headers=headers)
+
+
+async def _sample_profile(
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+    config: AppConfig,
+    pool: RenderPool,
+    coding: compression.Coding | None,
+) -> CachedNotebook:
+    rendered, _, profile = await _profiled_render(spec, template, config, pool)
+    await _store_profile(profile, template, config)
+    return await _compress_notebook(rendered, coding, config)
+
+
+async def _profiled_render(
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+    config: AppConfig,
+    pool: RenderPool,
+) -> tuple[CachedNotebook, dict[str, float], profiling.Profile]:
+    # Always renders, bypassing the cache, so that the profile shows the render.
+    outcome = "error"
+    try:
+        with _worker_errors():
+            rendered, durations, profile = await workers.profile_notebook(
+                pool, config, spec, template
+            )
+        outcome = "profiled"
+    except notebook.RenderBudgetExceededError as exc:
+        outcome = "over_budget"
+        raise _over_budget(template, exc) from None
+    except RequestValidationError:
+        outcome = "invalid"
+        raise
+    except HTTPException:
+        outcome = "unavailable"
+        raise
+    finally:
+        metrics.NOTEBOOKS.labels(template.template_id, outcome).inc()
+    return rendered, durations, profile
+
+
+async def _store_profile(
+    profile: profiling.Profile, template: NotebookTemplate, config: AppConfig
+) -> Path:
+    if config.profile_dir is None:  # pragma: no cover
+        raise RuntimeError("profile_dir is required for storing profiles")
+    path = await run_in_threadpool(
+        profiling.store, profile, config.profile_dir, template.template_id
+    )
+    from .logging import get_logger
+
+    get_logger().info("Stored profile of template %s in %s", template.template_id, path)
+    return path
+
+
+# Exceeded size limits mean that the request asks for too much,
+# exceeded time limits that it cannot be processed.
+_BUDGET_STATUS = {"max_seconds": 422, "max_bytes": 413, "max_array_length": 413}
+
+
+def _over_budget(
+    template: NotebookTemplate, exc: notebook.RenderBudgetExceededError
+) -> HTTPException:
+    metrics.RENDER_BUDGET_EXCEEDED.labels(template.template_id, exc.limit).inc()
+    return HTTPException(status_code=_BUDGET_STATUS[exc.limit], detail=str(exc))
+
+
+def _compressed_variant(coding: compression.Coding | None, config: AppConfig) -> str:
+    if coding is None:
+        return ""
+    return f"{coding}-{compression.level(coding, config)}"
+
+
+async def _compress_notebook(
+    rendered: CachedNotebook, coding: compression.Coding | None, config: AppConfig
+) -> CachedNotebook:
+    if coding is None or len(rendered.body) < config.compression_min_size:
+        return rendered
+    return await run_in_threadpool(
+        rendered.compress, coding, compression.level(coding, config)
     )
-    nb = json.loads(formatted.body)
-    notebook.insert_notebook_metadata(nb, spec)
-    return JSONResponse(nb)
+
+
+async def _stream_notebook(
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+    config: AppConfig,
+    cache: RenderCache | None,
+    pool: RenderPool,
+) -> StreamingResponse:
+    validated = False
+    if cache is not None:
+        key = notebook.render_key(
+            template.template_id, template.config, spec.parameters
+        )
+        validated = await cache.has_valid_spec(key)
+    try:
+        chunks = await workers.stream_notebook(
+            pool, config, spec, template, validated=validated
+        )
+    except notebook.NotebookValidationError as exc:
+        metrics.NOTEBOOKS.labels(template.template_id, "invalid").inc()
+        raise RequestValidationError(exc.errors) from None
+    except notebook.RenderBudgetExceededError as exc:
+        metrics.NOTEBOOKS.labels(template.template_id, "over_budget").inc()
+        raise _over_budget(template, exc) from None
+    except workers.PoolSaturatedError as exc:
+        metrics.NOTEBOOKS.labels(template.template_id, "unavailable").inc()
+        raise HTTPException(
+            status_code=503, detail=str(exc), headers={"Retry-After": "1"}
+        ) from None
+    if cache is not None and not validated:
+        await cache.put_valid_spec(key)
+    metrics.NOTEBOOKS.labels(template.template_id, "streamed").inc()
+    return StreamingResponse(
+        _count_exceeded_budget(chunks, template), media_type="application/json"
+    )
+
+
+def _count_exceeded_budget(
+    chunks: Iterator[bytes], template: NotebookTemplate
+) -> Iterator[bytes]:
+    # The response has started, so the error aborts the connection.
+    try:
+        yield from chunks
+    except notebook.RenderBudgetExceededError as exc:
+        metrics.RENDER_BUDGET_EXCEEDED.labels(template.template_id, exc.limit).inc()
+        raise
+
+
+def _conditional_response(
+    body: bytes,
+    etag: str,
+    if_none_match: str | None,
+    *,
+    content_encoding: compression.Coding | None = None,
+    cache_control: str | None = None,
+) -> Response:
+    headers = MutableHeaders({"ETag": etag})
+    if cache_control is not None:
+        headers["Cache-Control"] = cache_control
+    if content_encoding is not None:
+        compression.set_encoded_headers(headers, content_encoding)
+    if if_none_match is not None and _etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    # If-None-Match uses weak comparison, see RFC 9110, section 13.1.2.
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return any(tag in ("*", etag) for tag in candidates)
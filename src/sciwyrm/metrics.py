@@ -0,0 +1,195 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Prometheus metrics."""
+
+import os
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+
+import prometheus_client
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+RENDER_QUEUE_DEPTH = Gauge(
+    "sciwyrm_render_queue_depth",
+    "Number of renders waiting for a free worker.",
+    multiprocess_mode="livesum",
+)
+RENDERS_IN_PROGRESS = Gauge(
+    "sciwyrm_renders_in_progress",
+    "Number of renders submitted to the worker pool and not yet finished.",
+    multiprocess_mode="livesum",
+)
+RENDER_QUEUE_WAIT = Histogram(
+    "sciwyrm_render_queue_wait_seconds",
+    "Time between submitting a render and a worker starting it.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+RENDERS_REJECTED = Counter(
+    "sciwyrm_renders_rejected_total",
+    "Number of renders rejected because the worker pool queue was full.",
+)
+REQUESTS = Counter(
+    "sciwyrm_http_requests_total",
+    "Number of HTTP requests by endpoint and response status.",
+    ["method", "endpoint", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "sciwyrm_http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of the response.",
+    ["method", "endpoint"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+NOTEBOOKS = Counter(
+    "sciwyrm_notebooks_total",
+    "Number of requested notebooks by template and outcome.",
+    ["template_id", "outcome"],
+)
+NOTEBOOK_DURATION = Histogram(
+    "sciwyrm_notebook_duration_seconds",
+    "Time to produce a notebook including queueing and cache lookups.",
+    ["template_id"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+STAGE_DURATION = Histogram(
+    "sciwyrm_render_stage_duration_seconds",
+    "Time spent in each stage of rendering a notebook.",
+    ["stage"],
+    buckets=(
+        0.00005,
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.05,
+        0.1,
+        1,
+    ),
+)
+RENDER_CACHE_LOOKUPS = Counter(
+    "sciwyrm_render_cache_lookups_total",
+    "Number of lookups in the render cache.",
+    ["result"],
+)
+RENDER_CACHE_ERRORS = Counter(
+    "sciwyrm_render_cache_errors_total",
+    "Number of failed render cache operations by operation.",
+    ["operation"],
+)
+RENDER_COALESCING = Counter(
+    "sciwyrm_render_coalescing_total",
+    "Number of notebook requests that rendered (leader) or waited for "
+    "an identical concurrent request (coalesced).",
+    ["role"],
+)
+ADMISSION_REJECTED = Counter(
+    "sciwyrm_admission_rejected_total",
+    "Number of render requests rejected with 429 by reason.",
+    ["reason"],
+)
+RENDER_BUDGET_EXCEEDED = Counter(
+    "sciwyrm_render_budget_exceeded_total",
+    "Number of renders aborted for exceeding a limit by template and limit.",
+    ["template_id", "limit"],
+)
+TEMPLATE_LOOKUPS = Counter(
+    "sciwyrm_template_lookups_total",
+    "Number of lookups of templates by ID in requests by result.",
+    ["result"],
+)
+TEMPLATE_LOADS = Counter(
+    "sciwyrm_template_loads_total",
+    "Number of times a new or changed template was loaded by result.",
+    ["result"],
+)
+TEMPLATES = Gauge(
+    "sciwyrm_templates",
+    "Number of templates that are currently available.",
+    multiprocess_mode="livemax",
+)
+
+
+def sample(name: str, **labels: str) -> float:
+    """Return the value of a metric in this process."""
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def generate_latest() -> bytes:
+    """Return all metrics in the Prometheus text format.
+
+    If the environment variable ``PROMETHEUS_MULTIPROC_DIR`` is set,
+    the metrics of all processes that share this directory are aggregated.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+        return prometheus_client.generate_latest(registry)
+    return prometheus_client.generate_latest()
+
+
+class StageTimer:
+    """Measures the duration of stages of a render.
+
+    Durations are stored in a plain dict so that workers in other
+    processes can return them to the main process for recording.
+    """
+
+    def __init__(self) -> None:
+        self.durations: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed code as stage ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = (
+                self.durations.get(name, 0.0) + time.perf_counter() - start
+            )
+
+
+def observe_stages(durations: Mapping[str, float]) -> None:
+    """Record durations measured by a :class:`StageTimer`."""
+    for name, duration in durations.items():
+        STAGE_DURATION.labels(name).observe(duration)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware that counts and times HTTP requests.
+
+    Requests are labelled by the path template of the matched route,
+    e.g., ``/notebook/schema/{template_id}``, to bound the number of labels.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_and_record_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            REQUESTS.labels(scope["method"], endpoint, str(status)).inc()
+            REQUEST_DURATION.labels(scope["method"], endpoint).observe(
+                time.perf_counter() - start
+            )
@@ -4,21 +4,35 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import time
 import uuid
+import weakref
+from collections.abc import Callable, Iterator
 from datetime import datetime, timezone
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import jsonschema
+from jinja2 import Template
+from markupsafe import Markup
 from pydantic import BaseModel, Field, model_validator
 from pydantic_core import PydanticCustomError
 
-from .config import AppConfig
+from . import encoding
+from .metrics import StageTimer
 from .templates import (
+    HEADER_CELL_PLACEHOLDER,
+    METADATA_PLACEHOLDER,
     NotebookTemplateConfig,
-    get_notebook_template_config,
-    list_notebook_templates,
+    RenderLimits,
+    TemplateSnapshot,
+    TemplateSummary,
+    join_separators,
 )
 
+if TYPE_CHECKING:
+    from .cells import CellTemplate
+
 
 class NotebookSpec(BaseModel):
     """Specifies which notebook to return and how to format it."""
@@ -48,73 +62,171 @@ class NotebookSpecWithConfig(NotebookSpec):
     @model_validator(mode="after")
     def validate_parameters(self) -> NotebookSpecWithConfig:
         """Validate parameters against the template schema."""
-        schema = self.config.parameter_schema
-        try:
-            jsonschema.validate(self.parameters, schema)
-        except jsonschema.ValidationError as err:
-            raise PydanticCustomError(
-                "Validation Error",
-                "{message}",
-                {
-                    "message": err.message,
-                    "template_id": self.template_id,
-                    "instance": err.instance,
-                    "jsonpath": err.json_path,
-                    "schema": err.schema,
-                    "schema_path": err.schema_path,
-                    "validator": err.validator,
-                    "validator_value": err.validator_value,
-                },
-            ) from None
+        if (context := _parameter_error(self)) is not None:
+            raise PydanticCustomError("Validation Error", "{message}", context)
         return self
 
 
-class TemplateSummary(BaseModel):
-    """Short overview of a notebook template."""
+def _parameter_error(spec: NotebookSpecWithConfig) -> dict[str, Any] | None:
+    import jsonschema
+
+    err = jsonschema.exceptions.best_match(
+        spec.config.parameter_validator.iter_errors(spec.parameters)
+    )
+    if err is None:
+        return None
+    return {
+        "message": err.message,
+        "template_id": spec.template_id,
+        "instance": err.instance,
+        "jsonpath": err.json_path,
+        "schema": err.schema,
+        "schema_path": err.schema_path,
+        "validator": err.validator,
+        "validator_value": err.validator_value,
+    }
+
+
+class NotebookValidationError(ValueError):
+    """Notebook parameters do not match the template.
 
-    template_id: str = Field(description="ID of the template.")
-    submission_name: str = Field(description="Template name given during submission.")
-    display_name: str = Field(description="Template name meant for display to users.")
-    version: str = Field(description="Template version.")
+    Unlike :class:`pydantic.ValidationError`, this error can be pickled
+    and passed between processes.
+    """
 
-    @classmethod
-    def from_config(
-        cls, template_id: str, config: NotebookTemplateConfig
-    ) -> TemplateSummary:
-        """Construct from a template config."""
-        return cls(
-            template_id=template_id,
-            submission_name=config.submission_name,
-            display_name=config.display_name,
-            version=config.version,
+    def __init__(self, errors: list[Any]) -> None:
+        super().__init__(errors)
+        self.errors = errors
+
+
+class RenderBudgetExceededError(RuntimeError):
+    """Rendering a notebook exceeded one of its :class:`RenderLimits`.
+
+    Attributes
+    ----------
+    limit:
+        Name of the exceeded limit, e.g., ``"max_seconds"``.
+    """
+
+    def __init__(self, limit: str, message: str) -> None:
+        super().__init__(message)
+        self.limit = limit
+
+    def __reduce__(self) -> tuple[type[RenderBudgetExceededError], tuple[str, str]]:
+        # Make the error picklable so that process pools can raise it.
+        return type(self), (self.limit, str(self))
+
+
+_CONTAINERS = frozenset((list, dict))
+
+
+def check_array_lengths(parameters: dict[str, Any], limits: RenderLimits) -> None:
+    """Check that no array in the parameters exceeds ``limits.max_array_length``.
+
+    Raises
+    ------
+    RenderBudgetExceededError
+        If an array is too long.
+    """
+    if limits.max_array_length is not None:
+        _check_array_lengths(parameters, limits.max_array_length, "$")
+
+
+def _check_array_lengths(value: Any, max_length: int, path: str) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if type(item) in _CONTAINERS:
+                _check_array_lengths(item, max_length, f"{path}.{key}")
+        return
+    if len(value) > max_length:
+        raise RenderBudgetExceededError(
+            "max_array_length",
+            f"Array {path} has {len(value)} items, at most {max_length} are allowed",
         )
+    # Only iterate in Python if there are nested containers.
+    if not _CONTAINERS.isdisjoint(map(type, value)):
+        for i, item in enumerate(value):
+            if type(item) in _CONTAINERS:
+                _check_array_lengths(item, max_length, f"{path}[{i}]")
+
+
+def validate_spec(
+    spec: NotebookSpec, config: NotebookTemplateConfig, *, validated: bool = False
+) -> NotebookSpecWithConfig:
+    """Attach a template config to a spec and validate its parameters.
+
+    The config and parameters are attached by reference,
+    and the parameters are only checked against the template schema.
+    If ``validated`` is true, the parameters are known to be valid,
+    e.g., from the render cache, and are not validated again.
+
+    Raises
+    ------
+    NotebookValidationError
+        If the parameters are invalid.
+        The errors are formatted as if they came from validating ``spec``.
+    """
+    # The fields of spec were validated when it was constructed.
+    # Validating them again with spec.with_config would copy the parameters.
+    spec_with_config = NotebookSpecWithConfig.model_construct(
+        template_id=spec.template_id, parameters=spec.parameters, config=config
+    )
+    if validated or (context := _parameter_error(spec_with_config)) is None:
+        return spec_with_config
+    # Same error as raised by NotebookSpecWithConfig.validate_parameters.
+    raise NotebookValidationError(
+        [
+            {
+                "type": "Validation Error",
+                "loc": (),
+                "msg": context["message"],
+                "input": {
+                    "template_id": spec.template_id,
+                    "parameters": spec.parameters,
+                },
+                "ctx": context,
+            }
+        ]
+    )
 
 
-def available_templates(config: AppConfig) -> list[TemplateSummary]:
+def available_templates(templates: TemplateSnapshot) -> list[TemplateSummary]:
     """Summarise available templates."""
-    return [
-        TemplateSummary.from_config(tid, get_notebook_template_config(tid, config))
-        for tid in list_notebook_templates(config)
-    ]
+    return templates.summaries()
 
 
-def template_parameter_schema(config: AppConfig, template_id: str) -> dict[str, object]:
+def template_parameter_schema(
+    templates: TemplateSnapshot, template_id: str
+) -> dict[str, object]:
     """Return the parameter JSON schema for the given template."""
-    return get_notebook_template_config(template_id, config).parameter_schema
+    return templates[template_id].config.parameter_schema
 
 
-def render_context(spec: NotebookSpecWithConfig) -> dict[str, Any]:
+def render_context(
+    spec: NotebookSpecWithConfig, *, deterministic: bool = False
+) -> dict[str, Any]:
     """Return a dict that can be used to render a notebook template."""
-    context = spec.parameters | notebook_metadata(spec)
-    return {key.upper(): value for key, value in context.items()}
+    return _render_context(
+        spec.parameters, notebook_metadata(spec, deterministic=deterministic)
+    )
+
 
+def _render_context(
+    parameters: dict[str, Any], metadata: dict[str, Any]
+) -> dict[str, Any]:
+    return {key.upper(): value for key, value in (parameters | metadata).items()}
 
-def notebook_metadata(spec: NotebookSpecWithConfig) -> dict[str, Any]:
+
+def notebook_metadata(
+    spec: NotebookSpecWithConfig, *, deterministic: bool = False
+) -> dict[str, Any]:
     """Return metadata for a requested notebook.
 
     Here, metadata is any data that was not explicitly requested by the user.
+    If ``deterministic`` is true, the metadata does not contain the render time
+    so that it only depends on the template.
     """
-    return {
+    metadata = {
         "template_id": spec.template_id,
         "template_submission_name": spec.config.submission_name,
         "template_display_name": spec.config.display_name,
@@ -123,29 +235,334 @@ def notebook_metadata(spec: NotebookSpecWithConfig) -> dict[str, Any]:
         "template_rendered_at": datetime.now(tz=timezone.utc).isoformat(),
         "template_hash": spec.config.template_hash,
     }
+    if deterministic:
+        del metadata["template_rendered_at"]
+    return metadata
 
 
 def insert_notebook_metadata(
-    notebook: dict[str, Any], spec: NotebookSpecWithConfig
+    notebook: dict[str, Any],
+    spec: NotebookSpecWithConfig,
+    *,
+    deterministic: bool = False,
 ) -> None:
     """Insert template metadata into a rendered notebook."""
-    metadata = notebook_metadata(spec)
+    metadata = notebook_metadata(spec, deterministic=deterministic)
     notebook["metadata"]["sciwyrm"] = metadata
-    notebook["cells"].insert(
-        0,
-        {
-            "cell_type": "markdown",
-            "id": uuid.uuid4().hex[:16],
-            "metadata": {},
-            "source": [
-                '<div style="font-size:x-small;padding-left:10pt">\n',
-                f"<span style=\"color:rgba(128,128,128,128)\">Template:</span> {metadata['template_submission_name']}<br>\n",  # noqa: E501
-                f"<span style=\"color:rgba(128,128,128,128)\">Id:</span> {metadata['template_id']} "  # noqa: E501
-                f"<span style=\"color: rgba(128,128,128,128);margin-left:10pt\">Version:</span> {metadata['template_version']} "  # noqa: E501
-                f"<span style=\"color: rgba(128,128,128,128);margin-left:10pt\">Rendered at:</span> {metadata['template_rendered_at']}\n",  # noqa: E501
-                "</div>",
-                "",
-                "---",
-            ],
-        },
+    notebook["cells"].insert(0, header_cell(metadata, deterministic=deterministic))
+
+
+def render_notebook(
+    template: Template | CellTemplate,
+    spec: NotebookSpecWithConfig,
+    *,
+    deterministic: bool = False,
+    timer: StageTimer | None = None,
+    limits: RenderLimits | None = None,
+) -> bytes:
+    """Render a notebook template including SciWyrm metadata.
+
+    The template must have been loaded with
+    :class:`sciwyrm.templates.NotebookTemplateLoader` which adds placeholders
+    for the metadata.
+    So the rendered template is the final notebook and
+    does not need to be processed any further.
+
+    Parameters
+    ----------
+    template:
+        Jinja template of the notebook.
+    spec:
+        Parameters and config for the notebook.
+    deterministic:
+        If true, the output only depends on the template and parameters.
+        See :func:`notebook_metadata`.
+    timer:
+        If given, record the durations of the
+        ``metadata``, ``render``, and ``encode`` stages.
+    limits:
+        If given, abort rendering when it exceeds ``max_seconds``
+        or ``max_bytes``.
+
+    Returns
+    -------
+    :
+        The encoded notebook.
+
+    Raises
+    ------
+    RenderBudgetExceededError
+        If rendering exceeds a limit.
+    """
+    if timer is None:
+        timer = StageTimer()
+    with timer.stage("metadata"):
+        context = _template_context(spec, deterministic)
+    with timer.stage("render"):
+        if limits is None or (limits.max_seconds is None and limits.max_bytes is None):
+            rendered = (
+                "".join(join_separators(template.generate(context)))
+                if isinstance(template, Template)
+                else template.render(context)
+            )
+        else:
+            rendered = "".join(_generate_within_limits(template, context, limits))
+    with timer.stage("encode"):
+        encoded = rendered.encode("utf-8")
+    if limits is not None:
+        _check_size(len(encoded), limits)
+    return encoded
+
+
+def generate_notebook(
+    template: Template | CellTemplate,
+    spec: NotebookSpecWithConfig,
+    *,
+    deterministic: bool = False,
+    chunk_size: int = 64 * 1024,
+    limits: RenderLimits | None = None,
+) -> Iterator[bytes]:
+    """Render a notebook template chunk by chunk.
+
+    This produces the same bytes as :func:`render_notebook` but without
+    holding the whole notebook in memory.
+    Small pieces of template output are combined and large pieces are split
+    such that chunks hold roughly ``chunk_size`` characters.
+
+    Parameters
+    ----------
+    template:
+        Jinja template of the notebook.
+    spec:
+        Parameters and config for the notebook.
+    deterministic:
+        If true, the output only depends on the template and parameters.
+        See :func:`notebook_metadata`.
+    chunk_size:
+        Target number of characters per chunk.
+    limits:
+        If given, stop with an exception when rendering exceeds
+        ``max_seconds`` or ``max_bytes``.
+        Chunks that were produced before remain valid but the notebook is cut off.
+
+    Returns
+    -------
+    :
+        Iterator over encoded chunks of the notebook.
+    """
+    context = _template_context(spec, deterministic)
+    parts = (
+        _generate(template, context)
+        if limits is None
+        else _generate_within_limits(template, context, limits)
+    )
+    buffer: list[str] = []
+    buffered = 0
+    for part in parts:
+        if len(part) >= chunk_size:
+            # Large static blocks are constants in the compiled template.
+            # Encoding them in slices avoids a copy of the whole block.
+            if buffer:
+                yield "".join(buffer).encode("utf-8")
+                buffer.clear()
+                buffered = 0
+            for start in range(0, len(part), chunk_size):
+                yield part[start : start + chunk_size].encode("utf-8")
+            continue
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _generate(
+    template: Template | CellTemplate,
+    context: dict[str, Any],
+    on_chunk: Callable[[str], None] | None = None,
+) -> Iterator[str]:
+    if isinstance(template, Template):
+        # Whether the metadata placeholders need commas is only known
+        # once the surrounding output has been rendered.
+        return join_separators(template.generate(context))
+    return template.generate(context, on_chunk=on_chunk)
+
+
+def _generate_within_limits(
+    template: Template | CellTemplate,
+    context: dict[str, Any],
+    limits: RenderLimits,
+) -> Iterator[str]:
+    # Jinja yields output as it goes, so limits are checked between outputs.
+    # Cell templates render each cell source completely before they encode and
+    # yield it, so limits are also checked while a cell is rendered.
+    budget = _Budget(limits)
+    for part in _generate(template, context, on_chunk=budget.check_pending):
+        budget.check_part(part)
+        yield part
+
+
+class _Budget:
+    # Sizes are counted in characters, which is a lower bound of the encoded size.
+
+    def __init__(self, limits: RenderLimits) -> None:
+        self._limits = limits
+        self._deadline = (
+            None
+            if limits.max_seconds is None
+            else time.monotonic() + limits.max_seconds
+        )
+        self._size = 0
+        self._pending = 0
+
+    def check_pending(self, chunk: str) -> None:
+        # Output that is not part of the notebook yet, e.g., of a cell source.
+        self._pending += len(chunk)
+        self._check(self._size + self._pending)
+
+    def check_part(self, part: str) -> None:
+        self._pending = 0
+        self._size += len(part)
+        self._check(self._size)
+
+    def _check(self, size: int) -> None:
+        _check_size(size, self._limits)
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            raise RenderBudgetExceededError(
+                "max_seconds",
+                f"Rendering took longer than {self._limits.max_seconds} seconds",
+            )
+
+
+def _check_size(size: int, limits: RenderLimits) -> None:
+    if limits.max_bytes is not None and size > limits.max_bytes:
+        raise RenderBudgetExceededError(
+            "max_bytes", f"Notebook is larger than {limits.max_bytes} bytes"
+        )
+
+
+def _template_context(
+    spec: NotebookSpecWithConfig, deterministic: bool
+) -> dict[str, Any]:
+    metadata = notebook_metadata(spec, deterministic=deterministic)
+    context = _render_context(spec.parameters, metadata)
+    context[HEADER_CELL_PLACEHOLDER] = Markup(
+        encoding.dumps(header_cell(metadata, deterministic=deterministic)).decode()
     )
+    context[METADATA_PLACEHOLDER] = Markup(encoding.dumps(metadata).decode())
+    return context
+
+
+def header_cell(
+    metadata: dict[str, Any], *, deterministic: bool = False
+) -> dict[str, Any]:
+    """Return a markdown cell that shows SciWyrm metadata.
+
+    If ``deterministic`` is true, the cell id is derived from the template hash
+    instead of being random.
+    """
+    if deterministic:
+        cell_id = metadata["template_hash"].rpartition(":")[2][:16]
+    else:
+        cell_id = uuid.uuid4().hex[:16]
+    if "template_rendered_at" in metadata:
+        rendered_at = f"<span style=\"color: rgba(128,128,128,128);margin-left:10pt\">Rendered at:</span> {metadata['template_rendered_at']}"  # noqa: E501
+    else:
+        rendered_at = ""
+    return {
+        "cell_type": "markdown",
+        "id": cell_id,
+        "metadata": {},
+        "source": [
+            '<div style="font-size:x-small;padding-left:10pt">\n',
+            f"<span style=\"color:rgba(128,128,128,128)\">Template:</span> {metadata['template_submission_name']}<br>\n",  # noqa: E501
+            f"<span style=\"color:rgba(128,128,128,128)\">Id:</span> {metadata['template_id']} "  # noqa: E501
+            f"<span style=\"color: rgba(128,128,128,128);margin-left:10pt\">Version:</span> {metadata['template_version']} "  # noqa: E501
+            f"{rendered_at}\n",
+            "</div>",
+            "",
+            "---",
+        ],
+    }
+
+
+def render_key(
+    template_id: str, config: NotebookTemplateConfig, parameters: dict[str, Any]
+) -> str:
+    """Return a key that identifies a rendered notebook.
+
+    The key is built from the template ID, the template hash, and a canonical
+    encoding of the parameters.
+    The ID is needed because templates with identical files have the same hash
+    but notebooks that differ in their metadata.
+    The key does not depend on the order of keys in ``parameters``.
+    """
+    # Use the standard library so that keys do not depend on the JSON backend.
+    encoded = json.dumps(
+        parameters, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    digest = hashlib.blake2b(encoded).hexdigest()
+    return f"{template_id}/{config.template_hash}/{digest}"
+
+
+def warm_up_templates(
+    templates: TemplateSnapshot, *, deterministic: bool = False
+) -> None:
+    """Render every template once with placeholder parameters.
+
+    This builds the parameter validators and runs the code paths of rendering
+    so that the first real request does not pay for imports and initialization.
+    Parameters are taken from the defaults and examples in the parameter schema
+    or are empty values of the parameter type.
+    Templates that cannot be rendered with these parameters are skipped.
+
+    Does nothing if the same snapshot was warmed up before, e.g., by
+    ``sciwyrm serve`` before forking the workers that inherit the snapshot.
+    """
+    global _warmed_up
+
+    from .logging import get_logger
+
+    if _warmed_up is not None and _warmed_up() is templates:
+        return
+    _warmed_up = weakref.ref(templates)
+    for template_id in templates.template_ids():
+        template = templates[template_id]
+        spec = NotebookSpecWithConfig.model_construct(
+            template_id=template_id,
+            parameters=_placeholder_parameters(template.config.parameter_schema),
+            config=template.config,
+        )
+        try:
+            _ = template.config.parameter_validator
+            render_notebook(template.template, spec, deterministic=deterministic)
+        except Exception as exc:
+            get_logger().warning("Failed to warm up template %s: %s", template_id, exc)
+
+
+# The last snapshot that was warmed up.
+_warmed_up: weakref.ref[TemplateSnapshot] | None = None
+
+_PLACEHOLDERS = {
+    "string": "",
+    "integer": 0,
+    "number": 0.0,
+    "boolean": False,
+    "array": [],
+    "object": {},
+}
+
+
+def _placeholder_parameters(schema: dict[str, Any]) -> dict[str, Any]:
+    parameters = {}
+    for name, prop in schema.get("properties", {}).items():
+        if "default" in prop:
+            parameters[name] = prop["default"]
+        elif prop.get("examples"):
+            parameters[name] = prop["examples"][0]
+        elif isinstance(prop.get("type"), str):
+            parameters[name] = _PLACEHOLDERS.get(prop["type"])
+    return parameters
@@ -0,0 +1,178 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Profiling of single render requests.
+
+Admins can profile a request to ``POST /notebook`` by sending the header
+``X-Sciwyrm-Profile`` together with the admin token:
+
+- ``X-Sciwyrm-Profile: inline`` returns the profile instead of the notebook.
+- ``X-Sciwyrm-Profile: store`` returns the notebook and stores the profile
+  in ``profile_dir``. The response header ``X-Sciwyrm-Profile-File``
+  holds the file name.
+
+With ``profile_sample_rate = N``, every Nth request is profiled and stored
+without a header.
+Apart from the stored profile, sampled requests get the same response
+as other requests. Streamed requests are not profiled.
+Profiled requests bypass the render cache so that they actually render.
+The ``Server-Timing`` header of responses to admins reports the durations
+of the render stages.
+
+If the ``profile`` extra is installed, the profiler is pyinstrument and
+profiles are HTML or speedscope JSON according to ``profile_format``.
+Otherwise, the profiler is cProfile, and profiles are stats files that
+can be loaded with :class:`pstats.Stats`.
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import uuid
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Annotated, Literal, TypeVar
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPBearer
+
+from .config import AppConfig, app_config
+
+PROFILE_HEADER = "X-Sciwyrm-Profile"
+PROFILE_FILE_HEADER = "X-Sciwyrm-Profile-File"
+
+ProfileMode = Literal["inline", "store", "sampled"]
+"""How to profile a request.
+
+``"inline"`` and ``"store"`` are requested by admins,
+``"sampled"`` stores the profile without changing the response.
+"""
+
+_R = TypeVar("_R")
+
+_bearer = HTTPBearer(auto_error=False)
+_requests = itertools.count()
+# cProfile cannot run in several threads at once in all Python versions.
+_cprofile_lock = threading.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class Profile:
+    """An encoded profile."""
+
+    data: bytes
+    media_type: str
+    suffix: str
+    """File name suffix including the leading dot."""
+
+
+async def requested_profile(
+    request: Request, config: Annotated[AppConfig, Depends(app_config)]
+) -> ProfileMode | None:
+    """Return whether and how to profile a request.
+
+    Raises
+    ------
+    fastapi.HTTPException
+        If the request asks for a profile but is not authorized,
+        or if it asks for an unknown mode.
+    """
+    mode = request.headers.get(PROFILE_HEADER)
+    if mode is None:
+        if (
+            config.profile_sample_rate
+            and next(_requests) % config.profile_sample_rate == 0
+        ):
+            return "sampled"
+        return None
+
+    from .admin import require_admin
+
+    require_admin(config, await _bearer(request))
+    if mode not in ("inline", "store"):
+        raise HTTPException(
+            status_code=400,
+            detail=f"{PROFILE_HEADER} must be 'inline' or 'store'",
+        )
+    if mode == "store" and config.profile_dir is None:
+        raise HTTPException(
+            status_code=400, detail="Cannot store profiles, profile_dir is not set"
+        )
+    return mode  # type: ignore[return-value]
+
+
+def profiled(
+    fn: Callable[[], _R], output: Literal["html", "speedscope"]
+) -> tuple[_R, Profile]:
+    """Call a function under a profiler.
+
+    Only the calling thread is profiled.
+
+    Parameters
+    ----------
+    fn:
+        Function to profile.
+    output:
+        Format of pyinstrument profiles.
+        Ignored if pyinstrument is not installed.
+
+    Returns
+    -------
+    :
+        The result of ``fn`` and the profile.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return _cprofiled(fn)
+
+    profiler = Profiler(interval=0.0001, async_mode="disabled")
+    profiler.start()
+    try:
+        result = fn()
+    finally:
+        profiler.stop()
+    if output == "speedscope":
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        return result, Profile(
+            profiler.output(SpeedscopeRenderer()).encode("utf-8"),
+            "application/json",
+            ".speedscope.json",
+        )
+    return result, Profile(
+        profiler.output_html().encode("utf-8"), "text/html; charset=utf-8", ".html"
+    )
+
+
+def _cprofiled(fn: Callable[[], _R]) -> tuple[_R, Profile]:
+    import cProfile
+    import marshal
+
+    with _cprofile_lock:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(fn)
+    profiler.create_stats()
+    # Same format as cProfile.Profile.dump_stats.
+    data = marshal.dumps(profiler.stats)
+    return result, Profile(data, "application/octet-stream", ".pstats")
+
+
+def store(profile: Profile, directory: Path, template_id: str) -> Path:
+    """Write a profile to a new file in ``directory``."""
+    directory.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now(tz=timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = (
+        directory / f"{timestamp}-{template_id}-{uuid.uuid4().hex[:8]}{profile.suffix}"
+    )
+    path.write_bytes(profile.data)
+    return path
+
+
+def server_timing(durations: Mapping[str, float]) -> str:
+    """Format stage durations as a ``Server-Timing`` header value."""
+    return ", ".join(
+        f"{name};dur={duration * 1000:.3f}" for name, duration in durations.items()
+    )
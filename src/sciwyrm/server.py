@@ -0,0 +1,124 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Multi-process server based on gunicorn.
+
+Requires the ``server`` extra.
+The app and all templates are loaded in the gunicorn master process before
+forking, so workers share them copy-on-write.
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import shutil
+import tempfile
+from typing import Any
+
+from fastapi import FastAPI
+from gunicorn.app.base import BaseApplication
+from gunicorn.arbiter import Arbiter
+from gunicorn.workers.base import Worker
+
+from . import compression
+from .config import AppConfig
+
+_METRICS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+
+def serve(config: AppConfig, *, bind: str, workers: int | None = None) -> None:
+    """Run the app with gunicorn and uvicorn workers.
+
+    Parameters
+    ----------
+    config:
+        Application config.
+    bind:
+        Address to listen on, e.g., ``0.0.0.0:8000``.
+    workers:
+        Number of worker processes.
+        Defaults to ``server_workers`` from the config or the number of CPUs.
+    """
+    workers = workers or config.server_workers or os.cpu_count() or 1
+    metrics_dir = _set_up_multiprocess_metrics()
+    master_pid = os.getpid()
+    try:
+        _Server(config, _server_options(config, bind=bind, workers=workers)).run()
+    finally:
+        # Workers are forked from within run and also unwind through here.
+        if metrics_dir is not None and os.getpid() == master_pid:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def warm_up(config: AppConfig) -> None:
+    """Load everything that workers can share.
+
+    Loads all templates, encodes and compresses the template listing and
+    schemas, and renders every template if ``warm_up_templates`` is set.
+    Then moves all objects out of the reach of the garbage collector so that
+    collections in the workers do not copy the shared memory pages.
+    """
+    from .notebook import warm_up_templates
+    from .templates import get_template_registry
+
+    snapshot = get_template_registry(config).snapshot
+    if config.warm_up_templates:
+        warm_up_templates(snapshot, deterministic=config.deterministic_render)
+    responses = [
+        response
+        for response in (
+            snapshot.summaries_response,
+            *snapshot.schema_responses.values(),
+        )
+        if len(response.body) >= config.compression_min_size
+    ]
+    for coding in compression.AVAILABLE.intersection(config.compression_encodings):
+        for response in responses:
+            response.compressed(coding, compression.level(coding, config))
+    gc.freeze()
+
+
+class _Server(BaseApplication):  # type: ignore[misc]
+    def __init__(self, config: AppConfig, options: dict[str, Any]) -> None:
+        self._app_config = config
+        self._options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self._options.items():
+            self.cfg.set(key, value)
+
+    def load(self) -> FastAPI:
+        from .main import app
+
+        warm_up(self._app_config)
+        return app
+
+
+def _server_options(config: AppConfig, *, bind: str, workers: int) -> dict[str, Any]:
+    return {
+        "bind": bind,
+        "workers": workers,
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "preload_app": True,
+        "max_requests": config.server_max_requests,
+        "max_requests_jitter": config.server_max_requests_jitter,
+        "graceful_timeout": config.server_graceful_timeout,
+        "child_exit": _child_exit,
+    }
+
+
+def _set_up_multiprocess_metrics() -> str | None:
+    # prometheus_client reads this when it is imported, i.e., before the app is.
+    # Returns the directory if it was created here and must be removed on exit.
+    if _METRICS_DIR_ENV in os.environ:
+        return None
+    metrics_dir = tempfile.mkdtemp(prefix="sciwyrm-metrics-")
+    os.environ[_METRICS_DIR_ENV] = metrics_dir
+    return metrics_dir
+
+
+def _child_exit(_server: Arbiter, worker: Worker) -> None:
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)  # type: ignore[no-untyped-call]
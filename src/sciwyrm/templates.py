@@ -3,18 +3,29 @@
 """Template loading."""
 
 import hashlib
-import json
-from functools import lru_cache
+import threading
+import weakref
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import Annotated, Any
+from types import CodeType, MappingProxyType
+from typing import TYPE_CHECKING, Annotated, Any, Callable, Literal, TypeVar, cast
 
 from fastapi import Depends
-from fastapi.templating import Jinja2Templates
-from jinja2 import Environment, FileSystemLoader
-from pydantic import BaseModel, EmailStr
+from jinja2 import Environment, FileSystemLoader, Template
+from pydantic import BaseModel, EmailStr, Field
 
+from . import encoding, metrics
+from .cache import EncodedResponse
+from .compiled import CompiledTemplate, TemplateManifest, default_compiled_dir
 from .config import AppConfig, app_config
 
+if TYPE_CHECKING:
+    import jsonschema
+
+    from .cells import CellTemplate, CompiledCells
+
 
 class Author(BaseModel):
     """Author of the template."""
@@ -23,6 +34,46 @@ class Author(BaseModel):
     email: EmailStr | None = None
 
 
+class RenderLimits(BaseModel):
+    """Limits for rendering a notebook.
+
+    ``None`` means that there is no limit.
+    Templates can set these in their config to lower the limits of the app config
+    but not to raise them.
+    """
+
+    max_seconds: float | None = Field(
+        default=None, gt=0, description="Maximum time to render a notebook."
+    )
+    max_bytes: int | None = Field(
+        default=None, ge=1, description="Maximum size of a rendered notebook."
+    )
+    max_array_length: int | None = Field(
+        default=None,
+        ge=0,
+        description="Maximum number of items of any array in the parameters.",
+    )
+
+    def tightened(self, other: "RenderLimits") -> "RenderLimits":
+        """Return the stricter of each limit in ``self`` and ``other``."""
+        return RenderLimits.model_construct(
+            max_seconds=_min_limit(self.max_seconds, other.max_seconds),
+            max_bytes=_min_limit(self.max_bytes, other.max_bytes),
+            max_array_length=_min_limit(self.max_array_length, other.max_array_length),
+        )
+
+
+_N = TypeVar("_N", int, float)
+
+
+def _min_limit(a: _N | None, b: _N | None) -> _N | None:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
 class NotebookTemplateConfig(BaseModel):
     """Template configuration."""
 
@@ -32,48 +83,734 @@ class NotebookTemplateConfig(BaseModel):
     description: str
     authors: list[Author]
     parameter_schema: dict[str, Any]
+    template_format: Literal["text", "cells"] = "text"
+    render_limits: RenderLimits = Field(default_factory=RenderLimits)
     template_hash: str
 
+    @cached_property
+    def parameter_validator(self) -> "jsonschema.protocols.Validator":
+        """Validator for template parameters.
 
-def get_templates(config: Annotated[AppConfig, Depends(app_config)]) -> Jinja2Templates:
-    """Return a handler for loading and rendering templates."""
-    return _make_template_handler(config.template_dir)
+        The schema is checked and the validator constructed only once per config.
+        Since configs are held by the :class:`TemplateRegistry`, this avoids
+        rebuilding the validator for every request.
+        Arrays whose items only have a type, like lists of dataset PIDs,
+        are checked without descending into every item.
+        """
+        # jsonschema and its format checkers are slow to import.
+        import jsonschema
 
+        cls = jsonschema.validators.validator_for(self.parameter_schema)
+        cls.check_schema(self.parameter_schema)
+        return _with_fast_items(cls)(
+            self.parameter_schema, format_checker=cls.FORMAT_CHECKER
+        )
 
-@lru_cache(maxsize=1)
-def _make_template_handler(template_dir: Path) -> Jinja2Templates:
-    from . import filters
-    from .logging import get_logger
 
-    get_logger().info("Loading templates from %s", template_dir)
-    templates = Jinja2Templates(
-        env=Environment(
-            loader=FileSystemLoader(template_dir),
-            autoescape=True,
+@dataclass(frozen=True, slots=True)
+class NotebookTemplate:
+    """A loaded and compiled notebook template."""
+
+    template_id: str
+    config: NotebookTemplateConfig
+    template: "Template | CellTemplate"
+    signature: tuple[int, ...]
+    """File sizes and modification times used to detect changes."""
+
+
+class TemplateSummary(BaseModel):
+    """Short overview of a notebook template."""
+
+    template_id: str = Field(description="ID of the template.")
+    submission_name: str = Field(description="Template name given during submission.")
+    display_name: str = Field(description="Template name meant for display to users.")
+    version: str = Field(description="Template version.")
+
+    @classmethod
+    def from_config(
+        cls, template_id: str, config: NotebookTemplateConfig
+    ) -> "TemplateSummary":
+        """Construct from a template config."""
+        return cls(
+            template_id=template_id,
+            submission_name=config.submission_name,
+            display_name=config.display_name,
+            version=config.version,
         )
-    )
-    templates.env.filters["quote"] = filters.quote
-    templates.env.filters["je"] = filters.json_escape
+
+
+@dataclass(frozen=True)
+class TemplateSnapshot:
+    """Immutable view of all templates at one point in time.
+
+    Request handlers should only use one snapshot per request
+    so that they see a consistent set of templates.
+    """
+
+    templates: Mapping[str, NotebookTemplate]
+
+    def __getitem__(self, template_id: str) -> NotebookTemplate:
+        return self.templates[template_id]
+
+    def __contains__(self, template_id: object) -> bool:
+        return template_id in self.templates
+
+    def template_ids(self) -> list[str]:
+        """Return the IDs of all templates in a stable order."""
+        return sorted(self.templates)
+
+    def summaries(self) -> list[TemplateSummary]:
+        """Summarise all templates in a stable order."""
+        return [
+            TemplateSummary.from_config(tid, self.templates[tid].config)
+            for tid in self.template_ids()
+        ]
+
+    @cached_property
+    def summaries_response(self) -> EncodedResponse:
+        """Encoded response body of :meth:`summaries`."""
+        return EncodedResponse.from_content(
+            [summary.model_dump(mode="json") for summary in self.summaries()]
+        )
+
+    @cached_property
+    def schema_responses(self) -> Mapping[str, EncodedResponse]:
+        """Encoded parameter schemas of all templates by template ID."""
+        return MappingProxyType(
+            {
+                tid: EncodedResponse.from_content(template.config.parameter_schema)
+                for tid, template in self.templates.items()
+            }
+        )
+
+
+class TemplateRegistry:
+    """Registry of all notebook templates in a template directory.
+
+    All templates are loaded and compiled eagerly on construction.
+    :meth:`refresh` reloads templates whose files have changed and
+    publishes a new :class:`TemplateSnapshot`.
+    :meth:`start_watching` starts a background thread that calls
+    :meth:`refresh` every ``reload_interval`` seconds.
+
+    Parameters
+    ----------
+    template_dir:
+        Base directory of templates.
+        Notebook templates are loaded from its ``notebook`` subdirectory.
+    reload_interval:
+        Time in seconds between checks for changed templates.
+        Set to 0 to disable automatic reloading.
+    compiled_dir:
+        Directory with templates compiled by ``sciwyrm compile-templates``.
+        Templates whose hash matches the compiled version are not compiled again.
+    """
+
+    def __init__(
+        self,
+        template_dir: Path,
+        *,
+        reload_interval: float = 0,
+        compiled_dir: Path | None = None,
+    ) -> None:
+        from .logging import get_logger
+
+        self._template_dir = template_dir
+        self._manifest = (
+            None if compiled_dir is None else TemplateManifest.load(compiled_dir)
+        )
+        self._reload_interval = reload_interval
+        self._env = _make_environment(template_dir)
+        self._refresh_lock = threading.Lock()
+        self._stop_watching: threading.Event | None = None
+        self._snapshot = TemplateSnapshot(MappingProxyType({}))
+        # IDs of templates without config that were already reported.
+        self._missing_config: frozenset[str] = frozenset()
+
+        get_logger().info("Loading templates from %s", template_dir)
+        self.refresh()
+        self._check_manifest()
+
+    @property
+    def snapshot(self) -> TemplateSnapshot:
+        """The current set of templates."""
+        return self._snapshot
+
+    def start_watching(self) -> None:
+        """Start reloading changed templates in the background.
+
+        Does nothing if the reload interval is 0 or if already watching.
+        """
+        if self._reload_interval <= 0 or self._stop_watching is not None:
+            return
+        self._stop_watching = threading.Event()
+        threading.Thread(
+            target=_watch,
+            args=(weakref.ref(self), self._stop_watching, self._reload_interval),
+            name="sciwyrm-template-watcher",
+            daemon=True,
+        ).start()
+
+    def stop_watching(self) -> None:
+        """Stop reloading templates in the background."""
+        if self._stop_watching is not None:
+            self._stop_watching.set()
+            self._stop_watching = None
+
+    def refresh(self) -> bool:
+        """Reload changed templates.
+
+        Templates whose files are unchanged are reused.
+        If a changed template fails to load, the previous version is kept.
+
+        Returns
+        -------
+        :
+            True if the snapshot was replaced.
+        """
+        from .logging import get_logger
+
+        with self._refresh_lock:
+            current = self._snapshot.templates
+            signatures = self._scan()
+            if signatures.keys() == current.keys() and all(
+                current[tid].signature == sig for tid, sig in signatures.items()
+            ):
+                return False
+
+            templates = {}
+            for template_id, signature in signatures.items():
+                previous = current.get(template_id)
+                if previous is not None and previous.signature == signature:
+                    templates[template_id] = previous
+                    continue
+                try:
+                    templates[template_id] = self._load(template_id, signature)
+                except Exception:
+                    get_logger().exception("Failed to load template %s", template_id)
+                    metrics.TEMPLATE_LOADS.labels("failed").inc()
+                    if previous is not None:
+                        templates[template_id] = previous
+                    continue
+                get_logger().info("Loaded template %s", template_id)
+            for template_id in current.keys() - templates.keys():
+                get_logger().info("Removed template %s", template_id)
+
+            self._snapshot = TemplateSnapshot(MappingProxyType(templates))
+            metrics.TEMPLATES.set(len(templates))
+            return True
+
+    def _scan(self) -> dict[str, tuple[int, ...]]:
+        from .logging import get_logger
+
+        signatures: dict[str, tuple[int, ...]] = {}
+        missing_config = set()
+        for path in self._template_dir.joinpath("notebook").iterdir():
+            if path.suffix != ".ipynb":
+                continue
+            try:
+                signatures[path.stem] = _file_signature(path)
+            except FileNotFoundError:
+                missing_config.add(path.stem)
+        # Report every template only once instead of on every reload.
+        for template_id in sorted(missing_config - self._missing_config):
+            get_logger().warning("Missing config for template %s", template_id)
+        self._missing_config = frozenset(missing_config)
+        return signatures
+
+    def _load(self, template_id: str, signature: tuple[int, ...]) -> NotebookTemplate:
+        # Templates that were not modified since they were compiled
+        # do not need to be read and hashed.
+        compiled = (
+            None
+            if self._manifest is None
+            else self._manifest.get_unchanged(template_id, signature)
+        )
+        if compiled is None:
+            template_path = self._template_dir / notebook_template_path(template_id)
+            template_source = template_path.read_bytes()
+            config_source = template_path.with_suffix(".json").read_bytes()
+            template_hash = _notebook_template_hash(template_source, config_source)
+            compiled = (
+                None
+                if self._manifest is None
+                else self._manifest.get(template_id, template_hash)
+            )
+            if compiled is None:
+                compiled = _compile(
+                    self._env,
+                    template_path,
+                    template_source,
+                    config_source,
+                    template_hash,
+                    signature,
+                )
+                metrics.TEMPLATE_LOADS.labels("compiled").inc()
+                return self._make_template(
+                    template_id, signature, compiled, precompiled=False
+                )
+        metrics.TEMPLATE_LOADS.labels("precompiled").inc()
+        return self._make_template(template_id, signature, compiled, precompiled=True)
+
+    def _make_template(
+        self,
+        template_id: str,
+        signature: tuple[int, ...],
+        compiled: CompiledTemplate,
+        *,
+        precompiled: bool,
+    ) -> NotebookTemplate:
+        # Schemas of precompiled templates were checked by compile_templates.
+        # Their validators are built on first use to keep startup fast.
+        config = _make_config(compiled, check_schema=not precompiled)
+        return NotebookTemplate(
+            template_id=template_id,
+            config=config,
+            template=_instantiate(self._env, config, compiled),
+            signature=signature,
+        )
+
+    def _check_manifest(self) -> None:
+        from .logging import get_logger
+
+        if self._manifest is None:
+            return
+        compiled = self._manifest.template_hashes()
+        stale = sorted(
+            template_id
+            for template_id, template in self._snapshot.templates.items()
+            if compiled.get(template_id) != template.config.template_hash
+        )
+        if stale:
+            get_logger().warning(
+                "Compiled templates are out of date, "
+                "run 'sciwyrm compile-templates' to update them: %s",
+                ", ".join(stale),
+            )
+        else:
+            get_logger().info("All templates match the compiled templates")
+
+
+def compile_templates(template_dir: Path) -> dict[str, CompiledTemplate]:
+    """Compile all notebook templates in a directory.
+
+    The result can be stored with :func:`sciwyrm.compiled.write_manifest`
+    and used by :class:`TemplateRegistry`.
+
+    Raises
+    ------
+    Exception
+        If any template or config is invalid.
+    """
+    env = _make_environment(template_dir)
+    templates = {}
+    for template_path in sorted(template_dir.joinpath("notebook").glob("*.ipynb")):
+        # Stat before reading so that changes during reading alter the signature.
+        signature = _file_signature(template_path)
+        template_source = template_path.read_bytes()
+        config_source = template_path.with_suffix(".json").read_bytes()
+        compiled = _compile(
+            env,
+            template_path,
+            template_source,
+            config_source,
+            _notebook_template_hash(template_source, config_source),
+            signature,
+        )
+        _make_config(compiled)  # Check that the config is valid.
+        templates[template_path.stem] = compiled
     return templates
 
 
-def get_notebook_template_config(
-    template_id: str, config: AppConfig
-) -> NotebookTemplateConfig:
-    """Return a template configuration."""
-    return _load_notebook_template_config(template_id, config.template_dir)
+def _compile(
+    env: Environment,
+    template_path: Path,
+    template_source: bytes,
+    config_source: bytes,
+    template_hash: str,
+    signature: tuple[int, ...],
+) -> CompiledTemplate:
+    fields = encoding.loads(config_source)
+    name = notebook_template_path(template_path.stem)
+    code: CodeType | CompiledCells
+    if fields.get("template_format", "text") == "cells":
+        from .cells import compile_cells
+
+        code = compile_cells(
+            _make_cell_environment(),
+            template_source.decode("utf-8"),
+            name=name,
+            filename=str(template_path),
+        )
+    else:
+        code = env.compile(
+            insert_metadata_placeholders(template_source.decode("utf-8")),
+            name=name,
+            filename=str(template_path),
+        )
+    return CompiledTemplate(
+        template_hash=template_hash, config=fields, code=code, signature=signature
+    )
+
 
+def _instantiate(
+    env: Environment, config: NotebookTemplateConfig, compiled: CompiledTemplate
+) -> "Template | CellTemplate":
+    if config.template_format == "cells":
+        from .cells import CellTemplate
 
-@lru_cache()
-def _load_notebook_template_config(
-    template_id: str, template_dir: Path
+        return CellTemplate(
+            _make_cell_environment(), cast("CompiledCells", compiled.code)
+        )
+    return env.template_class.from_code(
+        env, cast(CodeType, compiled.code), env.make_globals(None)
+    )
+
+
+@lru_cache
+def _with_fast_items(
+    cls: "type[jsonschema.protocols.Validator]",
+) -> "type[jsonschema.protocols.Validator]":
+    import jsonschema
+
+    items = cls.VALIDATORS["items"]
+    has_prefix_items = "prefixItems" in cls.VALIDATORS
+
+    def fast_items(
+        validator: "jsonschema.protocols.Validator",
+        items_schema: Any,
+        instance: Any,
+        schema: dict[str, Any],
+    ) -> "Iterator[jsonschema.ValidationError]":
+        # Descending into each item is slow for long arrays.
+        # So only check the type and let jsonschema report errors if it does not match.
+        if (
+            isinstance(items_schema, dict)
+            and items_schema.keys() == {"type"}
+            and isinstance(item_type := items_schema["type"], str)
+            and validator.is_type(instance, "array")
+        ):
+            start = len(schema.get("prefixItems", ())) if has_prefix_items else 0
+            is_type = validator.is_type
+            if all(is_type(item, item_type) for item in instance[start:]):
+                return
+        yield from items(validator, items_schema, instance, schema)
+
+    return cast(
+        "type[jsonschema.protocols.Validator]",
+        jsonschema.validators.extend(cls, {"items": fast_items}),
+    )
+
+
+def _make_config(
+    compiled: CompiledTemplate, *, check_schema: bool = True
 ) -> NotebookTemplateConfig:
-    # AppConfig cannot be hashed and used with lru_cache.
-    path = template_dir.joinpath("notebook", f"{template_id}.json")
-    with path.open() as f:
-        fields = json.load(f)
-        fields["template_hash"] = _notebook_template_hash(path)
-        return NotebookTemplateConfig(**fields)
+    config = NotebookTemplateConfig(
+        **compiled.config, template_hash=compiled.template_hash
+    )
+    if check_schema:
+        # Build the validator now to detect invalid schemas early.
+        _ = config.parameter_validator
+    return config
+
+
+def _watch(
+    registry_ref: weakref.ref[TemplateRegistry],
+    stop: threading.Event,
+    interval: float,
+) -> None:
+    from .logging import get_logger
+
+    # Only hold a weak reference so that the registry can be garbage collected.
+    while not stop.wait(interval):
+        registry = registry_ref()
+        if registry is None:
+            return
+        try:
+            registry.refresh()
+        except Exception:
+            get_logger().exception("Failed to refresh templates")
+        del registry
+
+
+def get_template_registry(
+    config: Annotated[AppConfig, Depends(app_config)]
+) -> TemplateRegistry:
+    """Return the registry of templates."""
+    return _make_template_registry(
+        config.template_dir,
+        config.template_reload_interval,
+        config.compiled_template_dir or default_compiled_dir(config.template_dir),
+    )
+
+
+def get_template_snapshot(
+    registry: Annotated[TemplateRegistry, Depends(get_template_registry)]
+) -> TemplateSnapshot:
+    """Return the current set of templates."""
+    return registry.snapshot
+
+
+@lru_cache(maxsize=1)
+def _make_template_registry(
+    template_dir: Path, reload_interval: float, compiled_dir: Path
+) -> TemplateRegistry:
+    return TemplateRegistry(
+        template_dir, reload_interval=reload_interval, compiled_dir=compiled_dir
+    )
+
+
+def _make_environment(template_dir: Path) -> Environment:
+    from . import filters
+
+    env = Environment(loader=NotebookTemplateLoader(template_dir), autoescape=True)
+    env.filters["quote"] = filters.quote
+    env.filters["je"] = filters.json_escape
+    env.filters["json_string"] = filters.json_string
+    env.filters["json_list"] = filters.json_list
+    return env
+
+
+@lru_cache(maxsize=1)
+def _make_cell_environment() -> Environment:
+    from . import filters
+
+    # Rendered cell sources are encoded as JSON afterwards,
+    # so they must not be escaped.
+    env = Environment(autoescape=False, keep_trailing_newline=True)  # noqa: S701
+    env.filters["quote"] = filters.quote
+    # The JSON encoding is done by SciWyrm, only escape what the
+    # text format's ``je`` escapes in the decoded cell source.
+    # This way, templates render the same in both formats.
+    env.filters["je"] = filters.escape_newlines
+    env.filters["json_string"] = filters.string_literal
+    env.filters["json_list"] = filters.list_literal
+    return env
+
+
+class NotebookTemplateLoader(FileSystemLoader):
+    """Template loader that prepares notebook templates for single-pass rendering.
+
+    The source of every notebook template is extended with placeholders for the
+    SciWyrm header cell and ``metadata.sciwyrm``.
+    This way, the template renders the final notebook directly and the output
+    does not need to be parsed and re-encoded to insert the metadata.
+    See :func:`sciwyrm.notebook.render_notebook` for how to fill the placeholders.
+    """
+
+    def get_source(
+        self, environment: Environment, template: str
+    ) -> tuple[str, str, Callable[[], bool]]:
+        """Load the template source and insert metadata placeholders."""
+        source, filename, uptodate = super().get_source(environment, template)
+        if template.startswith("notebook/") and template.endswith(".ipynb"):
+            source = insert_metadata_placeholders(source)
+        return source, filename, uptodate
+
+
+HEADER_CELL_PLACEHOLDER = "_SCIWYRM_HEADER_CELL"
+METADATA_PLACEHOLDER = "_SCIWYRM_METADATA"
+SEPARATOR_PLACEHOLDER = "\x00"
+"""Stands for a comma that may be needed in the rendered notebook.
+
+See :func:`join_separators`.
+JSON does not allow this character outside of strings nor unescaped
+inside of strings, so it cannot be part of a valid notebook.
+"""
+
+
+def insert_metadata_placeholders(source: str) -> str:
+    """Insert placeholders for SciWyrm metadata into a notebook template.
+
+    The header cell is inserted as the first cell and the metadata
+    as the last key of the top-level ``metadata`` object.
+    If the ``metadata`` already has a ``sciwyrm`` key, its value is replaced
+    instead so that the rendered notebook has no duplicate keys.
+    Both are plain Jinja expressions that render the variables named by
+    ``HEADER_CELL_PLACEHOLDER`` and ``METADATA_PLACEHOLDER``.
+
+    Whether the inserted values need a comma to separate them from the
+    other cells or metadata is only known after rendering, e.g.,
+    if the cells are produced by a loop.
+    So they are separated by ``SEPARATOR_PLACEHOLDER``, which must be
+    replaced in the rendered notebook with :func:`join_separators`.
+
+    Parameters
+    ----------
+    source:
+        Source code of a notebook template.
+
+    Returns
+    -------
+    :
+        The template source with placeholders.
+    """
+    offsets = _find_top_level_offsets(source)
+    placeholder = f"{{{{ {METADATA_PLACEHOLDER} }}}}"
+    # Edits as (start, end, text) that replace source[start:end] with text.
+    cells_start = offsets["cells"][0]
+    edits = [
+        (
+            cells_start,
+            cells_start,
+            f"{{{{ {HEADER_CELL_PLACEHOLDER} }}}}{SEPARATOR_PLACEHOLDER}",
+        )
+    ]
+    if "sciwyrm" in offsets:
+        value_start, value_end = offsets["sciwyrm"]
+        edits.append((value_start, value_end, f" {placeholder}"))
+    else:
+        metadata_end = offsets["metadata"][0]
+        edits.append(
+            (
+                metadata_end,
+                metadata_end,
+                f'{SEPARATOR_PLACEHOLDER}"sciwyrm": {placeholder}',
+            )
+        )
+    # Edit back-to-front so that the earlier offsets stay valid.
+    for start, end, text in sorted(edits, reverse=True):
+        source = source[:start] + text + source[end:]
+    return source
+
+
+def join_separators(parts: Iterable[str]) -> Iterator[str]:
+    """Replace separator placeholders in rendered output.
+
+    A ``SEPARATOR_PLACEHOLDER`` becomes a comma if it is between two values
+    and is removed if it follows an opening or precedes a closing
+    bracket or brace.
+
+    Parameters
+    ----------
+    parts:
+        Pieces of a rendered notebook as produced by
+        :meth:`jinja2.Template.generate`.
+
+    Returns
+    -------
+    :
+        Pieces of the notebook without separator placeholders.
+    """
+    last = ""  # The last non-whitespace character of the output so far.
+    pending = False  # Whether a separator waits for the next value.
+    for part in parts:
+        if not pending and SEPARATOR_PLACEHOLDER not in part:
+            if stripped := part.rstrip():
+                last = stripped[-1]
+            yield part
+            continue
+        for index, piece in enumerate(part.split(SEPARATOR_PLACEHOLDER)):
+            if index and last not in ("[", "{", ","):
+                pending = True
+            if pending and (stripped := piece.lstrip()):
+                pending = False
+                if stripped[0] not in "]}":
+                    last = ","
+                    yield ","
+            if stripped := piece.rstrip():
+                last = stripped[-1]
+            yield piece
+
+
+def _find_top_level_offsets(source: str) -> dict[str, tuple[int, int]]:
+    """Locate the top-level ``cells`` and ``metadata`` in a notebook template.
+
+    The template is scanned as JSON while skipping Jinja tags outside of strings.
+    Jinja tags inside of strings are part of the string and do not need
+    special handling.
+
+    Returns
+    -------
+    :
+        Spans of the source.
+        ``"cells"`` is the empty span just after the opening bracket of the
+        cell list and ``"metadata"`` the empty span at the closing brace
+        of the metadata object.
+        If the metadata has a ``sciwyrm`` key, ``"sciwyrm"`` is the span
+        of its value.
+    """
+    offsets: dict[str, tuple[int, int]] = {}
+    depth = 0
+    i = 0
+    n = len(source)
+    last_string = ""
+    key = ""  # The top-level key whose value is currently being scanned.
+    metadata_key = ""  # The key in the top-level metadata that is being scanned.
+    metadata_value_start = -1
+    while i < n:
+        c = source[i]
+        if c == '"':
+            end = _skip_string(source, i)
+            last_string = source[i + 1 : end - 1]
+            i = end
+            continue
+        if c == "{" and source[i + 1 : i + 2] in ("{", "%", "#"):
+            i = _skip_jinja_tag(source, i)
+            continue
+        if c == ":" and depth == 1:
+            key = last_string
+        elif c == ":" and depth == 2 and key == "metadata":
+            metadata_key = last_string
+            metadata_value_start = i + 1
+        elif c == "," and depth == 2 and key == "metadata":
+            if metadata_key == "sciwyrm":
+                offsets["sciwyrm"] = (metadata_value_start, i)
+            metadata_key = ""
+        elif c in "[{":
+            depth += 1
+            if depth == 2 and key == "cells" and c == "[":
+                offsets["cells"] = (i + 1, i + 1)
+        elif c in "]}":
+            if depth == 2 and key == "metadata" and c == "}":
+                offsets["metadata"] = (i, i)
+                if metadata_key == "sciwyrm":
+                    offsets["sciwyrm"] = (metadata_value_start, i)
+                metadata_key = ""
+            depth -= 1
+            if depth == 1:
+                key = ""
+        i += 1
+    missing = {"cells", "metadata"} - offsets.keys()
+    if missing:
+        raise ValueError(
+            f"Notebook template has no top-level {' or '.join(sorted(missing))}"
+        )
+    return offsets
+
+
+def _skip_string(source: str, start: int) -> int:
+    """Return the offset just after the string literal starting at ``start``."""
+    quote = source[start]
+    i = start + 1
+    while source[i] != quote:
+        i += 2 if source[i] == "\\" else 1
+    return i + 1
+
+
+def _skip_jinja_tag(source: str, start: int) -> int:
+    """Return the offset just after the Jinja tag starting at ``start``.
+
+    Delimiters inside of string literals and nested brackets of the tag,
+    e.g., in ``{% set d = {"a": {"b": 1}} %}``, do not end the tag.
+    """
+    kind = source[start + 1]
+    if kind == "#":
+        return source.index("#}", start + 2) + 2
+    closing = "}}" if kind == "{" else "%}"
+    depth = 0
+    i = start + 2
+    while not (depth == 0 and source.startswith(closing, i)):
+        c = source[i]
+        if c in "\"'":
+            i = _skip_string(source, i)
+            continue
+        if c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth -= 1
+        i += 1
+    return i + 2
 
 
 def notebook_template_path(template_id: str) -> str:
@@ -92,15 +829,20 @@ def notebook_template_path(template_id: str) -> str:
     return f"notebook/{template_id}.ipynb"
 
 
-def list_notebook_templates(config: AppConfig) -> list[str]:
-    """List available notebook templates."""
-    return [
-        path.stem
-        for path in config.template_dir.joinpath("notebook").iterdir()
-        if path.suffix == ".ipynb"
-    ]
+def _file_signature(template_path: Path) -> tuple[int, ...]:
+    """Return the sizes and modification times of a template and its config."""
+    template_stat = template_path.stat()
+    config_stat = template_path.with_suffix(".json").stat()
+    return (
+        template_stat.st_size,
+        template_stat.st_mtime_ns,
+        config_stat.st_size,
+        config_stat.st_mtime_ns,
+    )
 
 
-def _notebook_template_hash(path: Path) -> str:
-    """Return a hash for a notebook template."""
-    return "blake2b:" + hashlib.blake2b(path.read_bytes()).hexdigest()
+def _notebook_template_hash(template_source: bytes, config_source: bytes) -> str:
+    """Return a hash for a notebook template and its config."""
+    h = hashlib.blake2b(template_source)
+    h.update(config_source)
+    return "blake2b:" + h.hexdigest()
@@ -0,0 +1,364 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+"""Worker pool for CPU-bound rendering."""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Annotated, Literal, ParamSpec, TypeVar
+
+from fastapi import Depends
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics, notebook, profiling
+from .cache import CachedNotebook
+from .config import AppConfig, app_config
+from .templates import (
+    NotebookTemplate,
+    NotebookTemplateConfig,
+    RenderLimits,
+    get_template_registry,
+)
+
+_P = ParamSpec("_P")
+_R = TypeVar("_R")
+
+
+class PoolSaturatedError(RuntimeError):
+    """The render pool cannot accept more work."""
+
+
+class RenderPool:
+    """Executor for rendering notebooks outside of the event loop.
+
+    At most ``workers + queue_size`` jobs can be submitted at a time.
+    Further submissions fail with :class:`PoolSaturatedError`
+    so that the server sheds load instead of accumulating latency.
+
+    Parameters
+    ----------
+    kind:
+        Run jobs in threads or in separate processes.
+        Processes can render in parallel but have to load templates
+        themselves and transfer parameters and results between processes.
+    workers:
+        Number of threads or processes.
+    queue_size:
+        Number of jobs that can wait for a free worker.
+    """
+
+    def __init__(
+        self, kind: Literal["thread", "process"], workers: int, queue_size: int
+    ) -> None:
+        self._kind = kind
+        self._workers = workers
+        self._capacity = workers + queue_size
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor: Executor | None = None
+
+    @property
+    def kind(self) -> Literal["thread", "process"]:
+        """Whether jobs run in threads or processes."""
+        return self._kind
+
+    @property
+    def in_flight(self) -> int:
+        """Number of submitted jobs that have not finished yet."""
+        return self._in_flight
+
+    async def run(
+        self, fn: Callable[_P, _R], *args: _P.args, **kwargs: _P.kwargs
+    ) -> _R:
+        """Run a function in the pool and wait for its result.
+
+        In a process pool, the function and arguments must be picklable.
+
+        Raises
+        ------
+        PoolSaturatedError
+            If the queue is full.
+        """
+        self.acquire()
+        try:
+            submitted = time.monotonic()
+            started, result = await asyncio.wrap_future(
+                self._get_executor().submit(_timed_call, partial(fn, *args, **kwargs))
+            )
+            metrics.RENDER_QUEUE_WAIT.observe(max(started - submitted, 0.0))
+            return result
+        finally:
+            self.release()
+
+    def acquire(self) -> None:
+        """Reserve capacity for a job that runs outside of the pool.
+
+        Every call must be followed by exactly one call to :meth:`release`.
+
+        Raises
+        ------
+        PoolSaturatedError
+            If the queue is full.
+        """
+        with self._lock:
+            if self._in_flight >= self._capacity:
+                metrics.RENDERS_REJECTED.inc()
+                raise PoolSaturatedError("Too many renders in progress")
+            self._in_flight += 1
+            self._update_gauges()
+
+    def release(self) -> None:
+        """Return capacity reserved with :meth:`acquire`."""
+        with self._lock:
+            self._in_flight -= 1
+            self._update_gauges()
+
+    def shutdown(self) -> None:
+        """Shut down the workers.
+
+        The pool starts new workers when it is used again.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._kind == "process":
+                # Do not fork because the parent process runs threads.
+                self._executor = ProcessPoolExecutor(
+                    self._workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self._workers, thread_name_prefix="sciwyrm-render"
+                )
+        return self._executor
+
+    def _update_gauges(self) -> None:
+        metrics.RENDERS_IN_PROGRESS.set(self._in_flight)
+        metrics.RENDER_QUEUE_DEPTH.set(max(self._in_flight - self._workers, 0))
+
+
+def _timed_call(fn: Callable[[], _R]) -> tuple[float, _R]:
+    # time.monotonic is system-wide, so it can be compared between processes.
+    return time.monotonic(), fn()
+
+
+class TemplateChangedError(RuntimeError):
+    """A worker process could not find the requested version of a template."""
+
+
+async def render_notebook(
+    pool: RenderPool,
+    config: AppConfig,
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+    *,
+    validated: bool = False,
+) -> CachedNotebook:
+    """Validate a spec and render its notebook in a worker.
+
+    Validation is skipped if ``validated`` is true.
+    Rendering is limited by :func:`render_limits`.
+
+    Raises
+    ------
+    PoolSaturatedError
+        If the pool cannot accept more work.
+    sciwyrm.notebook.NotebookValidationError
+        If the parameters are invalid.
+    sciwyrm.notebook.RenderBudgetExceededError
+        If the parameters or rendering exceed the limits.
+    TemplateChangedError
+        If a worker process does not have the same version of the template.
+    """
+    if pool.kind == "process":
+        # Compiled templates cannot be pickled, so the worker uses its own copy.
+        rendered, durations = await pool.run(
+            _render_in_process,
+            config,
+            spec,
+            template.config.template_hash,
+            validated,
+        )
+    else:
+        rendered, durations = await pool.run(_render, config, spec, template, validated)
+    metrics.observe_stages(durations)
+    return rendered
+
+
+async def profile_notebook(
+    pool: RenderPool,
+    config: AppConfig,
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+) -> tuple[CachedNotebook, dict[str, float], profiling.Profile]:
+    """Validate a spec and render its notebook in a worker under a profiler.
+
+    Like :func:`render_notebook` but also returns the durations of the
+    render stages and the profile.
+    """
+    if pool.kind == "process":
+        render = partial(
+            _render_in_process,
+            config,
+            spec,
+            template.config.template_hash,
+            validated=False,
+        )
+    else:
+        render = partial(_render, config, spec, template, validated=False)
+    (rendered, durations), profile = await pool.run(
+        profiling.profiled, render, config.profile_format
+    )
+    metrics.observe_stages(durations)
+    return rendered, durations, profile
+
+
+async def stream_notebook(
+    pool: RenderPool,
+    config: AppConfig,
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+    *,
+    validated: bool = False,
+) -> Iterator[bytes]:
+    """Validate a spec and return an iterator over chunks of its notebook.
+
+    Validation is skipped if ``validated`` is true.
+    Rendering is limited by :func:`render_limits`.
+    If it exceeds the limits, the iterator raises
+    :class:`sciwyrm.notebook.RenderBudgetExceededError`.
+
+    The notebook is rendered lazily while the iterator is consumed.
+    This always happens in the calling thread, even for process pools,
+    because a partially rendered template cannot be moved between processes.
+    But streams count towards the capacity of the pool until they are exhausted
+    or closed.
+
+    Raises
+    ------
+    PoolSaturatedError
+        If the pool cannot accept more work.
+    sciwyrm.notebook.NotebookValidationError
+        If the parameters are invalid.
+    sciwyrm.notebook.RenderBudgetExceededError
+        If the parameters exceed the limits.
+    """
+    limits = render_limits(config, template.config)
+    pool.acquire()
+    try:
+        timer = metrics.StageTimer()
+        spec_with_config = await run_in_threadpool(
+            _timed_validate, timer, spec, template.config, validated, limits
+        )
+        metrics.observe_stages(timer.durations)
+    except BaseException:
+        pool.release()
+        raise
+    return _release_when_done(
+        pool,
+        notebook.generate_notebook(
+            template.template,
+            spec_with_config,
+            deterministic=config.deterministic_render,
+            chunk_size=config.stream_chunk_size,
+            limits=limits,
+        ),
+    )
+
+
+def render_limits(config: AppConfig, template: NotebookTemplateConfig) -> RenderLimits:
+    """Return the limits for rendering a template.
+
+    These are the limits of the template config where they are stricter
+    than the limits of the app config.
+    """
+    return template.render_limits.tightened(
+        RenderLimits.model_construct(
+            max_seconds=config.render_max_seconds or None,
+            max_bytes=config.render_max_bytes or None,
+            max_array_length=config.render_max_array_length or None,
+        )
+    )
+
+
+def _timed_validate(
+    timer: metrics.StageTimer,
+    spec: notebook.NotebookSpec,
+    config: NotebookTemplateConfig,
+    validated: bool,
+    limits: RenderLimits,
+) -> notebook.NotebookSpecWithConfig:
+    with timer.stage("validate"):
+        # Reject large inputs before spending time on validating them.
+        notebook.check_array_lengths(spec.parameters, limits)
+        return notebook.validate_spec(spec, config, validated=validated)
+
+
+def _release_when_done(pool: RenderPool, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    try:
+        yield from chunks
+    finally:
+        pool.release()
+
+
+def _render(
+    config: AppConfig,
+    spec: notebook.NotebookSpec,
+    template: NotebookTemplate,
+    validated: bool,
+) -> tuple[CachedNotebook, dict[str, float]]:
+    timer = metrics.StageTimer()
+    limits = render_limits(config, template.config)
+    spec_with_config = _timed_validate(timer, spec, template.config, validated, limits)
+    body = notebook.render_notebook(
+        template.template,
+        spec_with_config,
+        deterministic=config.deterministic_render,
+        timer=timer,
+        limits=limits,
+    )
+    with timer.stage("etag"):
+        rendered = CachedNotebook.from_body(body)
+    return rendered, timer.durations
+
+
+def _render_in_process(
+    config: AppConfig,
+    spec: notebook.NotebookSpec,
+    template_hash: str,
+    validated: bool,
+) -> tuple[CachedNotebook, dict[str, float]]:
+    registry = get_template_registry(config)
+    template = registry.snapshot.templates.get(spec.template_id)
+    if template is None or template.config.template_hash != template_hash:
+        # The parent process has seen a change that this process has not.
+        registry.refresh()
+        template = registry.snapshot.templates.get(spec.template_id)
+    if template is None or template.config.template_hash != template_hash:
+        raise TemplateChangedError(
+            f"Template {spec.template_id} changed while rendering"
+        )
+    return _render(config, spec, template, validated)
+
+
+def get_render_pool(config: Annotated[AppConfig, Depends(app_config)]) -> RenderPool:
+    """Return the pool for rendering notebooks."""
+    return _make_render_pool(
+        config.render_pool, config.render_workers, config.render_queue_size
+    )
+
+
+@lru_cache(maxsize=1)
+def _make_render_pool(
+    kind: Literal["thread", "process"], workers: int, queue_size: int
+) -> RenderPool:
+    return RenderPool(kind, workers, queue_size)
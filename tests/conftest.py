@@ -2,7 +2,9 @@
 # Copyright (c) 2024 SciCat Project (https://github.com/SciCatProject/sciwyrm)
 
 import os
+import shutil
 from pathlib import Path
+from typing import Any
 
 import pytest
 import scitacean
@@ -11,13 +13,20 @@ from scitacean.testing.backend import add_pytest_options as add_backend_options
 from scitacean.testing.sftp import add_pytest_option as add_sftp_option
 from scitacean.transfer.sftp import SFTPFileTransfer
 
+from sciwyrm.admission import _make_admission
+from sciwyrm.cache import _make_render_cache
 from sciwyrm.config import AppConfig, app_config
+from sciwyrm.templates import _make_template_registry
 
 from .seed import seed_scicat
 
 # Silence warning from Jupyter
 os.environ["JUPYTER_PLATFORM_DIRS"] = "1"
 
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
+TEMPLATE_ID = "b32f6992-0355-4759-b780-ececd4957c23"
+"""ID of the generic template."""
+
 pytest_plugins = (
     "scitacean.testing.backend.fixtures",
     "scitacean.testing.sftp.fixtures",
@@ -56,8 +65,48 @@ def scicat_client(
     return real_client
 
 
+def notebook_spec(template_id: str = TEMPLATE_ID, **parameters: Any) -> dict:
+    """Return the body of a request to render a notebook.
+
+    ``parameters`` replace the default parameters of the generic template.
+    """
+    return {
+        "template_id": template_id,
+        "parameters": {
+            "scicat_url": "https://test-url.sci.cat",
+            "file_server_host": "login",
+            "file_server_port": 22,
+            "dataset_pids": ["abcd/123.522"],
+            **parameters,
+        },
+    }
+
+
+def spec_with_pids(n_pids: int) -> dict:
+    """Return the body of a request to render a notebook for ``n_pids`` datasets."""
+    return notebook_spec(dataset_pids=[f"20.500.12269/{i:08d}" for i in range(n_pids)])
+
+
+@pytest.fixture
+def template_dir(tmp_path: Path) -> Path:
+    """Return a copy of the repository's templates that tests may modify."""
+    shutil.copytree(TEMPLATE_DIR / "notebook", tmp_path / "notebook")
+    return tmp_path
+
+
+def touch(path: Path, content: str) -> None:
+    """Write a file and advance its modification time by one second.
+
+    This makes sure that the modification time changes even on
+    filesystems with coarse timestamps.
+    """
+    stat = path.stat()
+    path.write_text(content)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
 def _app_config_override():
-    return AppConfig(template_dir=Path(__file__).resolve().parent.parent / "templates")
+    return AppConfig(template_dir=TEMPLATE_DIR)
 
 
 @pytest.fixture(scope="session")
@@ -73,3 +122,30 @@ def app():
 @pytest.fixture
 def sciwyrm_client(app):
     return TestClient(app)
+
+
+@pytest.fixture
+def make_client(app):
+    """Return a function that makes a client for the app with a custom config.
+
+    The keyword arguments of the function are fields of the config.
+    The template directory defaults to the repository's templates.
+    """
+    old_override = app.dependency_overrides[app_config]
+
+    def make(**fields: Any) -> TestClient:
+        # Construct the config once because it is read from the environment.
+        config = AppConfig(**{"template_dir": TEMPLATE_DIR, **fields})
+        app.dependency_overrides[app_config] = lambda: config
+        _clear_cached_dependencies()
+        return TestClient(app)
+
+    yield make
+    app.dependency_overrides[app_config] = old_override
+    _clear_cached_dependencies()
+
+
+def _clear_cached_dependencies() -> None:
+    _make_admission.cache_clear()
+    _make_render_cache.cache_clear()
+    _make_template_registry.cache_clear()
@@ -0,0 +1,114 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import shutil
+from pathlib import Path
+
+import fakeredis
+import pytest
+
+from sciwyrm.cache import RedisCacheBackend
+
+from ..conftest import TEMPLATE_ID, notebook_spec
+
+TOKEN = "s3cr3t"  # noqa: S105
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture
+def make_client(make_client, template_dir):
+    def make(**kwargs):
+        return make_client(
+            template_dir=template_dir, template_reload_interval=0, **kwargs
+        )
+
+    return make
+
+
+@pytest.fixture
+def admin_client(make_client):
+    return make_client(
+        admin_token=TOKEN, deterministic_render=True, render_cache_max_bytes=2**20
+    )
+
+
+def test_admin_endpoints_are_disabled_without_token(make_client):
+    client = make_client()
+    assert client.get("/admin/stats", headers=AUTH).status_code == 404
+
+
+@pytest.mark.parametrize(
+    "headers", [{}, {"Authorization": "Bearer wrong"}, {"Authorization": TOKEN}]
+)
+def test_admin_endpoints_require_token(admin_client, headers):
+    response = admin_client.post("/admin/cache/flush", headers=headers)
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+
+
+def test_unknown_template_does_not_touch_file_system(admin_client, monkeypatch):
+    admin_client.get(f"/notebook/schema/{TEMPLATE_ID}")  # Load the templates.
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file system was accessed")
+
+    for name in ("stat", "open", "read_bytes", "read_text", "exists"):
+        monkeypatch.setattr(Path, name, fail)
+    misses = admin_client.get("/admin/stats", headers=AUTH).json()["templates"][
+        "lookups"
+    ]["miss"]
+    response = admin_client.get("/notebook/schema/does-not-exist")
+    assert response.status_code == 404
+    stats = admin_client.get("/admin/stats", headers=AUTH).json()
+    assert stats["templates"]["lookups"]["miss"] == misses + 1
+
+
+def test_stats(admin_client):
+    admin_client.post(
+        "/notebook", json=notebook_spec(), headers={"Accept-Encoding": "identity"}
+    )
+    stats = admin_client.get("/admin/stats", headers=AUTH).json()
+    assert stats["templates"]["count"] == 1
+    assert stats["templates"]["lookups"]["hit"] > 0
+    assert stats["render_cache"]["backend"] == "MemoryCacheBackend"
+    assert stats["render_cache"]["entries"] == 2  # notebook and validated spec
+    assert stats["render_cache"]["bytes"] > 0
+
+
+def test_flush_cache(admin_client):
+    admin_client.post("/notebook", json=notebook_spec())
+    response = admin_client.post("/admin/cache/flush", headers=AUTH)
+    assert response.json() == {"flushed": True}
+    stats = admin_client.get("/admin/stats", headers=AUTH).json()
+    assert stats["render_cache"]["entries"] == 0
+    assert stats["render_cache"]["bytes"] == 0
+
+
+def test_flush_without_cache(make_client):
+    client = make_client(admin_token=TOKEN)
+    assert client.post("/admin/cache/flush", headers=AUTH).json() == {"flushed": False}
+
+
+def test_reload_templates(admin_client, template_dir):
+    assert admin_client.get("/notebook/schema/new").status_code == 404
+    notebook_dir = template_dir / "notebook"
+    for suffix in (".ipynb", ".json"):
+        shutil.copy(
+            notebook_dir / f"{TEMPLATE_ID}{suffix}", notebook_dir / f"new{suffix}"
+        )
+
+    response = admin_client.post("/admin/templates/reload", headers=AUTH)
+    assert response.json() == {"changed": True, "count": 2}
+    assert admin_client.get("/notebook/schema/new").status_code == 200
+    response = admin_client.post("/admin/templates/reload", headers=AUTH)
+    assert response.json() == {"changed": False, "count": 2}
+
+
+def test_redis_clear_only_removes_prefixed_keys():
+    client = fakeredis.FakeRedis()
+    backend = RedisCacheBackend(client)
+    for i in range(2500):
+        backend.set(f"sciwyrm:notebook:{i}", b"x")
+    client.set("other", b"y")
+    backend.clear("sciwyrm:")
+    assert client.keys() == [b"other"]
@@ -0,0 +1,183 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import asyncio
+
+import httpx
+import pytest
+
+from sciwyrm import admission, metrics, workers
+from sciwyrm.admission import Admission, AdmissionRejectedError
+
+from ..conftest import TEMPLATE_ID, notebook_spec
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_admission_allows_burst_then_rejects(clock):
+    control = Admission(rate=0.5, burst=2, max_concurrent=0)
+    control.admit("a")
+    control.admit("a")
+    with pytest.raises(AdmissionRejectedError) as exc:
+        control.admit("a")
+    assert exc.value.reason == "rate_limit"
+    assert exc.value.retry_after == 2
+
+
+def test_admission_refills_tokens_over_time(clock):
+    control = Admission(rate=0.5, burst=2, max_concurrent=0)
+    control.admit("a")
+    control.admit("a")
+    clock[0] += 1
+    with pytest.raises(AdmissionRejectedError) as exc:
+        control.admit("a")
+    assert exc.value.retry_after == 1
+    clock[0] += 1
+    control.admit("a")
+
+
+def test_admission_limits_clients_independently(clock):
+    control = Admission(rate=0.5, burst=1, max_concurrent=0)
+    control.admit("a")
+    control.admit("b")
+    with pytest.raises(AdmissionRejectedError):
+        control.admit("a")
+
+
+def test_admission_drops_least_recently_seen_clients(clock):
+    control = Admission(rate=0.5, burst=1, max_concurrent=0, max_clients=2)
+    for client in ("a", "b", "c"):
+        control.admit(client)
+    # The bucket of "a" was dropped, so it starts with a full bucket.
+    control.admit("a")
+    with pytest.raises(AdmissionRejectedError):
+        control.admit("c")
+
+
+def test_admission_limits_concurrent_requests():
+    control = Admission(rate=0, burst=1, max_concurrent=2)
+    control.admit("a")
+    control.admit("b")
+    with pytest.raises(AdmissionRejectedError) as exc:
+        control.admit("c")
+    assert exc.value.reason == "concurrency"
+    control.release()
+    control.admit("c")
+    assert control.in_progress == 2
+
+
+def test_clients_that_send_too_many_requests_are_rejected(make_client):
+    client = make_client(rate_limit_per_second=0.01, rate_limit_burst=2)
+    rejected = metrics.sample("sciwyrm_admission_rejected_total", reason="rate_limit")
+    assert client.post("/notebook", json=notebook_spec()).status_code == 200
+    assert client.post("/notebook/batch", json=[notebook_spec()]).status_code == 200
+    response = client.post("/notebook", json=notebook_spec())
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
+    assert (
+        metrics.sample("sciwyrm_admission_rejected_total", reason="rate_limit")
+        == rejected + 1
+    )
+    # Cheap endpoints are not limited.
+    assert client.get("/notebook/templates").status_code == 200
+    assert client.get(f"/notebook/schema/{TEMPLATE_ID}").status_code == 200
+
+
+def test_clients_can_be_identified_by_header(make_client):
+    client = make_client(
+        rate_limit_per_second=0.01,
+        rate_limit_burst=1,
+        rate_limit_client_header="X-Forwarded-For",
+    )
+
+    def post(forwarded_for: str) -> int:
+        return client.post(
+            "/notebook",
+            json=notebook_spec(),
+            headers={"X-Forwarded-For": forwarded_for},
+        ).status_code
+
+    assert post("10.0.0.1") == 200
+    assert post("10.0.0.2") == 200
+    assert post("10.0.0.1") == 429
+
+
+def test_forged_client_header_values_do_not_reset_the_bucket(make_client):
+    client = make_client(
+        rate_limit_per_second=0.01,
+        rate_limit_burst=1,
+        rate_limit_client_header="X-Forwarded-For",
+    )
+
+    def post(forwarded_for: str) -> int:
+        return client.post(
+            "/notebook",
+            json=notebook_spec(),
+            headers={"X-Forwarded-For": forwarded_for},
+        ).status_code
+
+    assert post("10.0.0.1") == 200
+    # The client prepends a different address, the proxy appends the real one.
+    assert post("192.168.1.1, 10.0.0.1") == 429
+    assert post("192.168.1.2, 10.0.0.1") == 429
+
+
+def test_trusted_proxies_are_skipped_in_client_header(make_client):
+    client = make_client(
+        rate_limit_per_second=0.01,
+        rate_limit_burst=1,
+        rate_limit_client_header="X-Forwarded-For",
+        rate_limit_trusted_proxies=1,
+    )
+
+    def post(forwarded_for: str) -> int:
+        return client.post(
+            "/notebook",
+            json=notebook_spec(),
+            headers={"X-Forwarded-For": forwarded_for},
+        ).status_code
+
+    assert post("10.0.0.1, 10.0.0.100") == 200
+    assert post("10.0.0.2, 10.0.0.100") == 200
+    assert post("192.168.1.1, 10.0.0.1, 10.0.0.101") == 429
+
+
+def test_concurrent_renders_are_limited(app, make_client, monkeypatch):
+    make_client(render_max_concurrent_requests=1)
+    render_notebook = workers.render_notebook
+
+    async def run():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def blocking_render_notebook(*args, **kwargs):
+            started.set()
+            await release.wait()
+            return await render_notebook(*args, **kwargs)
+
+        monkeypatch.setattr(workers, "render_notebook", blocking_render_notebook)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            first = asyncio.ensure_future(
+                client.post("/notebook", json=notebook_spec())
+            )
+            await started.wait()
+            second = await client.post("/notebook", json=notebook_spec())
+            assert second.status_code == 429
+            assert second.headers["retry-after"] == "1"
+            templates = await client.get("/notebook/templates")
+            assert templates.status_code == 200
+            release.set()
+            assert (await first).status_code == 200
+            # The slot was released.
+            third = await client.post("/notebook", json=notebook_spec())
+            assert third.status_code == 200
+
+    asyncio.run(run())
@@ -0,0 +1,84 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import asyncio
+import io
+import json
+import zipfile
+
+import nbformat
+
+from sciwyrm import batch
+
+from ..conftest import TEMPLATE_ID, notebook_spec
+
+
+def _mixed_batch() -> list[dict]:
+    invalid = notebook_spec(file_server_host="invalid")
+    invalid["parameters"]["file_server_port"] = "not a port"
+    return [
+        notebook_spec(file_server_host="host-0"),
+        notebook_spec(file_server_host="host-1"),
+        notebook_spec("not-a-template"),
+        invalid,
+    ]
+
+
+def test_batch_json(sciwyrm_client):
+    response = sciwyrm_client.post("/notebook/batch", json=_mixed_batch())
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["status"] for item in items] == [200, 200, 404, 422]
+    for i in range(2):
+        nb = nbformat.from_dict(items[i]["notebook"])
+        nbformat.validate(nb)
+        assert f"host-{i}" in json.dumps(items[i]["notebook"])
+    assert "not-a-template" in items[2]["detail"]
+    assert "file_server_port" in json.dumps(items[3]["detail"])
+
+
+def test_batch_zip(sciwyrm_client):
+    response = sciwyrm_client.post("/notebook/batch?format=zip", json=_mixed_batch())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == [
+            f"0000-{TEMPLATE_ID}.ipynb",
+            f"0001-{TEMPLATE_ID}.ipynb",
+            "errors.json",
+        ]
+        for i in range(2):
+            nb = nbformat.reads(
+                archive.read(f"000{i}-{TEMPLATE_ID}.ipynb").decode(), as_version=4
+            )
+            nbformat.validate(nb)
+        errors = json.loads(archive.read("errors.json"))
+    assert [(error["index"], error["status"]) for error in errors] == [
+        (2, 404),
+        (3, 422),
+    ]
+
+
+def test_batch_rejects_too_many_notebooks(sciwyrm_client):
+    response = sciwyrm_client.post("/notebook/batch", json=[notebook_spec()] * 101)
+    assert response.status_code == 413
+
+
+def test_batch_zip_cancels_pending_items_when_closed_early():
+    async def run():
+        started = asyncio.Event()
+
+        async def render(index: int) -> batch.BatchItem:
+            if index:
+                started.set()
+                await asyncio.Event().wait()
+            return batch.BatchItem(TEMPLATE_ID, 200, notebook=b"{}")
+
+        tasks = [asyncio.ensure_future(render(index)) for index in range(3)]
+        stream = batch.stream_zip(tasks)
+        assert await anext(stream)
+        await started.wait()
+        await stream.aclose()
+        assert [task.cancelled() for task in tasks] == [False, True, True]
+
+    asyncio.run(run())
@@ -0,0 +1,285 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import shutil
+
+import anyio
+import fakeredis
+import prometheus_client
+import pytest
+from pydantic import ValidationError
+
+from sciwyrm import cache, notebook
+from sciwyrm.cache import (
+    CacheBackend,
+    CachedNotebook,
+    CacheUnavailableError,
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    RenderCache,
+    get_render_cache,
+)
+from sciwyrm.config import AppConfig
+
+from ..conftest import TEMPLATE_DIR, TEMPLATE_ID, notebook_spec
+
+
+@pytest.fixture
+def caching_client(make_client):
+    return make_client(deterministic_render=True, render_cache_max_bytes=1024 * 1024)
+
+
+def test_response_has_etag(sciwyrm_client):
+    response = sciwyrm_client.post("/notebook", json=notebook_spec())
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"')
+
+
+def test_deterministic_render_is_reproducible(caching_client):
+    response0 = caching_client.post("/notebook", json=notebook_spec())
+    response1 = caching_client.post("/notebook", json=notebook_spec())
+    assert response0.status_code == 200
+    assert response0.content == response1.content
+    assert response0.headers["etag"] == response1.headers["etag"]
+    assert "template_rendered_at" not in response0.json()["metadata"]["sciwyrm"]
+
+
+def test_cache_hit_does_not_render(caching_client, monkeypatch):
+    first = caching_client.post("/notebook", json=notebook_spec())
+
+    def fail(*args, **kwargs):
+        raise AssertionError("notebook was rendered again")
+
+    monkeypatch.setattr(notebook, "render_notebook", fail)
+    second = caching_client.post("/notebook", json=notebook_spec())
+    assert second.status_code == 200
+    assert second.content == first.content
+
+
+def test_cache_distinguishes_parameters(caching_client):
+    response0 = caching_client.post(
+        "/notebook", json=notebook_spec(file_server_host="host-0")
+    )
+    response1 = caching_client.post(
+        "/notebook", json=notebook_spec(file_server_host="host-1")
+    )
+    assert "host-0" in response0.text
+    assert "host-1" in response1.text
+    assert response0.headers["etag"] != response1.headers["etag"]
+
+
+def test_if_none_match_returns_not_modified(caching_client):
+    etag = caching_client.post("/notebook", json=notebook_spec()).headers["etag"]
+    response = caching_client.post(
+        "/notebook", json=notebook_spec(), headers={"If-None-Match": f'"other", {etag}'}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert not response.content
+
+
+def test_memory_cache_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_bytes=10)
+    backend.set("a", b"aaaa")
+    backend.set("b", b"bbbb")
+    assert backend.get("a") is not None
+    backend.set("c", b"cccc")
+    assert backend.get("b") is None
+    assert backend.get("a") == b"aaaa"
+    assert backend.get("c") == b"cccc"
+    assert backend.size == 8
+
+
+def test_memory_cache_skips_oversized_values():
+    backend = MemoryCacheBackend(max_bytes=3)
+    backend.set("a", b"aaaa")
+    assert len(backend) == 0
+
+
+def test_memory_cache_expires_entries(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    backend = MemoryCacheBackend(max_bytes=10, ttl=5)
+    backend.set("a", b"aaaa")
+    now = 104.0
+    assert backend.get("a") == b"aaaa"
+    now = 106.0
+    assert backend.get("a") is None
+    assert backend.size == 0
+
+
+def test_redis_cache_expires_entries():
+    client = fakeredis.FakeRedis()
+    RedisCacheBackend(client, ttl=30).set("a", b"aaaa")
+    assert 0 < client.ttl("a") <= 30
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(app, make_client, redis_server):
+    """Client whose render cache is a Redis server shared with other replicas."""
+    client = make_client(deterministic_render=True)
+
+    def replica_cache():
+        backend = RedisCacheBackend(fakeredis.FakeRedis(server=redis_server))
+        return RenderCache(backend, max_item_bytes=1024 * 1024)
+
+    app.dependency_overrides[get_render_cache] = replica_cache
+    yield client
+    del app.dependency_overrides[get_render_cache]
+
+
+def test_redis_cache_is_shared(redis_client, monkeypatch):
+    first = redis_client.post(
+        "/notebook", json=notebook_spec(file_server_host="shared")
+    )
+
+    def fail(*args, **kwargs):
+        raise AssertionError("notebook was rendered again")
+
+    # Every request gets a new client, so this also checks sharing between replicas.
+    monkeypatch.setattr(notebook, "render_notebook", fail)
+    second = redis_client.post(
+        "/notebook", json=notebook_spec(file_server_host="shared")
+    )
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_redis_outage_falls_back_to_rendering(redis_client, redis_server):
+    def errors(operation: str) -> float:
+        return (
+            prometheus_client.REGISTRY.get_sample_value(
+                "sciwyrm_render_cache_errors_total", {"operation": operation}
+            )
+            or 0.0
+        )
+
+    redis_server.connected = False
+    get_errors, set_errors = errors("get"), errors("set")
+    response = redis_client.post(
+        "/notebook", json=notebook_spec(file_server_host="down")
+    )
+    assert response.status_code == 200
+    assert "down" in response.text
+    assert errors("get") > get_errors
+    assert errors("set") > set_errors
+
+
+class _UnreachableBackend(CacheBackend):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def get(self, key: str) -> bytes | None:
+        self.calls += 1
+        raise CacheUnavailableError("timed out")
+
+    def set(self, key: str, value: bytes) -> None:
+        self.calls += 1
+        raise CacheUnavailableError("timed out")
+
+    def clear(self, prefix: str) -> None:
+        raise CacheUnavailableError("timed out")
+
+
+def test_cache_outage_costs_at_most_one_timeout_pernotebook_spec(
+    app, monkeypatch, caching_client
+):
+    now = 100.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    backend = _UnreachableBackend()
+    render_cache = RenderCache(backend, max_item_bytes=1024 * 1024, backoff=5)
+    app.dependency_overrides[get_render_cache] = lambda: render_cache
+    try:
+        request = notebook_spec(file_server_host="unreachable")
+        assert caching_client.post("/notebook", json=request).status_code == 200
+        assert backend.calls == 1
+        now = 104.0
+        assert caching_client.post("/notebook", json=request).status_code == 200
+        assert backend.calls == 1
+        # The backend is tried again after the backoff.
+        now = 106.0
+        assert caching_client.post("/notebook", json=request).status_code == 200
+        assert backend.calls == 2
+    finally:
+        del app.dependency_overrides[get_render_cache]
+
+
+def test_cache_skips_validation_of_known_parameters(redis_client, monkeypatch):
+    request = notebook_spec(file_server_host="validated")
+    redis_client.post("/notebook?stream=true", json=request)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("parameters were validated again")
+
+    monkeypatch.setattr(notebook, "_parameter_error", fail)
+    response = redis_client.post("/notebook?stream=true", json=request)
+    assert response.status_code == 200
+    assert "validated" in response.text
+
+
+def test_cache_does_not_store_invalid_parameters(redis_client):
+    request = notebook_spec(file_server_host="invalid")
+    request["parameters"]["file_server_port"] = "not a port"
+    assert redis_client.post("/notebook", json=request).status_code == 422
+    assert redis_client.post("/notebook", json=request).status_code == 422
+
+
+def test_render_cache_skips_oversized_notebooks():
+    render_cache = RenderCache(MemoryCacheBackend(max_bytes=100), max_item_bytes=3)
+    anyio.run(render_cache.put_notebook, "a", CachedNotebook.from_body(b"aaaa"))
+    assert len(render_cache.backend) == 0
+
+
+def test_render_cache_requires_deterministic_render():
+    with pytest.raises(ValidationError, match="deterministic_render"):
+        AppConfig(template_dir=TEMPLATE_DIR, render_cache_max_bytes=100)
+
+
+def test_cache_lookups_are_counted(caching_client):
+    def lookups(result: str) -> float:
+        return (
+            prometheus_client.REGISTRY.get_sample_value(
+                "sciwyrm_render_cache_lookups_total", {"result": result}
+            )
+            or 0.0
+        )
+
+    hits, misses = lookups("hit"), lookups("miss")
+    caching_client.post("/notebook", json=notebook_spec(file_server_host="counted"))
+    caching_client.post("/notebook", json=notebook_spec(file_server_host="counted"))
+    assert lookups("miss") == misses + 1
+    assert lookups("hit") == hits + 1
+
+
+@pytest.fixture
+def duplicate_template_client(make_client, tmp_path):
+    notebook_dir = tmp_path / "notebook"
+    notebook_dir.mkdir()
+    for template_id in ("aaaa", "bbbb"):
+        for suffix in (".ipynb", ".json"):
+            shutil.copy(
+                TEMPLATE_DIR / "notebook" / f"{TEMPLATE_ID}{suffix}",
+                notebook_dir / f"{template_id}{suffix}",
+            )
+    return make_client(
+        template_dir=tmp_path,
+        deterministic_render=True,
+        render_cache_max_bytes=1024 * 1024,
+    )
+
+
+def test_cache_distinguishes_templates_with_identical_files(
+    duplicate_template_client,
+):
+    for template_id in ("aaaa", "bbbb", "aaaa"):
+        response = duplicate_template_client.post(
+            "/notebook", json=notebook_spec(template_id)
+        )
+        assert response.status_code == 200
+        assert response.json()["metadata"]["sciwyrm"]["template_id"] == template_id
@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import json
+from pathlib import Path
+
+import nbformat
+import pytest
+from jinja2 import Environment
+
+from sciwyrm import notebook
+from sciwyrm.cells import compile_cells
+from sciwyrm.compiled import write_manifest
+from sciwyrm.templates import TemplateRegistry, compile_templates
+
+from ..conftest import TEMPLATE_DIR, TEMPLATE_ID
+
+
+@pytest.fixture
+def cells_template_dir(tmp_path):
+    """Return a template dir with the generic template in the cells format."""
+    notebook_dir = tmp_path / "notebook"
+    notebook_dir.mkdir()
+    source = (TEMPLATE_DIR / "notebook" / f"{TEMPLATE_ID}.ipynb").read_text()
+    (notebook_dir / f"{TEMPLATE_ID}.ipynb").write_text(source)
+    config = json.loads((TEMPLATE_DIR / "notebook" / f"{TEMPLATE_ID}.json").read_text())
+    config["template_format"] = "cells"
+    (notebook_dir / f"{TEMPLATE_ID}.json").write_text(json.dumps(config))
+    return tmp_path
+
+
+def _parameters(file_server_host: str = "login") -> dict:
+    return {
+        "scicat_url": "https://test-url.sci.cat",
+        "file_server_host": file_server_host,
+        "file_server_port": 22,
+        "dataset_pids": ["abcd/123.522", "abcd/883.2"],
+        "scicat_token": "sometoken",
+    }
+
+
+def _render(template_dir: Path, parameters: dict, *, stream: bool = False) -> dict:
+    template = TemplateRegistry(template_dir).snapshot[TEMPLATE_ID]
+    spec = notebook.validate_spec(
+        notebook.NotebookSpec(template_id=TEMPLATE_ID, parameters=parameters),
+        template.config,
+    )
+    if stream:
+        rendered = b"".join(
+            notebook.generate_notebook(
+                template.template, spec, deterministic=True, chunk_size=1024
+            )
+        )
+    else:
+        rendered = notebook.render_notebook(template.template, spec, deterministic=True)
+    return json.loads(rendered)
+
+
+def _sources(nb: dict) -> list[str]:
+    return ["".join(cell["source"]) for cell in nb["cells"]]
+
+
+@pytest.mark.parametrize("file_server_host", ["login", 'with "quotes"\n\\ and ü'])
+def test_cells_template_matches_text_template(cells_template_dir, file_server_host):
+    parameters = _parameters(file_server_host)
+    expected = _render(TEMPLATE_DIR, parameters)
+    actual = _render(cells_template_dir, parameters)
+
+    nbformat.validate(nbformat.from_dict(actual))
+    assert _sources(actual) == _sources(expected)
+    assert actual["nbformat"] == expected["nbformat"]
+    assert actual["nbformat_minor"] == expected["nbformat_minor"]
+    actual_sciwyrm = actual["metadata"].pop("sciwyrm")
+    expected_sciwyrm = expected["metadata"].pop("sciwyrm")
+    assert actual["metadata"] == expected["metadata"]
+    # The hashes differ because the template files differ.
+    del actual_sciwyrm["template_hash"], expected_sciwyrm["template_hash"]
+    assert actual_sciwyrm == expected_sciwyrm
+    # The header cell id depends on the template hash.
+    assert [cell["id"] for cell in actual["cells"][1:]] == [
+        cell["id"] for cell in expected["cells"][1:]
+    ]
+
+
+def test_cells_template_can_be_streamed(cells_template_dir):
+    parameters = _parameters()
+    assert _render(cells_template_dir, parameters, stream=True) == _render(
+        cells_template_dir, parameters
+    )
+
+
+def test_compile_cells_encodes_static_cells_once():
+    source = json.dumps(
+        {
+            "cells": [
+                {"cell_type": "markdown", "metadata": {}, "source": ["# Static"]},
+                {"cell_type": "code", "metadata": {}, "source": ["x = {{ X }}"]},
+            ],
+            "metadata": {"kernelspec": {"name": "python3"}},
+            "nbformat": 4,
+            "nbformat_minor": 5,
+        }
+    )
+    cells, metadata, rest = compile_cells(
+        Environment(autoescape=False), source, "t", "t.ipynb"  # noqa: S701
+    )
+    assert json.loads(cells[0]) == {
+        "cell_type": "markdown",
+        "metadata": {},
+        "source": ["# Static"],
+    }
+    assert cells[1][0] == '{"cell_type":"code","metadata":{},"source":'
+    assert json.loads(metadata) == {"kernelspec": {"name": "python3"}}
+    assert json.loads(rest) == {"nbformat": 4, "nbformat_minor": 5}
+
+
+def test_cells_template_can_be_precompiled(cells_template_dir, monkeypatch):
+    compiled_dir = cells_template_dir / ".compiled"
+    write_manifest(compiled_dir, compile_templates(cells_template_dir))
+    expected = TemplateRegistry(cells_template_dir).snapshot[TEMPLATE_ID]
+
+    def compile_(*args, **kwargs):
+        raise AssertionError("Template was compiled")
+
+    monkeypatch.setattr(Environment, "compile", compile_)
+    loaded = TemplateRegistry(cells_template_dir, compiled_dir=compiled_dir).snapshot[
+        TEMPLATE_ID
+    ]
+    assert loaded.config.template_format == "cells"
+    context = {
+        "_SCIWYRM_HEADER_CELL": "{}",
+        "_SCIWYRM_METADATA": "{}",
+        "DATASET_PIDS": ["a"],
+        "FILE_SERVER_PORT": 22,
+    }
+    assert loaded.template.render(context) == expected.template.render(context)
@@ -0,0 +1,164 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import asyncio
+
+import pytest
+
+from sciwyrm import metrics, workers
+from sciwyrm.coalescing import SingleFlight
+
+from ..conftest import notebook_spec
+
+TOKEN_A = "token-a"  # noqa: S105
+TOKEN_B = "token-b"  # noqa: S105
+
+
+@pytest.fixture
+def render_calls(monkeypatch):
+    calls = []
+    render_notebook = workers.render_notebook
+
+    async def counting_render_notebook(pool, config, spec, template, **kwargs):
+        calls.append(spec.parameters["scicat_token"])
+        return await render_notebook(pool, config, spec, template, **kwargs)
+
+    monkeypatch.setattr(workers, "render_notebook", counting_render_notebook)
+    return calls
+
+
+def _coalescing_sample(role: str) -> float:
+    return metrics.sample("sciwyrm_render_coalescing_total", role=role)
+
+
+def test_single_flight_shares_result_of_concurrent_calls():
+    async def run():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return calls
+
+        running = [asyncio.ensure_future(flights.run("a", fn)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flights.in_flight() == 1
+        release.set()
+        assert await asyncio.gather(*running) == [(1, True), (1, False), (1, False)]
+        assert flights.in_flight() == 0
+        # The next call runs again.
+        assert await flights.run("a", fn) == (2, True)
+
+    asyncio.run(run())
+
+
+def test_single_flight_does_not_share_between_keys():
+    async def run():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def fn(value):
+            await release.wait()
+            return value
+
+        running = [
+            asyncio.ensure_future(flights.run(key, lambda key=key: fn(key)))
+            for key in ("a", "b")
+        ]
+        await asyncio.sleep(0)
+        assert flights.in_flight() == 2
+        release.set()
+        assert await asyncio.gather(*running) == [("a", True), ("b", True)]
+
+    asyncio.run(run())
+
+
+def test_single_flight_shares_exceptions_and_survives_cancelled_leader():
+    async def run():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def fn():
+            await release.wait()
+            raise ValueError("failed")
+
+        leader = asyncio.ensure_future(flights.run("a", fn))
+        follower = asyncio.ensure_future(flights.run("a", fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(ValueError, match="failed"):
+            await follower
+        assert leader.cancelled()
+        assert flights.in_flight() == 0
+
+    asyncio.run(run())
+
+
+def test_identical_concurrent_requests_render_once(sciwyrm_client, render_calls):
+    leaders = _coalescing_sample("leader")
+    coalesced = _coalescing_sample("coalesced")
+    response = sciwyrm_client.post(
+        "/notebook/batch", json=[notebook_spec(scicat_token=TOKEN_A)] * 3
+    )
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["status"] for item in items] == [200, 200, 200]
+    assert items[0]["notebook"] == items[1]["notebook"] == items[2]["notebook"]
+    assert render_calls == [TOKEN_A]
+    assert _coalescing_sample("leader") == leaders + 1
+    assert _coalescing_sample("coalesced") == coalesced + 2
+
+
+def test_requests_with_different_tokens_are_not_coalesced(sciwyrm_client, render_calls):
+    response = sciwyrm_client.post(
+        "/notebook/batch",
+        json=[
+            notebook_spec(scicat_token=TOKEN_A),
+            notebook_spec(scicat_token=TOKEN_B),
+        ],
+    )
+    assert response.status_code == 200
+    notebooks = [item["notebook"] for item in response.json()]
+    assert sorted(render_calls) == [TOKEN_A, TOKEN_B]
+    assert TOKEN_A in str(notebooks[0])
+    assert TOKEN_B not in str(notebooks[0])
+    assert TOKEN_B in str(notebooks[1])
+
+
+def test_equal_but_differently_typed_parameters_are_not_coalesced(
+    sciwyrm_client, render_calls
+):
+    # 22 == 22.0 in Python, but the notebooks differ.
+    response = sciwyrm_client.post(
+        "/notebook/batch",
+        json=[
+            notebook_spec(scicat_token=TOKEN_A, file_server_port=22),
+            notebook_spec(scicat_token=TOKEN_A, file_server_port=22.0),
+        ],
+    )
+    assert response.status_code == 200
+    assert len(render_calls) == 2
+
+
+def test_coalesced_requests_share_validation_errors(sciwyrm_client, render_calls):
+    response = sciwyrm_client.post(
+        "/notebook/batch",
+        json=[notebook_spec(scicat_token=TOKEN_A, file_server_port="abc")] * 2,
+    )
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()] == [422, 422]
+    assert render_calls == [TOKEN_A]
+
+
+def test_coalescing_can_be_disabled(make_client, render_calls):
+    client = make_client(coalesce_renders=False)
+    response = client.post(
+        "/notebook/batch", json=[notebook_spec(scicat_token=TOKEN_A)] * 3
+    )
+    assert response.status_code == 200
+    assert render_calls == [TOKEN_A] * 3
@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import json
+
+from jinja2 import Environment
+
+from sciwyrm import cli, templates
+from sciwyrm.compiled import MANIFEST_NAME, TemplateManifest, write_manifest
+from sciwyrm.templates import TemplateRegistry, compile_templates
+
+from ..conftest import TEMPLATE_ID, touch
+
+
+def _forbid_compilation(monkeypatch):
+    def compile_(*args, **kwargs):
+        raise AssertionError("Template was compiled")
+
+    monkeypatch.setattr(Environment, "compile", compile_)
+
+
+def test_registry_uses_compiled_templates(template_dir, monkeypatch):
+    compiled_dir = template_dir / ".compiled"
+    write_manifest(compiled_dir, compile_templates(template_dir))
+    expected = TemplateRegistry(template_dir).snapshot[TEMPLATE_ID]
+
+    _forbid_compilation(monkeypatch)
+    loaded = TemplateRegistry(template_dir, compiled_dir=compiled_dir).snapshot[
+        TEMPLATE_ID
+    ]
+    assert loaded.config == expected.config
+    context = {"FILE_SERVER_PORT": 22}
+    assert loaded.template.render(context) == expected.template.render(context)
+
+
+def test_registry_compiles_changed_templates(template_dir):
+    compiled_dir = template_dir / ".compiled"
+    write_manifest(compiled_dir, compile_templates(template_dir))
+    path = template_dir / "notebook" / f"{TEMPLATE_ID}.ipynb"
+    touch(path, path.read_text().replace("Scicat configuration", "Configuration"))
+
+    template = TemplateRegistry(template_dir, compiled_dir=compiled_dir).snapshot[
+        TEMPLATE_ID
+    ]
+    assert "Scicat configuration" not in template.template.render(
+        {"FILE_SERVER_PORT": 22}
+    )
+    assert (
+        template.config.template_hash
+        != TemplateManifest.load(compiled_dir).template_hashes()[TEMPLATE_ID]
+    )
+
+
+def test_registry_does_not_read_unchanged_compiled_templates(template_dir, monkeypatch):
+    compiled_dir = template_dir / ".compiled"
+    write_manifest(compiled_dir, compile_templates(template_dir))
+
+    def hash_(*args, **kwargs):
+        raise AssertionError("Template was hashed")
+
+    _forbid_compilation(monkeypatch)
+    monkeypatch.setattr(templates, "_notebook_template_hash", hash_)
+    template = TemplateRegistry(template_dir, compiled_dir=compiled_dir).snapshot[
+        TEMPLATE_ID
+    ]
+    assert "Scicat configuration" in template.template.render({"FILE_SERVER_PORT": 22})
+
+
+def test_registry_rehashes_touched_templates(template_dir, monkeypatch):
+    compiled_dir = template_dir / ".compiled"
+    write_manifest(compiled_dir, compile_templates(template_dir))
+    path = template_dir / "notebook" / f"{TEMPLATE_ID}.ipynb"
+    touch(path, path.read_text())
+
+    hashed = []
+    hash_ = templates._notebook_template_hash
+    monkeypatch.setattr(
+        templates,
+        "_notebook_template_hash",
+        lambda *args: hashed.append(args) or hash_(*args),
+    )
+    _forbid_compilation(monkeypatch)
+    registry = TemplateRegistry(template_dir, compiled_dir=compiled_dir)
+    # The content is unchanged, so the compiled template is still used.
+    assert len(hashed) == 1
+    assert (
+        registry.snapshot[TEMPLATE_ID].config.template_hash
+        == TemplateManifest.load(compiled_dir).template_hashes()[TEMPLATE_ID]
+    )
+    assert registry.snapshot[TEMPLATE_ID].signature == templates._file_signature(path)
+
+
+def test_manifest_from_other_versions_is_ignored(template_dir):
+    compiled_dir = template_dir / ".compiled"
+    write_manifest(compiled_dir, compile_templates(template_dir))
+    manifest_path = compiled_dir / MANIFEST_NAME
+    content = json.loads(manifest_path.read_text())
+    content["versions"]["jinja2"] = "0.0.0"
+    manifest_path.write_text(json.dumps(content))
+
+    assert TemplateManifest.load(compiled_dir) is None
+
+
+def test_missing_manifest(tmp_path):
+    assert TemplateManifest.load(tmp_path / "does-not-exist") is None
+
+
+def test_cli_compile_and_check(template_dir, capsys):
+    args = ["--template-dir", str(template_dir)]
+    assert cli.main(["compile-templates", *args, "--check"]) == 1
+    assert cli.main(["compile-templates", *args]) == 0
+    assert cli.main(["compile-templates", *args, "--check"]) == 0
+
+    path = template_dir / "notebook" / f"{TEMPLATE_ID}.json"
+    touch(path, path.read_text().replace('"Generic"', '"Renamed"'))
+    assert cli.main(["compile-templates", *args, "--check"]) == 1
+    assert "out of date" in capsys.readouterr().out
+
+
+def test_registry_builds_validators_of_compiled_templates_lazily(template_dir):
+    compiled_dir = template_dir / ".compiled"
+    write_manifest(compiled_dir, compile_templates(template_dir))
+    config = (
+        TemplateRegistry(template_dir, compiled_dir=compiled_dir)
+        .snapshot[TEMPLATE_ID]
+        .config
+    )
+    assert "parameter_validator" not in vars(config)
+    assert config.parameter_validator.is_valid(
+        {
+            "scicat_url": "https://test-url.sci.cat",
+            "file_server_host": "login",
+            "file_server_port": 22,
+            "dataset_pids": [],
+        }
+    )
@@ -0,0 +1,168 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from sciwyrm import compression
+from sciwyrm.config import AppConfig
+
+from ..conftest import TEMPLATE_DIR, TEMPLATE_ID, spec_with_pids
+
+
+def _decompress(body: bytes, coding: str) -> bytes:
+    if coding == "gzip":
+        return gzip.decompress(body)
+    if coding == "br":
+        return compression.brotli.decompress(body)
+    return compression.zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+
+@pytest.fixture(params=["gzip", "br", "zstd"])
+def coding(request):
+    if request.param not in compression.AVAILABLE:
+        pytest.skip(f"{request.param} is not installed")
+    return request.param
+
+
+def _get_raw(client: TestClient, url: str, coding: str, **kwargs):
+    # Read the body without letting httpx decode it.
+    with client.stream(
+        "GET", url, headers={"Accept-Encoding": coding}, **kwargs
+    ) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def _post_raw(client: TestClient, url: str, coding: str, **kwargs):
+    with client.stream(
+        "POST", url, headers={"Accept-Encoding": coding}, **kwargs
+    ) as response:
+        return response, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("GZIP", "gzip"),
+        ("gzip, zstd", "zstd"),
+        ("gzip;q=1, zstd;q=0.5", "gzip"),
+        ("zstd;q=0, gzip", "gzip"),
+        ("*", "zstd"),
+        ("*;q=0.5, br", "br"),
+        ("deflate", None),
+    ],
+)
+def test_negotiate(accept_encoding, expected):
+    config = AppConfig(template_dir=TEMPLATE_DIR)
+    assert compression.negotiate(accept_encoding, config) == expected
+
+
+def test_negotiate_respects_configured_encodings():
+    config = AppConfig(template_dir=TEMPLATE_DIR, compression_encodings=["gzip"])
+    assert compression.negotiate("zstd, br, gzip", config) == "gzip"
+    assert compression.negotiate("zstd, br", config) is None
+
+
+def test_template_list_is_compressed_once(make_client, coding, monkeypatch):
+    client = make_client(compression_min_size=0)
+    identity = client.get(
+        "/notebook/templates", headers={"Accept-Encoding": "identity"}
+    )
+    response, body = _get_raw(client, "/notebook/templates", coding)
+    assert response.headers["content-encoding"] == coding
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert _decompress(body, coding) == identity.content
+    assert response.headers["etag"] != identity.headers["etag"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("response was compressed again")
+
+    monkeypatch.setattr(compression, "compress", fail)
+    again, again_body = _get_raw(client, "/notebook/templates", coding)
+    assert again_body == body
+
+
+def test_compressed_etag_is_revalidated(make_client, coding):
+    client = make_client(compression_min_size=0)
+    url = f"/notebook/schema/{TEMPLATE_ID}"
+    etag = client.get(url, headers={"Accept-Encoding": coding}).headers["etag"]
+    response = client.get(
+        url, headers={"Accept-Encoding": coding, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_notebook_is_compressed(make_client, coding):
+    client = make_client(deterministic_render=True)
+    identity = client.post(
+        "/notebook", json=spec_with_pids(20), headers={"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in identity.headers
+    response, body = _post_raw(client, "/notebook", coding, json=spec_with_pids(20))
+    assert response.headers["content-encoding"] == coding
+    assert json.loads(_decompress(body, coding)) == identity.json()
+
+
+def test_streamed_notebook_is_compressed(make_client, coding):
+    client = make_client(deterministic_render=True, stream_chunk_size=1024)
+    identity = client.post(
+        "/notebook?stream=true",
+        json=spec_with_pids(1000),
+        headers={"Accept-Encoding": "identity"},
+    )
+    response, body = _post_raw(
+        client, "/notebook?stream=true", coding, json=spec_with_pids(1000)
+    )
+    assert response.headers["content-encoding"] == coding
+    assert "content-length" not in response.headers
+    assert json.loads(_decompress(body, coding)) == identity.json()
+
+
+def test_cached_notebooks_are_compressed_once(make_client, coding, monkeypatch):
+    client = make_client(deterministic_render=True, render_cache_max_bytes=2**20)
+    _, first = _post_raw(client, "/notebook", coding, json=spec_with_pids(20))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("notebook was compressed again")
+
+    monkeypatch.setattr(compression, "compress", fail)
+    _, second = _post_raw(client, "/notebook", coding, json=spec_with_pids(20))
+    assert second == first
+
+
+def test_small_responses_are_not_compressed(make_client):
+    client = make_client(compression_min_size=10_000)
+    response = client.get(
+        "/notebook/schema/does-not-exist", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 404
+    assert "content-encoding" not in response.headers
+    assert "accept-encoding" in response.headers["vary"].lower()
+
+
+def test_compression_can_be_disabled(make_client):
+    client = make_client(compression_encodings=[])
+    response = client.post(
+        "/notebook", json=spec_with_pids(20), headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_zip_archives_are_not_compressed(make_client):
+    client = make_client()
+    response = client.post(
+        "/notebook/batch?format=zip",
+        json=[spec_with_pids(20)],
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,63 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import json
+
+import nbformat
+import pytest
+
+from sciwyrm import encoding
+
+from ..conftest import TEMPLATE_ID
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(encoding, "orjson", None)
+    elif encoding.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_dumps_is_compact_utf8(backend):
+    obj = {"a": [1, 2.5, None, True], "b": 'änd \u2028 "quoted"\n', "c": {}}
+    encoded = encoding.dumps(obj)
+    assert encoded == json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+    assert encoding.loads(encoded) == obj
+
+
+def test_dumps_indent(backend):
+    obj = {"a": [1, {"b": "c"}]}
+    assert encoding.dumps(obj, indent=True) == json.dumps(obj, indent=2).encode()
+
+
+def test_dumps_large_int(backend):
+    assert encoding.dumps([2**70]) == b"[1180591620717411303424]"
+
+
+def test_format_notebook_with_backend(backend, sciwyrm_client):
+    response = sciwyrm_client.post(
+        "/notebook",
+        json={
+            "template_id": TEMPLATE_ID,
+            "parameters": {
+                "scicat_url": "https://test-url.sci.cat",
+                "file_server_host": "lögin",
+                "file_server_port": 22,
+                "dataset_pids": ["abcd/123.522"],
+            },
+        },
+    )
+    assert response.status_code == 200
+    nb = nbformat.reads(response.text, as_version=4)
+    nbformat.validate(nb)
+    assert any("lögin" in cell.source for cell in nb.cells)
+
+
+def test_endpoints_use_json_response(backend, sciwyrm_client):
+    response = sciwyrm_client.get("/notebook/templates")
+    assert response.status_code == 200
+    assert response.content == encoding.dumps(response.json())
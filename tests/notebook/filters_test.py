@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import json
+
+from hypothesis import given
+from hypothesis import strategies as st
+from jinja2 import Environment
+
+from sciwyrm import filters
+
+# The code in the PID cell of the generic template before json_list was added.
+LOOP_TEMPLATE = (
+    "input_dataset_pids = [{% for pid in pids %}\\n"
+    "    {{ pid | quote | je | safe }},{% endfor %}\\n"
+    "]"
+)
+
+
+def _env() -> Environment:
+    env = Environment(autoescape=True)
+    env.filters["quote"] = filters.quote
+    env.filters["je"] = filters.json_escape
+    env.filters["json_list"] = filters.json_list
+    return env
+
+
+@given(st.text())
+def test_json_string_matches_quote_je(value):
+    assert filters.json_string(value) == filters.json_escape(filters.quote(value))
+
+
+@given(st.text())
+def test_string_literal_matches_quote_escape_newlines(value):
+    assert filters.string_literal(value) == filters.escape_newlines(
+        filters.quote(value)
+    )
+
+
+@given(st.text())
+def test_json_string_is_valid_in_json_string(value):
+    decoded = json.loads(f'"{filters.json_string(value)}"')
+    assert decoded == filters.string_literal(value)
+
+
+@given(st.lists(st.text()))
+def test_json_list_matches_loop_over_json_string(values):
+    env = _env()
+    loop = env.from_string(LOOP_TEMPLATE).render(pids=values)
+    fused = env.from_string(
+        "input_dataset_pids = {{ pids | json_list(indent=4) }}"
+    ).render(pids=values)
+    assert json.loads(f'"{fused}"') == json.loads(f'"{loop}"')
+
+
+@given(st.lists(st.text()))
+def test_json_list_without_indent_is_one_line(values):
+    literal = json.loads(f'"{filters.json_list(values)}"')
+    assert literal == filters.list_literal(values)
+    expected = ", ".join(filters.string_literal(value) for value in values)
+    assert literal == f"[{expected}]"
@@ -0,0 +1,187 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import itertools
+import json
+import pickle
+import re
+
+import pytest
+
+from sciwyrm import metrics, notebook
+from sciwyrm.cells import CellTemplate, compile_cells
+from sciwyrm.config import AppConfig
+from sciwyrm.notebook import RenderBudgetExceededError, check_array_lengths
+from sciwyrm.templates import (
+    NotebookTemplateConfig,
+    RenderLimits,
+    TemplateRegistry,
+    _make_cell_environment,
+)
+from sciwyrm.workers import render_limits
+
+from ..conftest import TEMPLATE_DIR, TEMPLATE_ID, notebook_spec, spec_with_pids
+
+
+def _exceeded(limit: str) -> float:
+    return metrics.sample(
+        "sciwyrm_render_budget_exceeded_total", template_id=TEMPLATE_ID, limit=limit
+    )
+
+
+def test_check_array_lengths_accepts_arrays_within_limit():
+    check_array_lengths(
+        {"a": [1, 2], "b": {"c": [[1, 2], [3]]}}, RenderLimits(max_array_length=2)
+    )
+
+
+@pytest.mark.parametrize(
+    ("parameters", "path"),
+    [
+        ({"a": [1, 2, 3]}, "$.a"),
+        ({"a": {"b": [1, 2, 3]}}, "$.a.b"),
+        ({"a": [[1], [1, 2, 3]]}, "$.a[1]"),
+        ({"a": [{"b": [1, 2, 3]}]}, "$.a[0].b"),
+    ],
+)
+def test_check_array_lengths_rejects_long_arrays(parameters, path):
+    with pytest.raises(
+        RenderBudgetExceededError, match=f"Array {re.escape(path)} "
+    ) as exc:
+        check_array_lengths(parameters, RenderLimits(max_array_length=2))
+    assert exc.value.limit == "max_array_length"
+
+
+def test_render_budget_exceeded_error_can_be_pickled():
+    error = RenderBudgetExceededError("max_bytes", "Too large")
+    unpickled = pickle.loads(pickle.dumps(error))  # noqa: S301
+    assert unpickled.limit == "max_bytes"
+    assert str(unpickled) == "Too large"
+
+
+def test_render_limits_uses_stricter_limits():
+    template_config = NotebookTemplateConfig(
+        submission_name="test",
+        display_name="Test",
+        version="1",
+        description="",
+        authors=[],
+        parameter_schema={},
+        render_limits={"max_seconds": 100, "max_bytes": 1000},
+        template_hash="blake2b:0",
+    )
+    config = AppConfig(
+        template_dir=TEMPLATE_DIR,
+        render_max_seconds=10,
+        render_max_bytes=1_000_000,
+        render_max_array_length=0,
+    )
+    assert render_limits(config, template_config) == RenderLimits(
+        max_seconds=10, max_bytes=1000, max_array_length=None
+    )
+
+
+def test_too_long_arrays_are_rejected(make_client):
+    client = make_client(render_max_array_length=3)
+    assert client.post("/notebook", json=spec_with_pids(3)).status_code == 200
+    exceeded = _exceeded("max_array_length")
+    response = client.post("/notebook", json=spec_with_pids(4))
+    assert response.status_code == 413
+    assert "$.dataset_pids has 4 items" in response.json()["detail"]
+    assert _exceeded("max_array_length") == exceeded + 1
+
+
+def test_too_large_notebooks_are_rejected(make_client):
+    client = make_client(render_max_bytes=10_000)
+    assert client.post("/notebook", json=spec_with_pids(1)).status_code == 200
+    exceeded = _exceeded("max_bytes")
+    response = client.post("/notebook", json=spec_with_pids(1000))
+    assert response.status_code == 413
+    assert _exceeded("max_bytes") == exceeded + 1
+
+
+def test_slow_renders_are_aborted(make_client, monkeypatch):
+    client = make_client(render_max_seconds=1)
+    # Every reading of the clock advances it by 10 seconds.
+    clock = itertools.count(step=10)
+    monkeypatch.setattr(notebook.time, "monotonic", lambda: next(clock))
+    exceeded = _exceeded("max_seconds")
+    response = client.post("/notebook", json=spec_with_pids(1))
+    assert response.status_code == 422
+    assert "longer than 1" in response.json()["detail"]
+    assert _exceeded("max_seconds") == exceeded + 1
+
+
+def test_batch_reports_exceeded_limits_per_notebook(make_client):
+    client = make_client(render_max_array_length=3)
+    response = client.post(
+        "/notebook/batch", json=[spec_with_pids(1), spec_with_pids(4)]
+    )
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()] == [200, 413]
+
+
+def test_streams_are_limited(make_client):
+    client = make_client(render_max_bytes=10_000, render_max_array_length=3)
+    response = client.post("/notebook?stream=true", json=spec_with_pids(4))
+    assert response.status_code == 413
+    exceeded = _exceeded("max_bytes")
+    request = notebook_spec(dataset_pids=["x" * 20_000])
+    with pytest.raises(RenderBudgetExceededError):
+        client.post("/notebook?stream=true", json=request)
+    assert _exceeded("max_bytes") == exceeded + 1
+
+
+@pytest.fixture
+def limited_template_client(make_client, template_dir):
+    config_path = template_dir / "notebook" / f"{TEMPLATE_ID}.json"
+    template_config = json.loads(config_path.read_text())
+    template_config["render_limits"] = {"max_array_length": 2}
+    config_path.write_text(json.dumps(template_config))
+
+    return make_client(template_dir=template_dir)
+
+
+def test_templates_can_lower_limits(limited_template_client):
+    assert (
+        limited_template_client.post("/notebook", json=spec_with_pids(2)).status_code
+        == 200
+    )
+    response = limited_template_client.post("/notebook", json=spec_with_pids(3))
+    assert response.status_code == 413
+
+
+def test_limits_are_checked_within_cells_of_cell_templates():
+    source = json.dumps(
+        {
+            "cells": [
+                {
+                    "cell_type": "code",
+                    "metadata": {},
+                    "source": "{% for pid in DATASET_PIDS %}{{ pid }}\n{% endfor %}",
+                }
+            ],
+            "metadata": {},
+            "nbformat": 4,
+            "nbformat_minor": 5,
+        }
+    )
+    env = _make_cell_environment()
+    template = CellTemplate(env, compile_cells(env, source, "test", "test.ipynb"))
+    consumed = 0
+
+    def pids():
+        nonlocal consumed
+        for i in range(100_000):
+            consumed += 1
+            yield f"abcd/{i}"
+
+    spec = notebook.NotebookSpecWithConfig.model_construct(
+        template_id=TEMPLATE_ID,
+        parameters={"dataset_pids": pids()},
+        config=TemplateRegistry(TEMPLATE_DIR).snapshot[TEMPLATE_ID].config,
+    )
+    with pytest.raises(RenderBudgetExceededError):
+        notebook.render_notebook(template, spec, limits=RenderLimits(max_bytes=10_000))
+    # The loop was aborted long before rendering all PIDs.
+    assert consumed < 10_000
@@ -0,0 +1,63 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import prometheus_client
+
+from sciwyrm.metrics import StageTimer
+
+from ..conftest import TEMPLATE_ID, notebook_spec
+
+
+def _sample(name: str, **labels: str) -> float:
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_requests_are_counted_by_route(sciwyrm_client):
+    labels = {"method": "GET", "endpoint": "/notebook/schema/{template_id}"}
+    before = _sample("sciwyrm_http_requests_total", status="200", **labels)
+    sciwyrm_client.get(f"/notebook/schema/{TEMPLATE_ID}")
+    assert _sample("sciwyrm_http_requests_total", status="200", **labels) == before + 1
+    assert _sample("sciwyrm_http_request_duration_seconds_count", **labels) > 0
+
+
+def test_unmatched_requests_share_a_label(sciwyrm_client):
+    labels = {"method": "GET", "endpoint": "unmatched", "status": "404"}
+    before = _sample("sciwyrm_http_requests_total", **labels)
+    sciwyrm_client.get("/does/not/exist")
+    assert _sample("sciwyrm_http_requests_total", **labels) == before + 1
+
+
+def test_notebooks_are_counted_by_template_and_outcome(sciwyrm_client):
+    rendered = {"template_id": TEMPLATE_ID, "outcome": "rendered"}
+    invalid = {"template_id": TEMPLATE_ID, "outcome": "invalid"}
+    before_rendered = _sample("sciwyrm_notebooks_total", **rendered)
+    before_invalid = _sample("sciwyrm_notebooks_total", **invalid)
+
+    sciwyrm_client.post("/notebook", json=notebook_spec())
+    sciwyrm_client.post("/notebook", json=notebook_spec(file_server_port="not a port"))
+
+    assert _sample("sciwyrm_notebooks_total", **rendered) == before_rendered + 1
+    assert _sample("sciwyrm_notebooks_total", **invalid) == before_invalid + 1
+
+
+def test_render_stages_are_timed(sciwyrm_client):
+    stages = ("validate", "metadata", "render", "encode", "etag")
+    before = {
+        stage: _sample("sciwyrm_render_stage_duration_seconds_count", stage=stage)
+        for stage in stages
+    }
+    sciwyrm_client.post("/notebook", json=notebook_spec())
+    for stage in stages:
+        count = _sample("sciwyrm_render_stage_duration_seconds_count", stage=stage)
+        assert count == before[stage] + 1
+
+
+def test_stage_timer_accumulates_repeated_stages():
+    timer = StageTimer()
+    with timer.stage("a"):
+        pass
+    first = timer.durations["a"]
+    with timer.stage("a"):
+        pass
+    assert timer.durations["a"] >= first
+    assert list(timer.durations) == ["a"]
@@ -3,11 +3,16 @@
 
 import re
 from io import StringIO
+from pathlib import Path
 from typing import Any
 
 import nbformat
 import pytest
 from nbconvert import PythonExporter
+from pydantic import ValidationError
+
+from sciwyrm import notebook
+from sciwyrm.templates import TemplateRegistry
 
 from ..seed import SEED
 
@@ -41,6 +46,29 @@ def test_list_notebook_templates(sciwyrm_client):
     ]
 
 
+@pytest.mark.parametrize(
+    "url", ["/notebook/templates", f"/notebook/schema/{TEMPLATE_IDS['generic']}"]
+)
+def test_template_endpoints_support_conditional_requests(sciwyrm_client, url):
+    response = sciwyrm_client.get(url)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    response = sciwyrm_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert not response.content
+
+
+def test_template_endpoints_are_documented(sciwyrm_client):
+    paths = sciwyrm_client.get("/openapi.json").json()["paths"]
+    content = paths["/notebook/templates"]["get"]["responses"]["200"]["content"]
+    assert content["application/json"]["schema"]["items"] == {
+        "$ref": "#/components/schemas/TemplateSummary"
+    }
+
+
 def test_template_parameter_schema(sciwyrm_client):
     response = sciwyrm_client.get(f"/notebook/schema/{TEMPLATE_IDS['generic']}")
     assert response.is_success
@@ -238,6 +266,28 @@ def test_notebook_contains_metadata(sciwyrm_client):
     ]
 
 
+def test_notebook_starts_with_header_cell(sciwyrm_client):
+    response = sciwyrm_client.post(
+        "/notebook",
+        json={
+            "template_id": TEMPLATE_IDS["generic"],
+            "parameters": {
+                "scicat_url": "https://test-url.sci.cat",
+                "file_server_host": "login",
+                "file_server_port": 22,
+                "dataset_pids": ["abcd/123.522"],
+            },
+        },
+    )
+    assert response.status_code == 200
+    nb = nbformat.reads(response.text, as_version=4)
+    nbformat.validate(nb)
+    header = nb["cells"][0]
+    assert header["cell_type"] == "markdown"
+    assert nb["metadata"]["sciwyrm"]["template_rendered_at"] in header["source"]
+    assert nb["cells"][1]["source"].startswith("# Generic")
+
+
 @pytest.mark.parametrize(
     "input_str,expected",
     [
@@ -266,6 +316,20 @@ def test_notebook_string_quoting(sciwyrm_client, input_str: str, expected: str):
     assert expected in response.text
 
 
+def test_notebook_unknown_template(sciwyrm_client):
+    response = sciwyrm_client.post(
+        "/notebook",
+        json={"template_id": "not-a-template", "parameters": {}},
+    )
+    assert response.status_code == 404
+    assert "not-a-template" in response.text
+
+
+def test_template_parameter_schema_unknown_template(sciwyrm_client):
+    response = sciwyrm_client.get("/notebook/schema/not-a-template")
+    assert response.status_code == 404
+
+
 def test_notebook_bad_parameter(sciwyrm_client):
     response = sciwyrm_client.post(
         "/notebook",
@@ -317,6 +381,139 @@ def test_notebook_extra_parameter(sciwyrm_client):
     assert "extra" in response.text
 
 
+@pytest.mark.parametrize(
+    ("content", "content_type", "expected"),
+    [
+        (
+            b"",
+            "application/json",
+            {
+                "type": "missing",
+                "loc": ["body"],
+                "msg": "Field required",
+                "input": None,
+            },
+        ),
+        (
+            b'{"template_id": ',
+            "application/json",
+            {
+                "type": "json_invalid",
+                "loc": ["body", 16],
+                "msg": "JSON decode error",
+                "input": {},
+                "ctx": {"error": "Expecting value"},
+            },
+        ),
+        (
+            b"[]",
+            None,
+            {
+                "type": "model_attributes_type",
+                "loc": ["body"],
+                "msg": "Input should be a valid dictionary or object "
+                "to extract fields from",
+                "input": [],
+            },
+        ),
+        (
+            b'{"template_id": 1, "parameters": {}}',
+            "text/plain",
+            {
+                "type": "model_attributes_type",
+                "loc": ["body"],
+                "msg": "Input should be a valid dictionary or object "
+                "to extract fields from",
+                "input": '{"template_id": 1, "parameters": {}}',
+            },
+        ),
+        (
+            b'{"template_id": 1, "parameters": {}}',
+            "application/vnd.api+json",
+            {
+                "type": "string_type",
+                "loc": ["body", "template_id"],
+                "msg": "Input should be a valid string",
+                "input": 1,
+            },
+        ),
+    ],
+)
+def test_notebook_malformed_body(sciwyrm_client, content, content_type, expected):
+    headers = {} if content_type is None else {"Content-Type": content_type}
+    response = sciwyrm_client.post("/notebook", content=content, headers=headers)
+    assert response.status_code == 422
+    assert response.json() == {"detail": [expected]}
+
+
+def test_notebook_parameter_error_format(sciwyrm_client):
+    parameters = {
+        "scicat_url": "https://test-url.sci.cat",
+        "file_server_host": "login",
+        "file_server_port": "22",
+        "dataset_pids": ["abcd/123.522"],
+    }
+    response = sciwyrm_client.post(
+        "/notebook",
+        json={"template_id": TEMPLATE_IDS["generic"], "parameters": parameters},
+    )
+    assert response.status_code == 422
+    [error] = response.json()["detail"]
+    assert error["type"] == "Validation Error"
+    assert error["loc"] == []
+    assert error["msg"] == "'22' is not of type 'integer'"
+    assert error["input"] == {
+        "template_id": TEMPLATE_IDS["generic"],
+        "parameters": parameters,
+    }
+    assert error["ctx"]["jsonpath"] == "$.file_server_port"
+    assert error["ctx"]["template_id"] == TEMPLATE_IDS["generic"]
+
+
+def test_validate_spec_reports_errors_like_model_validation():
+    template_dir = Path(__file__).resolve().parent.parent.parent / "templates"
+    config = TemplateRegistry(template_dir).snapshot[TEMPLATE_IDS["generic"]].config
+    spec = notebook.NotebookSpec(
+        template_id=TEMPLATE_IDS["generic"], parameters={"file_server_port": "22"}
+    )
+    with pytest.raises(notebook.NotebookValidationError) as exc_info:
+        notebook.validate_spec(spec, config)
+    with pytest.raises(ValidationError) as expected:
+        notebook.NotebookSpecWithConfig(
+            template_id=spec.template_id, parameters=spec.parameters, config=config
+        )
+    [expected_error] = expected.value.errors()
+    expected_error["input"].pop("config")
+    assert exc_info.value.errors == [expected_error]
+
+
+def test_validate_spec_attaches_parameters_by_reference():
+    template_dir = Path(__file__).resolve().parent.parent.parent / "templates"
+    config = TemplateRegistry(template_dir).snapshot[TEMPLATE_IDS["generic"]].config
+    spec = notebook.NotebookSpec(
+        template_id=TEMPLATE_IDS["generic"],
+        parameters={
+            "scicat_url": "https://test-url.sci.cat",
+            "file_server_host": "login",
+            "file_server_port": 22,
+            "dataset_pids": ["abcd/123.522"],
+        },
+    )
+    validated = notebook.validate_spec(spec, config)
+    assert validated.parameters is spec.parameters
+    assert validated.config is config
+
+
+def test_notebook_request_body_is_documented(sciwyrm_client):
+    openapi = sciwyrm_client.get("/openapi.json").json()
+    body = openapi["paths"]["/notebook"]["post"]["requestBody"]
+    assert body["required"]
+    assert body["content"]["application/json"]["schema"] == {
+        "$ref": "#/components/schemas/NotebookSpec"
+    }
+    assert "template_id" in openapi["components"]["schemas"]["NotebookSpec"]["required"]
+
+
 def test_notebook_escapes_control_sequence(sciwyrm_client):
     response = sciwyrm_client.post(
         "/notebook",
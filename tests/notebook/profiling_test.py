@@ -0,0 +1,150 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import itertools
+import json
+import pstats
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from sciwyrm import profiling
+from sciwyrm.config import AppConfig
+
+from ..conftest import TEMPLATE_DIR, TEMPLATE_ID, notebook_spec
+
+ADMIN_TOKEN = "test-admin-token"  # noqa: S105
+AUTHORIZED = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+@pytest.fixture
+def profiling_client(make_client, tmp_path):
+    return make_client(admin_token=ADMIN_TOKEN, profile_dir=tmp_path / "profiles")
+
+
+def _profiles(tmp_path: Path) -> list[Path]:
+    directory = tmp_path / "profiles"
+    return sorted(directory.iterdir()) if directory.exists() else []
+
+
+def test_requests_without_header_are_not_profiled(profiling_client, tmp_path):
+    response = profiling_client.post("/notebook", json=notebook_spec())
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+    assert _profiles(tmp_path) == []
+
+
+def test_profile_requires_admin_token(profiling_client):
+    response = profiling_client.post(
+        "/notebook", json=notebook_spec(), headers={profiling.PROFILE_HEADER: "inline"}
+    )
+    assert response.status_code == 401
+
+
+def test_profile_requires_admin_token_to_be_configured(sciwyrm_client):
+    response = sciwyrm_client.post(
+        "/notebook",
+        json=notebook_spec(),
+        headers={profiling.PROFILE_HEADER: "inline", **AUTHORIZED},
+    )
+    assert response.status_code == 404
+
+
+def test_profile_rejects_unknown_mode(profiling_client):
+    response = profiling_client.post(
+        "/notebook",
+        json=notebook_spec(),
+        headers={profiling.PROFILE_HEADER: "everything", **AUTHORIZED},
+    )
+    assert response.status_code == 400
+
+
+def test_inline_profile_is_returned(profiling_client, tmp_path):
+    response = profiling_client.post(
+        "/notebook",
+        json=notebook_spec(),
+        headers={profiling.PROFILE_HEADER: "inline", **AUTHORIZED},
+    )
+    assert response.status_code == 200
+    assert "render;dur=" in response.headers["server-timing"]
+    assert "validate;dur=" in response.headers["server-timing"]
+    if response.headers["content-type"] == "application/octet-stream":
+        path = tmp_path / "inline.pstats"
+        path.write_bytes(response.content)
+        functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+        assert "render_notebook" in functions
+    else:
+        # pyinstrument is installed.
+        assert response.headers["content-type"].startswith("text/html")
+
+
+def test_stored_profile_is_written_to_profile_dir(profiling_client, tmp_path):
+    response = profiling_client.post(
+        "/notebook",
+        json=notebook_spec(),
+        headers={profiling.PROFILE_HEADER: "store", **AUTHORIZED},
+    )
+    assert response.status_code == 200
+    assert response.json()["cells"]
+    profiles = _profiles(tmp_path)
+    assert [path.name for path in profiles] == [
+        response.headers[profiling.PROFILE_FILE_HEADER]
+    ]
+    assert TEMPLATE_ID in profiles[0].name
+
+
+def test_profiled_request_reports_invalid_parameters(profiling_client):
+    request = notebook_spec(file_server_port="abc")
+    response = profiling_client.post(
+        "/notebook",
+        json=request,
+        headers={profiling.PROFILE_HEADER: "inline", **AUTHORIZED},
+    )
+    assert response.status_code == 422
+
+
+def test_every_nth_request_is_sampled(make_client, tmp_path, monkeypatch):
+    client = make_client(profile_sample_rate=2, profile_dir=tmp_path / "profiles")
+    monkeypatch.setattr(profiling, "_requests", itertools.count())
+    responses = [client.post("/notebook", json=notebook_spec()) for _ in range(4)]
+    assert [r.status_code for r in responses] == [200] * 4
+    assert len(_profiles(tmp_path)) == 2
+    # Sampled responses do not reveal that they were profiled.
+    for response in responses:
+        assert "server-timing" not in response.headers
+        assert profiling.PROFILE_FILE_HEADER not in response.headers
+
+
+def test_sampled_requests_behave_like_other_requests(make_client, tmp_path):
+    client = make_client(
+        deterministic_render=True,
+        profile_sample_rate=1,
+        profile_dir=tmp_path / "profiles",
+    )
+    response = client.post("/notebook", json=notebook_spec())
+    assert response.status_code == 200
+    assert len(_profiles(tmp_path)) == 1
+    not_modified = client.post(
+        "/notebook",
+        json=notebook_spec(),
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert not_modified.status_code == 304
+    streamed = client.post("/notebook?stream=true", json=notebook_spec())
+    assert streamed.status_code == 200
+    assert "etag" not in streamed.headers
+    assert streamed.json() == response.json()
+
+
+def test_sampling_requires_profile_dir():
+    with pytest.raises(ValidationError, match="profile_dir"):
+        AppConfig(template_dir=TEMPLATE_DIR, profile_sample_rate=10)
+
+
+def test_profiled_with_pyinstrument_returns_speedscope_json():
+    pytest.importorskip("pyinstrument")
+    result, profile = profiling.profiled(lambda: sum(range(100_000)), "speedscope")
+    assert result == sum(range(100_000))
+    assert profile.suffix == ".speedscope.json"
+    assert "shared" in json.loads(profile.data)
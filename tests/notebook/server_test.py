@@ -0,0 +1,113 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import gc
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from sciwyrm import cli, metrics, notebook
+from sciwyrm.config import AppConfig, app_config
+from sciwyrm.templates import get_template_registry
+
+from ..conftest import TEMPLATE_DIR
+
+server = pytest.importorskip("sciwyrm.server")
+
+
+@pytest.fixture
+def started_servers(monkeypatch):
+    started = []
+
+    class FakeServer:
+        def __init__(self, config, options):
+            self.options = options
+            started.append(self)
+
+        def run(self):
+            self.metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", "")
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR")
+    monkeypatch.setattr(server, "_Server", FakeServer)
+    return started
+
+
+def test_serve_takes_options_from_config(started_servers):
+    config = AppConfig(
+        template_dir=TEMPLATE_DIR,
+        server_workers=3,
+        server_max_requests=1000,
+        server_max_requests_jitter=50,
+        server_graceful_timeout=10,
+    )
+    server.serve(config, bind="127.0.0.1:1234")
+    [started] = started_servers
+    assert started.options["bind"] == "127.0.0.1:1234"
+    assert started.options["workers"] == 3
+    assert started.options["preload_app"]
+    assert started.options["max_requests"] == 1000
+    assert started.options["max_requests_jitter"] == 50
+    assert started.options["graceful_timeout"] == 10
+
+
+def test_serve_defaults_to_cpu_count(started_servers):
+    server.serve(AppConfig(template_dir=TEMPLATE_DIR), bind="127.0.0.1:1234")
+    assert started_servers[0].options["workers"] == (os.cpu_count() or 1)
+
+
+def test_serve_removes_its_metrics_dir(started_servers):
+    server.serve(AppConfig(template_dir=TEMPLATE_DIR), bind="127.0.0.1:1234")
+    assert not Path(started_servers[0].metrics_dir).exists()
+
+
+def test_cli_serve(monkeypatch):
+    calls = []
+    monkeypatch.setattr(server, "serve", lambda config, **kwargs: calls.append(kwargs))
+    assert cli.main(["serve", "--bind", "127.0.0.1:1234", "--workers", "2"]) == 0
+    assert calls == [{"bind": "127.0.0.1:1234", "workers": 2}]
+
+
+def test_warm_up_loads_templates():
+    config = AppConfig(template_dir=TEMPLATE_DIR)
+    try:
+        server.warm_up(config)
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+    snapshot = get_template_registry(config).snapshot
+    assert "summaries_response" in vars(snapshot)
+    assert "schema_responses" in vars(snapshot)
+
+
+def test_workers_do_not_warm_up_templates_again(app, monkeypatch):
+    config = AppConfig(template_dir=TEMPLATE_DIR, warm_up_templates=True)
+    try:
+        server.warm_up(config)
+    finally:
+        gc.unfreeze()
+    renders = []
+    monkeypatch.setattr(
+        notebook, "render_notebook", lambda *args, **kwargs: renders.append(args)
+    )
+    monkeypatch.setitem(app.dependency_overrides, app_config, lambda: config)
+    with TestClient(app) as client:
+        assert client.get("/notebook/templates").status_code == 200
+    assert renders == []
+
+
+def test_metrics_are_aggregated_across_processes(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    code = (
+        "from sciwyrm import metrics; metrics.TEMPLATE_LOADS.labels('compiled').inc()"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", code], check=True)  # noqa: S603
+    assert (
+        b'sciwyrm_template_loads_total{result="compiled"} 2.0'
+        in metrics.generate_latest()
+    )
@@ -0,0 +1,46 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import logging
+import subprocess
+import sys
+
+from sciwyrm import notebook
+from sciwyrm.templates import TemplateRegistry
+
+from ..conftest import TEMPLATE_DIR, TEMPLATE_ID
+
+
+def test_importing_app_does_not_import_jsonschema():
+    code = "import sys, sciwyrm.main; print('jsonschema' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", code],  # noqa: S603
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    assert output.strip() == "False"
+
+
+def test_warm_up_templates_renders_every_template(caplog):
+    snapshot = TemplateRegistry(TEMPLATE_DIR).snapshot
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="sciwyrm"):
+        notebook.warm_up_templates(snapshot)
+    assert not caplog.records
+    assert "parameter_validator" in vars(snapshot[TEMPLATE_ID].config)
+
+
+def test_warm_up_templates_skips_templates_that_fail(template_dir, caplog):
+    path = template_dir / "notebook" / f"{TEMPLATE_ID}.ipynb"
+    path.write_text(path.read_text().replace("SCICAT_URL", "UNDEFINED_PARAMETER"))
+    snapshot = TemplateRegistry(template_dir).snapshot
+    with caplog.at_level(logging.WARNING, logger="sciwyrm"):
+        notebook.warm_up_templates(snapshot)
+    assert TEMPLATE_ID in caplog.text
+
+
+def test_app_warms_up_templates_at_startup(make_client):
+    with make_client(warm_up_templates=True) as client:
+        response = client.get("/notebook/templates")
+    assert response.status_code == 200
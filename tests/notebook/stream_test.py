@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import jinja2
+import pytest
+
+from sciwyrm import notebook
+from sciwyrm.config import AppConfig
+from sciwyrm.templates import NotebookTemplateConfig
+from sciwyrm.workers import get_render_pool
+
+from ..conftest import TEMPLATE_DIR, TEMPLATE_ID, notebook_spec
+
+
+@pytest.fixture
+def deterministic_client(make_client):
+    return make_client(deterministic_render=True, stream_chunk_size=1024)
+
+
+def test_streamed_notebook_matches_rendered_notebook(deterministic_client):
+    rendered = deterministic_client.post("/notebook", json=notebook_spec())
+    streamed = deterministic_client.post("/notebook?stream=true", json=notebook_spec())
+    assert streamed.status_code == 200
+    assert streamed.headers["content-type"] == "application/json"
+    assert "etag" not in streamed.headers
+    assert streamed.content == rendered.content
+
+
+def test_streamed_notebook_invalid_parameters(sciwyrm_client):
+    response = sciwyrm_client.post(
+        "/notebook?stream=true", json=notebook_spec(file_server_port="not a port")
+    )
+    assert response.status_code == 422
+
+
+def test_stream_releases_pool_capacity(sciwyrm_client):
+    response = sciwyrm_client.post("/notebook?stream=true", json=notebook_spec())
+    assert response.status_code == 200
+    pool = get_render_pool(AppConfig(template_dir=TEMPLATE_DIR))
+    assert pool.in_flight == 0
+
+
+@pytest.mark.parametrize("chunk_size", [4, 16, 1000])
+def test_generate_notebook_splits_and_joins_chunks(chunk_size):
+    big = "x" * 50
+    template = jinja2.Template(
+        "{{ _SCIWYRM_HEADER_CELL }}"
+        + big
+        + "{% for i in range(20) %}{{ i }},{% endfor %}"
+    )
+    config = NotebookTemplateConfig(
+        submission_name="test",
+        display_name="Test",
+        version="1",
+        description="A test template",
+        authors=[],
+        parameter_schema={},
+        template_hash="blake2b:0",
+    )
+    spec = notebook.NotebookSpecWithConfig(
+        template_id=TEMPLATE_ID, parameters={}, config=config
+    )
+    chunks = list(
+        notebook.generate_notebook(
+            template, spec, deterministic=True, chunk_size=chunk_size
+        )
+    )
+    assert b"".join(chunks) == notebook.render_notebook(
+        template, spec, deterministic=True
+    )
+    assert all(len(chunk) < 2 * chunk_size for chunk in chunks[1:-1])
@@ -0,0 +1,300 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import json
+import logging
+import shutil
+import time
+
+import jsonschema
+import pytest
+from jinja2 import Environment
+from markupsafe import Markup
+
+from sciwyrm.templates import (
+    HEADER_CELL_PLACEHOLDER,
+    METADATA_PLACEHOLDER,
+    NotebookTemplateConfig,
+    TemplateRegistry,
+    insert_metadata_placeholders,
+    join_separators,
+)
+
+from ..conftest import TEMPLATE_ID, touch
+
+
+def render(source: str) -> dict:
+    template = Environment(autoescape=True).from_string(
+        insert_metadata_placeholders(source)
+    )
+    parts = template.generate(
+        {
+            HEADER_CELL_PLACEHOLDER: Markup('{"cell_type": "markdown"}'),
+            METADATA_PLACEHOLDER: Markup('{"template_id": "abc"}'),
+            "N": 2,
+        }
+    )
+    return json.loads("".join(join_separators(parts)))
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        '{"cells": [], "metadata": {}}',
+        '{"metadata": {\n}, "cells": [\n ]\n}',
+        '{"cells": [{"source": ["a {{ N }}"]}], "metadata": {"kernel": {"name": "x"}}}',
+        '{"cells": [{"source": ["{% for i in range(N) %}x\\n",\n"{% endfor %}y"]}],'
+        ' "metadata": {"sciwyrm": {"old": 1}}, "nbformat": 4}',
+        '{"nested": {"cells": [1], "metadata": {"a": "}"}}, "cells": [{"id": "c"}],'
+        ' "metadata": {"a": "\\"{"}}',
+        '{"cells": [{% for c in [] %}{"id": "{{ c }}"}{% endfor %}], "metadata": {}}',
+        '{"cells": [{% for c in range(N) %}{% if not loop.first %},{% endif %}'
+        '{"id": "{{ c }}"}{% endfor %}], "metadata": {% if N %}{"kernel": "k"}'
+        "{% else %}{}{% endif %}}",
+        '{"cells": [\n{% if N > 5 %}{"id": "c"}{% endif %}\n],'
+        ' "metadata": { {% if N > 5 %}"kernel": "k"{% endif %}}}',
+        '{"cells": [{"id": {{ "[" | tojson }}}],'
+        ' "metadata": {"a": {{ {"b": "}}"} | tojson }}}}',
+        '{% set d = {"a": {"b": ["]"]}} %}{"cells": [{"id": "{{ d.a.b[0] }}"}],'
+        ' "metadata": {}{# } ] #}}',
+    ],
+)
+def test_insert_metadata_placeholders(source):
+    nb = render(source)
+    assert nb["cells"][0] == {"cell_type": "markdown"}
+    assert nb["metadata"]["sciwyrm"] == {"template_id": "abc"}
+
+
+def test_insert_metadata_placeholders_keeps_existing_content():
+    nb = render(
+        '{"cells": [{"id": "c"}], "metadata": {"kernel": "k"},'
+        ' "nested": {"metadata": {}}}'
+    )
+    assert nb["cells"] == [{"cell_type": "markdown"}, {"id": "c"}]
+    assert nb["metadata"] == {"kernel": "k", "sciwyrm": {"template_id": "abc"}}
+    assert nb["nested"] == {"metadata": {}}
+
+
+@pytest.mark.parametrize(
+    "metadata",
+    [
+        '{"sciwyrm": {"old": {"a": [1, 2]}}}',
+        '{"sciwyrm": "old", "kernel": "k"}',
+        '{"kernel": "k", "sciwyrm" : {"old": "}"}\n}',
+        '{"kernel": {"sciwyrm": 1}, "sciwyrm": {% if N %}1{% else %}2{% endif %}}',
+    ],
+)
+def test_insert_metadata_placeholders_replaces_existing_metadata(metadata):
+    source = f'{{"cells": [], "metadata": {metadata}}}'
+    rendered = insert_metadata_placeholders(source)
+    assert rendered.count('"sciwyrm"') == source.count('"sciwyrm"')
+    nb = render(source)
+    assert nb["metadata"]["sciwyrm"] == {"template_id": "abc"}
+
+
+def test_insert_metadata_placeholders_with_cells_from_empty_loop():
+    nb = render(
+        '{"cells": [{% for c in [] %}{"id": "{{ c }}"}{% endfor %}],'
+        ' "metadata": { {% for k in [] %}"{{ k }}": 1{% endfor %}}}'
+    )
+    assert nb["cells"] == [{"cell_type": "markdown"}]
+    assert nb["metadata"] == {"sciwyrm": {"template_id": "abc"}}
+
+
+def test_insert_metadata_placeholders_with_cells_from_loop():
+    nb = render(
+        '{"cells": [{% for c in range(N) %}{"id": "{{ c }}"}'
+        "{% if not loop.last %},{% endif %}{% endfor %}],"
+        ' "metadata": { {% for k in ["x"] %}"{{ k }}": 1{% endfor %}}}'
+    )
+    assert nb["cells"] == [{"cell_type": "markdown"}, {"id": "0"}, {"id": "1"}]
+    assert nb["metadata"] == {"x": 1, "sciwyrm": {"template_id": "abc"}}
+
+
+def test_insert_metadata_placeholders_ignores_brackets_in_jinja_tags():
+    nb = render(
+        '{"cells": [{"id": {{ "[" | tojson }}}],'
+        ' "metadata": {"a": {{ {"b": "}}"} | tojson }}}}'
+    )
+    assert nb["cells"] == [{"cell_type": "markdown"}, {"id": "["}]
+    assert nb["metadata"] == {"a": {"b": "}}"}, "sciwyrm": {"template_id": "abc"}}
+
+
+def test_join_separators_across_parts():
+    parts = ["[1", "\x00", " ", "", "2]", "[", "\x00 ", "]", "{\x00", '"a": 1}']
+    assert "".join(join_separators(parts)) == '[1 ,2][ ]{"a": 1}'
+
+
+def test_insert_metadata_placeholders_requires_cells_and_metadata():
+    with pytest.raises(ValueError, match="cells"):
+        insert_metadata_placeholders('{"metadata": {}}')
+
+
+def _template_config(parameter_schema: dict) -> NotebookTemplateConfig:
+    return NotebookTemplateConfig(
+        submission_name="test",
+        display_name="Test",
+        version="1",
+        description="A test template",
+        authors=[],
+        parameter_schema=parameter_schema,
+        template_hash="blake2b:0",
+    )
+
+
+def test_parameter_validator_is_reused():
+    config = _template_config({"type": "object"})
+    assert config.parameter_validator is config.parameter_validator
+
+
+def test_parameter_validator_checks_formats():
+    config = _template_config(
+        {"type": "object", "properties": {"contact": {"format": "email"}}}
+    )
+    assert config.parameter_validator.is_valid({"contact": "ponder@uu.am"})
+    assert not config.parameter_validator.is_valid({"contact": "not an email"})
+
+
+def test_parameter_validator_rejects_invalid_schema():
+    config = _template_config({"type": "not-a-type"})
+    with pytest.raises(jsonschema.SchemaError):
+        _ = config.parameter_validator
+
+
+@pytest.mark.parametrize(
+    "schema",
+    [
+        {"type": "array", "items": {"type": "string"}},
+        {
+            "type": "array",
+            "prefixItems": [{"type": "integer"}],
+            "items": {"type": "string"},
+        },
+        {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "array",
+            "items": {"type": "string"},
+        },
+        {"type": "array", "items": {"type": "string", "minLength": 2}},
+    ],
+)
+@pytest.mark.parametrize(
+    "instance", [[], ["a", "bc"], [1, "a"], ["a", 2, "b"], [1, 2], ["ab", None]]
+)
+def test_parameter_validator_matches_jsonschema_for_arrays(schema, instance):
+    expected = jsonschema.validators.validator_for(schema)(schema)
+    validator = _template_config(schema).parameter_validator
+
+    def messages(v):
+        return [(e.message, list(e.path)) for e in v.iter_errors(instance)]
+
+    assert messages(validator) == messages(expected)
+
+
+def test_registry_loads_templates(template_dir):
+    templates = TemplateRegistry(template_dir).snapshot
+    assert templates.template_ids() == [TEMPLATE_ID]
+    assert templates[TEMPLATE_ID].config.display_name == "Generic"
+
+
+def test_registry_refresh_without_changes_keeps_snapshot(template_dir):
+    registry = TemplateRegistry(template_dir)
+    snapshot = registry.snapshot
+    assert not registry.refresh()
+    assert registry.snapshot is snapshot
+
+
+def test_registry_refresh_reloads_changed_template(template_dir):
+    registry = TemplateRegistry(template_dir)
+    old = registry.snapshot
+    path = template_dir / "notebook" / f"{TEMPLATE_ID}.ipynb"
+    touch(path, path.read_text().replace("Scicat configuration", "Configuration"))
+
+    assert registry.refresh()
+    new = registry.snapshot
+    new_hash = new[TEMPLATE_ID].config.template_hash
+    assert new_hash != old[TEMPLATE_ID].config.template_hash
+    # The old snapshot is unaffected.
+    context = {"FILE_SERVER_PORT": 22}
+    assert "Scicat configuration" in old[TEMPLATE_ID].template.render(context)
+    assert "Scicat configuration" not in new[TEMPLATE_ID].template.render(context)
+
+
+def test_registry_refresh_adds_and_removes_templates(template_dir):
+    registry = TemplateRegistry(template_dir)
+    notebook_dir = template_dir / "notebook"
+    for suffix in (".ipynb", ".json"):
+        shutil.copy(
+            notebook_dir / f"{TEMPLATE_ID}{suffix}", notebook_dir / f"new{suffix}"
+        )
+        (notebook_dir / f"{TEMPLATE_ID}{suffix}").unlink()
+
+    assert registry.refresh()
+    assert registry.snapshot.template_ids() == ["new"]
+
+
+def test_snapshot_responses_are_encoded_once(template_dir):
+    snapshot = TemplateRegistry(template_dir).snapshot
+    assert snapshot.summaries_response is snapshot.summaries_response
+    assert json.loads(snapshot.summaries_response.body) == [
+        summary.model_dump() for summary in snapshot.summaries()
+    ]
+    assert (
+        json.loads(snapshot.schema_responses[TEMPLATE_ID].body)
+        == snapshot[TEMPLATE_ID].config.parameter_schema
+    )
+
+
+def test_snapshot_responses_change_with_templates(template_dir):
+    registry = TemplateRegistry(template_dir)
+    old = registry.snapshot
+    path = template_dir / "notebook" / f"{TEMPLATE_ID}.json"
+    touch(path, path.read_text().replace('"Generic"', '"Renamed"'))
+
+    assert registry.refresh()
+    new = registry.snapshot
+    assert new.summaries_response.etag != old.summaries_response.etag
+    assert b"Renamed" in new.summaries_response.body
+
+
+def test_registry_watches_for_changes(template_dir):
+    registry = TemplateRegistry(template_dir, reload_interval=0.01)
+    registry.start_watching()
+    try:
+        path = template_dir / "notebook" / f"{TEMPLATE_ID}.json"
+        touch(path, path.read_text().replace('"Generic"', '"Changed"'))
+        for _ in range(500):
+            if registry.snapshot[TEMPLATE_ID].config.display_name == "Changed":
+                break
+            time.sleep(0.01)
+        assert registry.snapshot[TEMPLATE_ID].config.display_name == "Changed"
+    finally:
+        registry.stop_watching()
+
+
+def test_registry_reports_missing_config_once(template_dir, caplog):
+    notebook_dir = template_dir / "notebook"
+    shutil.copy(notebook_dir / f"{TEMPLATE_ID}.ipynb", notebook_dir / "orphan.ipynb")
+    with caplog.at_level(logging.WARNING, logger="sciwyrm"):
+        registry = TemplateRegistry(template_dir)
+        registry.refresh()
+        registry.refresh()
+    assert caplog.text.count("Missing config for template orphan") == 1
+
+    # The template is reported again if its config reappears and disappears.
+    shutil.copy(notebook_dir / f"{TEMPLATE_ID}.json", notebook_dir / "orphan.json")
+    registry.refresh()
+    (notebook_dir / "orphan.json").unlink()
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="sciwyrm"):
+        registry.refresh()
+    assert caplog.text.count("Missing config for template orphan") == 1
+
+
+def test_registry_keeps_previous_version_of_broken_template(template_dir):
+    registry = TemplateRegistry(template_dir)
+    old = registry.snapshot[TEMPLATE_ID]
+    touch(template_dir / "notebook" / f"{TEMPLATE_ID}.json", "{not json")
+
+    registry.refresh()
+    assert registry.snapshot[TEMPLATE_ID] is old
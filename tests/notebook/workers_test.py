@@ -0,0 +1,69 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright (c) 2025 SciCat Project (https://github.com/SciCatProject/sciwyrm)
+
+import asyncio
+import threading
+
+import pytest
+
+from sciwyrm import workers
+from sciwyrm.workers import PoolSaturatedError, RenderPool, _make_render_pool
+
+from ..conftest import TEMPLATE_ID, notebook_spec
+
+
+def test_render_pool_rejects_when_full():
+    async def run():
+        pool = RenderPool("thread", workers=1, queue_size=1)
+        release = threading.Event()
+        try:
+            running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0)
+            assert pool.in_flight == 2
+            with pytest.raises(PoolSaturatedError):
+                await pool.run(release.wait)
+            release.set()
+            assert await asyncio.gather(*running) == [True, True]
+            assert pool.in_flight == 0
+        finally:
+            release.set()
+            pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_saturated_pool_responds_with_service_unavailable(sciwyrm_client, monkeypatch):
+    async def saturated(*args, **kwargs):
+        raise PoolSaturatedError("Too many renders in progress")
+
+    monkeypatch.setattr(workers, "render_notebook", saturated)
+    response = sciwyrm_client.post("/notebook", json=notebook_spec())
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_metrics_report_render_queue(sciwyrm_client):
+    sciwyrm_client.post("/notebook", json=notebook_spec())
+    response = sciwyrm_client.get("/metrics")
+    assert response.status_code == 200
+    assert "sciwyrm_render_queue_depth" in response.text
+    assert "sciwyrm_render_queue_wait_seconds_count" in response.text
+
+
+@pytest.fixture
+def process_pool_client(make_client):
+    yield make_client(render_pool="process", render_workers=1)
+    _make_render_pool("process", 1, 64).shutdown()
+    _make_render_pool.cache_clear()
+
+
+def test_process_pool_renders_notebook(process_pool_client):
+    response = process_pool_client.post("/notebook", json=notebook_spec())
+    assert response.status_code == 200
+    assert response.json()["metadata"]["sciwyrm"]["template_id"] == TEMPLATE_ID
+
+    response = process_pool_client.post(
+        "/notebook", json=notebook_spec(file_server_port="not a port")
+    )
+    assert response.status_code == 422
+    assert "file_server_port" in response.text